@@ -21,8 +21,9 @@
 import math
 import numpy as N
 import mpmath
-import scipy.optimize
+import scipy.optimize, scipy.special
 #import gamma_funcs
+import spline
 
 
 # auxiliary functions used by other functions
@@ -32,14 +33,79 @@ def b_n_exact( n ):
 	of the function
 		Gamma(2n) = 2 gamma_inc(2n, b_n)
 	where Gamma = Gamma function and gamma_inc = lower incomplete gamma function.
+	This is done by directly inverting the regularized incomplete gamma function
+	(P(2n, b_n) = 1/2) with scipy.special.gammaincinv.  n can be a scalar or
+	a numpy array.
 	"""
-	Gamma2n = mpmath.gamma(2*n)
-	def myfunc(bn, n):
-		return abs(float(2*mpmath.gammainc(2*n, 0, bn) - Gamma2n))
-	b = scipy.optimize.brent(myfunc, (n,))
+	b = scipy.special.gammaincinv(2*N.asarray(n, float), 0.5)
+	if N.ndim(b) == 0:
+		return float(b)
 	return b
 
 
+# Parameters for the table of exact b_n values used by b_n_tabulated.  The table
+# is evenly spaced in log(n) and interpolated with a clamped cubic spline; it is
+# built (and its accuracy checked at the midpoints) on first use.
+BN_TABLE_NMIN = 0.1
+BN_TABLE_NMAX = 20.0
+BN_TABLE_SIZE = 1000
+BN_TABLE_TOLERANCE = 1.0e-8
+_bnTable = None
+
+def _GetBnTable( ):
+	"""Returns the tuple (log(n), b_n, second derivatives) for b_n_tabulated,
+	building it if necessary.  The number of table points is doubled until the
+	spline interpolation error at all midpoints is < BN_TABLE_TOLERANCE.
+	"""
+	global _bnTable
+	if _bnTable is None:
+		logn_min = math.log(BN_TABLE_NMIN)
+		logn_max = math.log(BN_TABLE_NMAX)
+		nPts = BN_TABLE_SIZE
+		while True:
+			logn = N.linspace(logn_min, logn_max, nPts)
+			bn = b_n_exact(N.exp(logn))
+			# endpoint slopes d(b_n)/d(log n) from central differences
+			eps = 1.0e-5
+			slopes = (b_n_exact(N.exp(logn[[0,-1]] + eps)) - b_n_exact(N.exp(logn[[0,-1]] - eps))) / (2*eps)
+			y2 = spline.SplineSecondDerivs(logn, bn, slopes[0], slopes[1])
+			midpoints = 0.5*(logn[1:] + logn[:-1])
+			maxError = N.abs(spline.SplineEval(logn, bn, y2, midpoints) - b_n_exact(N.exp(midpoints))).max()
+			if maxError < BN_TABLE_TOLERANCE:
+				break
+			nPts *= 2
+		_bnTable = (logn, bn, y2)
+	return _bnTable
+
+
+def b_n_tabulated( n ):
+	"""Calculate the Sersic b_n parameter by interpolating in a precomputed table
+	of exact values (accurate to better than BN_TABLE_TOLERANCE = 1e-8) for
+	BN_TABLE_NMIN <= n <= BN_TABLE_NMAX; values of n outside that range are
+	calculated with b_n_exact.  n can be a scalar or a numpy array.
+
+	For large arrays of n (e.g., evaluating many models at once with the batched
+	functions), spline interpolation is several times faster than b_n_exact's
+	scipy.special.gammaincinv call; for scalar n, b_n_exact is faster, so it is
+	used directly.
+	"""
+	if N.ndim(n) == 0:
+		return b_n_exact(n)
+	nArray = N.asarray(n, float)
+	bn = N.zeros(nArray.shape)
+	inTable = (nArray >= BN_TABLE_NMIN) & (nArray <= BN_TABLE_NMAX)
+	if inTable.any():
+		(logn, bn_table, y2) = _GetBnTable()
+		bn[inTable] = spline.SplineEval(logn, bn_table, y2, N.log(nArray[inTable]))
+	if not inTable.all():
+		bn[~inTable] = b_n_exact(nArray[~inTable])
+	return bn
+
+
+# coefficients of the Ciotti & Bertin (1999) approximation for b_n
+B_N_COEFFS = (0.3333333333333333, 0.009876543209876543, 0.0018028610621203215,
+				0.00011409410586365319, 7.1510122958919723e-05)
+
 def b_n( n ):
 	"""Calculate the b_n parameter of a Sersic function for the given
 	value of the Sersic index n.  Uses the approximation formula of
@@ -50,15 +116,22 @@ def b_n( n ):
 		coded it) give very wrong answers!
 	"""
 	n2 = n*n
-	a0 = 0.3333333333333333
-	a1 = 0.009876543209876543
-	a2 = 0.0018028610621203215
-	a3 = 0.00011409410586365319
-	a4 = 7.1510122958919723e-05
+	(a0, a1, a2, a3, a4) = B_N_COEFFS
 	bn = 2*n - a0 + a1/n + a2/n2 + a3/(n2*n) - a4/(n2*n2)
 	return bn
 
 
+def db_n_dn( n ):
+	"""Derivative of the b_n approximation (b_n, above) with respect to n."""
+	n2 = n*n
+	(a0, a1, a2, a3, a4) = B_N_COEFFS
+	return 2.0 - a1/n2 - 2*a2/(n2*n) - 3*a3/(n2*n2) + 4*a4/(n2*n2*n)
+
+
+# b_n backends which can be selected in Sersic and CoreSersic via the bnMethod keyword
+bnFunctions = {"approx": b_n, "exact": b_n_exact, "table": b_n_tabulated}
+
+
 
 # Here begins the main set of profilefit-compatible functions
 
@@ -83,8 +156,8 @@ def Moffat( r, params, mag=True, magOutput=True ):
 		I_0 = params[1]
 	fwhm = params[2]
 	beta = params[3]
-	exponent = math.pow(2.0, 1.0/beta)
-	alpha = 0.5*fwhm/math.sqrt(exponent - 1.0)
+	exponent = N.power(2.0, 1.0/beta)
+	alpha = 0.5*fwhm/N.sqrt(exponent - 1.0)
 	scaledR = N.abs(r - r0) / alpha
 	denominator = (1.0 + scaledR*scaledR)**beta
 	I = (I_0 / denominator)
@@ -95,7 +168,7 @@ def Moffat( r, params, mag=True, magOutput=True ):
 
 
 
-def Sersic( r, params, mag=True, magOutput=True ):
+def Sersic( r, params, mag=True, magOutput=True, bnMethod="approx" ):
 	"""Compute intensity at radius r for a Sersic profile, given the specified
 	vector of parameters:
 		params[0] = r0 = center of (symmetric) profile
@@ -107,6 +180,9 @@ def Sersic( r, params, mag=True, magOutput=True ):
 	
 	To have input I_e in magnitudes but *output* in intensity, set mag=True
 	and magOutput=False.
+	
+	bnMethod selects the calculation of b_n: "approx" (b_n; the default),
+	"exact" (b_n_exact), or "table" (b_n_tabulated).
 	"""
 	
 	r0 = params[0]
@@ -118,14 +194,15 @@ def Sersic( r, params, mag=True, magOutput=True ):
 	else:
 		I_e = params[2]
 	r_e = params[3]
-	I = I_e * N.exp( -b_n(n)*(pow(R/r_e, 1.0/n) - 1.0) )
+	bn = bnFunctions[bnMethod](n)
+	I = I_e * N.exp( -bn*(pow(R/r_e, 1.0/n) - 1.0) )
 	if (mag is True) and (magOutput is True):
 		return -2.5 * N.log10(I)
 	else:
 		return I
 
 
-def CoreSersic( r, params, mag=True, magOutput=True ):
+def CoreSersic( r, params, mag=True, magOutput=True, bnMethod="approx" ):
 	"""Compute intensity at radius r for a Core-Sersic profile, given the specified
 	vector of parameters:
 		params[0] = r0 = center of (symmetric) profile
@@ -140,6 +217,8 @@ def CoreSersic( r, params, mag=True, magOutput=True ):
 	
 	To have input I_e in magnitudes but *output* in intensity, set mag=True
 	and magOutput=False.
+	
+	bnMethod selects the calculation of b_n, as for Sersic.
 	"""
 	
 	r0 = params[0]
@@ -154,8 +233,8 @@ def CoreSersic( r, params, mag=True, magOutput=True ):
 	r_b = params[4]
 	alpha = params[5]
 	gamma = params[6]
-	bn = b_n(n)
-	Iprime = I_b * math.pow(2.0, -gamma/alpha) * math.exp( bn * math.pow( math.pow(2.0, 1.0/alpha) * r_b/r_e, (1.0/n) ))
+	bn = bnFunctions[bnMethod](n)
+	Iprime = I_b * N.power(2.0, -gamma/alpha) * N.exp( bn * N.power( N.power(2.0, 1.0/alpha) * r_b/r_e, (1.0/n) ))
 	
 	# powerlaw_part = pow( 1.0 + pow(r_b/xVal, alpha), gamma/alpha );
 	p1 = (1.0 + (r_b/R)**alpha)**(gamma/alpha)
@@ -212,9 +291,11 @@ def BrokenExp( r, params, mag=True, magOutput=True ):
 	To have input I_0 in magnitudes but *output* in intensity, set mag=True
 	and magOutput=False.
 	
-	FIXME: Need to handle case of alpha = 0
-	FIXME: Need to handle "if ( alpha*(r - Rb) > 100.0)" in case of numpy
-	array instead of scalar value of r.
+	r can be a scalar or an array of any shape (it need not be sorted).  The
+	calculation is done in log space, using log(1 + exp(x)) = logaddexp(0, x),
+	so large values of alpha*(r - r_b) do not overflow.  For alpha = 0 (an
+	infinitely soft break), we use the limiting form, which is a single
+	exponential with 1/h = 0.5*(1/h1 + 1/h2).
 	"""
 	
 	r0 = params[0]
@@ -227,38 +308,15 @@ def BrokenExp( r, params, mag=True, magOutput=True ):
 	h1 = params[2]
 	h2 = params[3]
 	Rb = params[4]
-	alpha = params[5]
+	alpha = N.asarray(params[5], float)
 	
-	exponent = (1.0/alpha) * (1.0/h1 - 1.0/h2)
-	S = (1.0 + N.exp(-alpha*Rb))**(-exponent)
-	
-	# check for possible overflow in exponentiatino if r >> Rb
-	if type(R) is N.ndarray:
-		# OK, we're dealing with a numpy array
-		# note that we're assuming that r is monotonically increasing!
-		scaledR = alpha*(R - Rb)
-		if scaledR[0] > 100.0:
-			# all r are beyond crossover point
-			I = I = I_0 * S * N.exp(Rb/h2 - Rb/h1 - R/h2)
-		elif scaledR[-1] < 100.0:
-			# no r are beyond crossover point
-			I = I_0 * S * N.exp(-R/h1) * (1.0 + N.exp(alpha*(R - Rb)))**exponent
-		else:
-			# OK, some r are < crossover point, some are > crossover point
-			goodInd = [ i for i in range(len(R)) if scaledR[i] < 100.0 ]
-			crossoverInd = goodInd[-1]
-			I = N.zeros(len(r))
-			I[0:crossoverInd] = I_0 * S * N.exp(-R[0:crossoverInd]/h1) * (1.0 + 
-								N.exp(alpha*(R[0:crossoverInd] - Rb)))**exponent
-			I[crossoverInd:] = I_0 * S * N.exp(Rb/h2 - Rb/h1 - R[crossoverInd:]/h2)
-	elif ( alpha*(R - Rb) > 100.0):
-		# scalar value of r, with r > crossover point
-		# approximate form for outer exponential:
-		I = I_0 * S * N.exp(Rb/h2 - Rb/h1 - R/h2)
-	else:
-		# scalar value of r, with r < crossover point
-		# fully correct calculation:
-		I = I_0 * S * N.exp(-R/h1) * (1.0 + N.exp(alpha*(R - Rb)))**exponent
+	zeroAlpha = (alpha == 0)
+	safeAlpha = N.where(zeroAlpha, 1.0, alpha)
+	exponent = (1.0/safeAlpha) * (1.0/h1 - 1.0/h2)
+	# log of (1 + exp(alpha*(R - Rb)))**exponent * S, where S = (1 + exp(-alpha*Rb))**(-exponent)
+	logBreak = exponent * (N.logaddexp(0.0, safeAlpha*(R - Rb)) - N.logaddexp(0.0, -safeAlpha*Rb))
+	logBreak = N.where(zeroAlpha, 0.5*R*(1.0/h1 - 1.0/h2), logBreak)
+	I = I_0 * N.exp(-R/h1 + logBreak)
 		
 	if (mag is True) and (magOutput is True):
 		return -2.5 * N.log10(I)
@@ -406,22 +464,8 @@ def Gauss2Side( x, params, mag=True, magOutput=True ):
 	sigma_right = params[3]
 
 	X = x - x0
-	if type(X) is N.ndarray:
-		nPts = X.size
-		I_gauss = []
-		for i in range(nPts):
-			if X[i] < 0:
-				sigma = sigma_left
-			else:
-				sigma = sigma_right
-			I_gauss.append( A * N.exp(-(X[i]*X[i])/(2.0*sigma*sigma)) )
-		I_gauss = N.array(I_gauss)
-	else:
-		if (X < 0):
-			sigma = sigma_left
-		else:
-			sigma = sigma_right
-		I_gauss = A * N.exp(-(X*X)/(2.0*sigma*sigma))
+	sigma = N.where(X < 0, sigma_left, sigma_right)
+	I_gauss = A * N.exp(-(X*X)/(2.0*sigma*sigma))
 
 	if (mag is True) and (magOutput is True):
 		mu_gauss = -2.5 * N.log10(I_gauss)
@@ -431,6 +475,122 @@ def Gauss2Side( x, params, mag=True, magOutput=True ):
 
 
 
+def EdgeOnDisk1D( r, params, mag=True, magOutput=True ):
+	"""Compute intensity at radius r for the radial (major-axis) profile of
+	van der Kruit & Searle's (1981) edge-on disk, I_0 (r/h) K_1(r/h), given
+	the specified vector of parameters:
+		params[0] = r0 = center of profile
+		params[1] = I_0  [= 2 h L_0, where L_0 = central luminosity density]
+		params[2] = h
+	If mag=True, then the first parameter value is mu_0, not I_0, and
+	the value will be calculated in magnitudes, not intensities.
+	
+	To have input I_0 in magnitudes but *output* in intensity, set mag=True
+	and magOutput=False.
+	"""
+	
+	r0 = params[0]
+	R = N.abs(r - r0)
+	if mag is True:
+		mu_0 = params[1]
+		I_0 = 10**(-0.4*mu_0)
+	else:
+		I_0 = params[1]
+	h = params[2]
+	I = vdKBessel(R, I_0, h)
+	if (mag is True) and (magOutput is True):
+		return -2.5 * N.log10(I)
+	else:
+		return I
+
+
+
+# Batched versions of the profilefit-compatible functions: these take an r vector
+# and an (nModels, nParams) array of parameter sets (one row per model, same
+# parameter order as the single-model function) and return an (nModels, nR)
+# array, with all models evaluated in one broadcast computation.
+
+def _BatchArguments( r, paramArray ):
+	"""Returns r as a (1, nR) row vector and paramArray as a list of (nModels, 1)
+	column vectors, suitable for passing to a broadcast-safe single-model function.
+	"""
+	rRow = N.asarray(r, float).ravel()[N.newaxis,:]
+	paramArray = N.atleast_2d(N.asarray(paramArray, float))
+	params = [ paramArray[:,i:i+1] for i in range(paramArray.shape[1]) ]
+	return (rRow, params)
+
+
+def BatchEvaluate( func, r, paramArray, mag=True, magOutput=True ):
+	"""Evaluate the profilefit-compatible function func for every parameter set
+	(row) in paramArray at the radii r, returning an (nModels, nR) array.
+	func must be written with broadcast-safe numpy operations (as are all the
+	functions with explicit *Batch versions below).
+	"""
+	rRow, params = _BatchArguments(r, paramArray)
+	result = func(rRow, params, mag, magOutput)
+	return result * N.ones((len(params[0]), rRow.shape[1]))
+
+
+def MoffatBatch( r, paramArray, mag=True, magOutput=True ):
+	"""Batched version of Moffat; see BatchEvaluate."""
+	return BatchEvaluate(Moffat, r, paramArray, mag, magOutput)
+
+
+def SersicBatch( r, paramArray, mag=True, magOutput=True, bnMethod="approx" ):
+	"""Batched version of Sersic; see BatchEvaluate."""
+	def func( r, params, mag, magOutput ):
+		return Sersic(r, params, mag, magOutput, bnMethod)
+	return BatchEvaluate(func, r, paramArray, mag, magOutput)
+
+
+def CoreSersicBatch( r, paramArray, mag=True, magOutput=True, bnMethod="approx" ):
+	"""Batched version of CoreSersic; see BatchEvaluate."""
+	def func( r, params, mag, magOutput ):
+		return CoreSersic(r, params, mag, magOutput, bnMethod)
+	return BatchEvaluate(func, r, paramArray, mag, magOutput)
+
+
+def ExponentialBatch( r, paramArray, mag=True, magOutput=True ):
+	"""Batched version of Exponential; see BatchEvaluate."""
+	return BatchEvaluate(Exponential, r, paramArray, mag, magOutput)
+
+
+def BrokenExpBatch( r, paramArray, mag=True, magOutput=True ):
+	"""Batched version of BrokenExp; see BatchEvaluate."""
+	return BatchEvaluate(BrokenExp, r, paramArray, mag, magOutput)
+
+
+def SechBatch( r, paramArray, mag=True, magOutput=True ):
+	"""Batched version of Sech; see BatchEvaluate."""
+	return BatchEvaluate(Sech, r, paramArray, mag, magOutput)
+
+
+def Sech2Batch( r, paramArray, mag=True, magOutput=True ):
+	"""Batched version of Sech2; see BatchEvaluate."""
+	return BatchEvaluate(Sech2, r, paramArray, mag, magOutput)
+
+
+def vdKSechBatch( r, paramArray, mag=True, magOutput=True ):
+	"""Batched version of vdKSech; see BatchEvaluate."""
+	return BatchEvaluate(vdKSech, r, paramArray, mag, magOutput)
+
+
+def EdgeOnDisk1DBatch( r, paramArray, mag=True, magOutput=True ):
+	"""Batched version of EdgeOnDisk1D; see BatchEvaluate."""
+	return BatchEvaluate(EdgeOnDisk1D, r, paramArray, mag, magOutput)
+
+
+def GaussBatch( x, paramArray, mag=True, magOutput=True ):
+	"""Batched version of Gauss; see BatchEvaluate."""
+	return BatchEvaluate(Gauss, x, paramArray, mag, magOutput)
+
+
+def Gauss2SideBatch( x, paramArray, mag=True, magOutput=True ):
+	"""Batched version of Gauss2Side; see BatchEvaluate."""
+	return BatchEvaluate(Gauss2Side, x, paramArray, mag, magOutput)
+
+
+
 # Some alternate functions, which do not necessarily follow the rules for
 # the profilefit-compatible functions give above.
 
@@ -449,25 +609,24 @@ def ExpMag( x, params ):
 
 def vdKBessel( r, mu00, h ):
 	"""Implements the f(r) part of van der Kruit & Searle's (1981) edge-on
-	disk function.
-	For scalar values only!
+	disk function:  mu00 * (r/h) * K_1(r/h), where K_1 is the modified Bessel
+	function of the second kind.  r can be a scalar or a numpy array; at r = 0,
+	we use the limiting value (x K_1(x) --> 1 as x --> 0), i.e., mu00.
 	"""
-	if r == 0:
-		return mu00
-	else:
-		return mu00 * (r/h) * mpmath.besselk(1, r/h)
+	x = N.abs(N.asarray(r, float)) / h
+	zeroR = (x == 0)
+	safeX = N.where(zeroR, 1.0, x)
+	f = N.where(zeroR, mu00, mu00 * safeX * scipy.special.k1(safeX))
+	if N.ndim(f) == 0:
+		return float(f)
+	return f
 	
 def EdgeOnDisk(rr, p):
 	
 	L_0 = p[0]
 	h = p[1]
 	mu00 = 2*h*L_0
-	if N.iterable(rr):
-		I = [ vdKBessel(r, mu00, h) for r in rr ]
-		I = N.array(I)
-	else:
-		I = vdKBessel(rr, mu00, h)
-	return I
+	return vdKBessel(rr, mu00, h)
 
 
 
@@ -497,7 +656,7 @@ def TotalMagSersic( params, zeroPoint=0, magOut=True, ell=0.0 ):
 	I_e = params[1]
 	r_e = params[2]
 
-	bn = b_n_exact(n)
+	bn = b_n_tabulated(n)
 	bn2n = bn**(2*n)
 	totalFlux = 2 * math.pi * n * math.exp(bn) * I_e * (r_e*r_e) * (1.0 - ell)
 	totalFlux = totalFlux * mpmath.gamma(2*n) / bn2n
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+#
+# Simple timing benchmarks comparing the bulk/vectorized code paths against
+# the older element-by-element versions, using synthetic data.
+#
+# Usage: python benchmarks.py [nRows]
+
+import sys, os, time, tempfile
+import numpy as N
+
+import ellipse
+import astro_funcs
+
+
+# columns for synthetic ellipse-fit tables (as in IRAF ellipse output)
+SYNTHETIC_COLUMNS = ['SMA', 'INTENS', 'INT_ERR', 'PIX_VAR', 'RMS', 'ELLIP', 'ELLIP_ERR',
+    'PA', 'PA_ERR', 'X0', 'X0_ERR', 'Y0', 'Y0_ERR', 'GRAD', 'GRAD_ERR', 'GRAD_R_ERR', 'RSMA',
+    'MAG', 'MAG_LERR', 'MAG_UERR', 'TFLUX_E', 'TFLUX_C', 'TMAG_E', 'TMAG_C', 'NPIX_E', 'NPIX_C',
+    'A3', 'A3_ERR', 'B3', 'B3_ERR', 'A4', 'A4_ERR', 'B4', 'B4_ERR', 'NDATA', 'NFLAG', 'NITER',
+    'STOP', 'A_BIG', 'SAREA']
+COLUMNS_PER_BLOCK = 8
+
+
+def Timer( func, *args, **kwargs ):
+	"""Returns tuple of (elapsed time in seconds, output of func).
+	"""
+	t0 = time.time()
+	result = func(*args, **kwargs)
+	return (time.time() - t0, result)
+
+
+def WriteSyntheticEllipseTable( fileName, nRows, tableFormat="tprint" ):
+	"""Write a synthetic IRAF ellipse-fit table with nRows rows, in either
+	tprint or tdump text format.  Every 100th MAG entry is INDEF.
+	"""
+
+	sma = N.linspace(0.5, 0.5*nRows, nRows)
+	columns = {}
+	for cname in SYNTHETIC_COLUMNS:
+		if cname.lower() in ellipse.integerColumns:
+			columns[cname] = [ "%d" % (i % 50) for i in range(nRows) ]
+		else:
+			columns[cname] = [ "%.6g" % x for x in N.random.uniform(-5, 5, nRows) ]
+	columns['SMA'] = [ "%.6g" % x for x in sma ]
+	columns['INTENS'] = [ "%.6g" % x for x in 1.0e4*N.exp(-sma/(0.1*nRows)) ]
+	columns['PA'] = [ "%.6g" % x for x in N.random.uniform(-90, 90, nRows) ]
+	columns['MAG'][::100] = ["INDEF"] * len(columns['MAG'][::100])
+
+	outf = open(fileName, 'w')
+	if tableFormat == "tprint":
+		outf.write("#  Table synthetic.tab  (benchmark)\n")
+		for b in range(0, len(SYNTHETIC_COLUMNS), COLUMNS_PER_BLOCK):
+			blockNames = SYNTHETIC_COLUMNS[b:b + COLUMNS_PER_BLOCK]
+			outf.write("\n#  row " + " ".join([ "%12s" % c for c in blockNames ]) + "\n")
+			outf.write("#      " + " ".join([ "%12s" % "" for c in blockNames ]) + "\n\n")
+			for i in range(nRows):
+				pieces = [ "%12s" % columns[c][i] for c in blockNames ]
+				outf.write("%6d " % (i + 1) + " ".join(pieces) + "\n")
+	else:
+		outf.write("SMA              R           %7.2f  pixel\n")
+		for cname in SYNTHETIC_COLUMNS[1:]:
+			outf.write("%-16s R           %%7.2f\n" % cname)
+		outf.write("IMAGE            t           synthetic.fits\n")
+		for i in range(nRows):
+			outf.write(" ".join([ columns[c][i] for c in SYNTHETIC_COLUMNS ]) + "\n")
+	outf.close()
+
+
+def BenchmarkReadEllipse( nRows=20000 ):
+	"""Time the per-cell and bulk (columnar) ellipse-table parsers on synthetic
+	tprint and tdump tables with nRows rows.
+	"""
+
+	tempDir = tempfile.mkdtemp()
+	for tableFormat in ["tprint", "tdump"]:
+		fileName = os.path.join(tempDir, "el_synthetic_%s.ascii" % tableFormat)
+		WriteSyntheticEllipseTable(fileName, nRows, tableFormat)
+		lines = open(fileName).readlines()
+		if tableFormat == "tprint":
+			slowFunc = ellipse._ReadEllipse_tprint
+			fastFunc = ellipse._ReadEllipse_tprint_columnar
+		else:
+			slowFunc = ellipse._ReadEllipse_tdump
+			fastFunc = ellipse._ReadEllipse_tdump_columnar
+		(tSlow, slowResult) = Timer(slowFunc, lines)
+		(tFast, fastResult) = Timer(fastFunc, lines)
+		for cname in slowResult[1]:
+			if not N.allclose(N.array(slowResult[0][cname]), fastResult[0][cname]):
+				print("   *** WARNING: column %s differs between parsers!" % cname)
+		print("%s, %d rows: per-cell = %.3f s, columnar = %.3f s (speedup = %.1fx)" % (tableFormat,
+				nRows, tSlow, tFast, tSlow/tFast))
+		(tRead, efit) = Timer(ellipse.ReadEllipse, fileName, pix=0.5, ZP=20.0)
+		print("   ReadEllipse (total, including post-processing) = %.3f s" % tRead)
+		os.remove(fileName)
+	os.rmdir(tempDir)
+
+
+# Reference copies of the earlier (element-by-element) versions of
+# astro_funcs.Gauss2Side and astro_funcs.BrokenExp, for timing comparisons
+
+def _Gauss2Side_loop( x, params ):
+	x0, A, sigma_left, sigma_right = params[0], 10.0**(-0.4*params[1]), params[2], params[3]
+	X = x - x0
+	I_gauss = []
+	for i in range(X.size):
+		if X[i] < 0:
+			sigma = sigma_left
+		else:
+			sigma = sigma_right
+		I_gauss.append( A * N.exp(-(X[i]*X[i])/(2.0*sigma*sigma)) )
+	return -2.5 * N.log10(N.array(I_gauss))
+
+
+def _BrokenExp_branching( r, params ):
+	R = N.abs(r - params[0])
+	I_0 = 10.0**(-0.4*params[1])
+	h1, h2, Rb, alpha = params[2:6]
+	exponent = (1.0/alpha) * (1.0/h1 - 1.0/h2)
+	S = (1.0 + N.exp(-alpha*Rb))**(-exponent)
+	scaledR = alpha*(R - Rb)
+	goodInd = [ i for i in range(len(R)) if scaledR[i] < 100.0 ]
+	crossoverInd = goodInd[-1]
+	I = N.zeros(len(r))
+	I[0:crossoverInd] = I_0 * S * N.exp(-R[0:crossoverInd]/h1) * (1.0 + 
+						N.exp(alpha*(R[0:crossoverInd] - Rb)))**exponent
+	I[crossoverInd:] = I_0 * S * N.exp(Rb/h2 - Rb/h1 - R[crossoverInd:]/h2)
+	return -2.5 * N.log10(I)
+
+
+def BenchmarkProfileFunctions( nPts=1000000 ):
+	"""Time the vectorized astro_funcs.Gauss2Side and astro_funcs.BrokenExp
+	against the earlier element-by-element versions, on nPts-point grids.
+	"""
+
+	x = N.linspace(-200.0, 200.0, nPts)
+	params = [10.0, 18.0, 20.0, 40.0]
+	(tSlow, slowResult) = Timer(_Gauss2Side_loop, x, params)
+	(tFast, fastResult) = Timer(astro_funcs.Gauss2Side, x, params)
+	print("Gauss2Side, %d points: loop = %.3f s, vectorized = %.3f s (speedup = %.1fx; max diff = %.2g)" % (nPts,
+			tSlow, tFast, tSlow/tFast, N.abs(slowResult - fastResult).max()))
+
+	# crossover at r = 30 + 100/alpha = 130, within the grid
+	r = N.linspace(0.0, 400.0, nPts)
+	params = [0.0, 18.0, 20.0, 50.0, 30.0, 1.0]
+	(tSlow, slowResult) = Timer(_BrokenExp_branching, r, params)
+	(tFast, fastResult) = Timer(astro_funcs.BrokenExp, r, params)
+	print("BrokenExp, %d points: branching = %.3f s, vectorized = %.3f s (speedup = %.1fx; max diff = %.2g)" % (nPts,
+			tSlow, tFast, tSlow/tFast, N.abs(slowResult - fastResult).max()))
+
+
+
+def main( argv=None ):
+	if argv is not None and len(argv) > 1:
+		nRows = int(argv[1])
+	else:
+		nRows = 20000
+	BenchmarkReadEllipse(nRows)
+	BenchmarkProfileFunctions()
+
+
+if __name__ == '__main__':
+
+	main(sys.argv)
@@ -1,10 +1,14 @@
 # Python utility functions for reading in data, etc.
 
-import sys, os, copy, subprocess
+import sys, os, subprocess, hashlib
 import numpy as N
 
 error1 = "Input to ListDataFrame should be a list of lists or list of numpy arrays"
 
+# number of rows checked by ReadCompositeTable when looking for the first
+# non-blank entry in a column (to determine the column's data type)
+N_SAMPLE_ROWS = 100
+
 
 # Fast line-counting approach to deal with really large files
 # (e.g., with 350,000-line file, this takes 0.4s, vs 1.4s for the more Pythonic
@@ -22,66 +26,224 @@ def CountDataLinesInFile( fname, skip="#" ):
 
 
 
+def _ColumnsToRecordArray( dataList ):
+	"""Copy a list of columns (lists or 1-D NumPy arrays, all with the same length)
+	into a single contiguous NumPy structured array, with fields "f0", "f1", etc.
+	Columns which are lists of NumPy arrays (sub-list columns from ReadCompositeTable)
+	are stored as (nRows, nSubLists) sub-array fields.
+
+	Returns tuple of (recordArray, subListCols), where subListCols is the set of
+	indices of the sub-list columns.
+	"""
+	columnArrays = []
+	subListCols = set()
+	for i in range(len(dataList)):
+		column = dataList[i]
+		if type(column) is list and len(column) > 0 and type(column[0]) is N.ndarray:
+			columnArrays.append(N.array(column).T)
+			subListCols.add(i)
+		else:
+			columnArrays.append(N.asarray(column))
+	nRows = len(columnArrays[0])
+	for i in range(len(columnArrays)):
+		if len(columnArrays[i]) != nRows:
+			msg = "Column %d has length %d (first column has length %d)" % (i,
+					len(columnArrays[i]), nRows)
+			raise ValueError(msg)
+	dtype = [ ("f%d" % i, columnArrays[i].dtype, columnArrays[i].shape[1:])
+				for i in range(len(columnArrays)) ]
+	recordArray = N.empty(nRows, dtype=dtype)
+	for i in range(len(columnArrays)):
+		recordArray["f%d" % i] = columnArrays[i]
+	return (recordArray, subListCols)
+
+
 class ListDataFrame(object):
-	"""A class designed to hold a 2D list array (a list of lists, each of the
-	latter being "columns" and presumably having the same length), corresponding
-	to some table of data.  Individual columns should have a single data type,
-	but different columns can have different data types (e.g., one column can
-	be strings, another integers, and a third floating point numbers).
-	Columns can also be NumPy arrays.
+	"""A class designed to hold a table of data as a set of named columns,
+	each of which should have a single data type; different columns can have
+	different data types (e.g., one column can be strings, another integers,
+	and a third floating point numbers).  The input is a list of columns (lists
+	or 1-D NumPy arrays, all with the same length); all columns are copied
+	into a single contiguous NumPy structured array (one field per column,
+	named "f0", "f1", etc.), which is accessible as obj.array.
 	
 	Optionally, a list of column names for the array can be supplied, or
-	added later; extra column-name lists can also be added after creation.
-	When indexed with one of the column names (e.g., obj["radius"]), it acts
-	like a dictionary and returns the corresponding column.  When indexed
-	with an integer or a slice, it acts like the underlying list of lists.
+	added later; extra column-name lists and alternate names for individual
+	columns can also be added after creation (at no cost, since names are just
+	entries in a name-to-column-index map).  When indexed with one of the
+	column names (e.g., obj["radius"]), it acts like a dictionary and returns
+	the corresponding column.  When indexed with an integer or a slice, it acts
+	like a list of the columns (obj[0] = first column, obj[1:3] = list of second
+	and third columns).  The list of columns is accessible as obj.data.
+	
+	Columns are always returned as NumPy arrays which are views into obj.array
+	(no copying; modifying one modifies the data frame) -- including columns
+	which were originally supplied as lists.  (Older versions of this class
+	kept the input lists themselves, so that obj.data was the original
+	list of lists and list-valued columns came back as lists.)
+	
+	To select *rows*, use SelectRows(rowKey), with rowKey a slice, a boolean
+	mask array, or an integer-index array; this returns a new ListDataFrame
+	with the same column names.  For slices, the new data frame is a view into
+	the original data; for masks and index arrays, it holds a copy (NumPy
+	"fancy" indexing always copies).
 	
 	If the column names are strings, then they also become attributes
 	of the object instance and can be accessed as, e.g., obj.radius -- as
 	long as the names are valid Python identifiers (must contain only
-	alphanumerica or _ and must start with letter or _).
+	alphanumerica or _ and must start with letter or _) and are not the
+	names of the data frame's own attributes or methods (e.g., "data",
+	"nRows", "colNames"); such columns can only be accessed via obj["data"],
+	etc.  Other attributes (e.g., metadata such as obj.tableFile) can be
+	assigned as usual.  Assigning to a column attribute (obj.radius = newValues)
+	copies the new values into the column, so they must have the same length
+	and a compatible data type.
 	
 	Example: if the first column corresponds to column name "radius", then
 	it can be accessed as: obj[0], obj["radius"], or obj.radius (and also
-	as obj.data[0]).
-	
-	The original list-of-lists is always accessible via obj.data
+	as obj.data[0] or obj.array["f0"]).
 	
 	If you have data that are all floating-point, it's probably better to
 	turn it into a big NumPy array and use the ArrayDataFrame class instead.
 	"""
 
+	__slots__ = ("array", "colNames", "nCols", "nRows", "_fieldNames", "_subListCols",
+				"_index", "_attrIndex", "_meta")
+
 	def __init__(self, dataList, columnNames=None):
 		if type(dataList) != list:
 			raise TypeError, error1
 		if type(dataList[0]) not in [list, N.ndarray]:
 			raise TypeError, error1
-		self.data = dataList
-		self.colNames = columnNames
-		self.dict = {}
-		
-		self.nCols = len(dataList)
-		if self.colNames is not None:
+		array, subListCols = _ColumnsToRecordArray(dataList)
+		self._Setup(array, subListCols)
+		if columnNames is not None:
 			self.SetColumns(columnNames)
 	
+	def _Setup(self, array, subListCols):
+		self.array = array
+		self.colNames = None
+		self.nCols = len(array.dtype.names)
+		self.nRows = len(array)
+		self._fieldNames = array.dtype.names
+		self._subListCols = subListCols
+		self._index = {}
+		self._attrIndex = {}
+		self._meta = {}
+	
+	def _Column(self, i):
+		"""Returns column i, as a view into self.array."""
+		column = self.array[self._fieldNames[i]]
+		if i in self._subListCols:
+			# sub-list column: row k of the transposed view = k-th sub-list array
+			column = column.T
+		return column
+	
+	@property
+	def data(self):
+		"""List of all the columns (as views into self.array)."""
+		return [ self._Column(i) for i in range(self.nCols) ]
+	
 	def __getitem__(self, key):
 		"""Defines behavior of indexing: indexing with strings causes
 		internal column-name dictionary to be accessed (returns corresponding
 		column of data array); indexing with anything else (e.g., integers or
-		slices) is passed on to the data array.
+		slices) is passed on to the list of columns.
 		"""
 		ktype = type(key)
 		if ktype is str:
-			return self.dict[key]
+			return self._Column(self._index[key])
+		elif isinstance(key, (int, long, N.integer)):
+			if (key < -self.nCols) or (key >= self.nCols):
+				raise IndexError("column index %d out of range" % key)
+			return self._Column(key % self.nCols)
 		else:
 			return self.data[key]
 	
+	def __getattr__(self, name):
+		# only called if normal attribute lookup fails (i.e., for column
+		# names and metadata)
+		try:
+			attrIndex = object.__getattribute__(self, "_attrIndex")
+			meta = object.__getattribute__(self, "_meta")
+		except AttributeError:
+			raise AttributeError(name)
+		if name in attrIndex:
+			return self._Column(attrIndex[name])
+		if name in meta:
+			return meta[name]
+		raise AttributeError(name)
+	
+	def __setattr__(self, name, value):
+		if hasattr(ListDataFrame, name):
+			# slots and properties
+			object.__setattr__(self, name, value)
+		elif name in self._attrIndex:
+			# assigning to a column: copy new values into the data array
+			self._SetColumn(self._attrIndex[name], value)
+		else:
+			self._meta[name] = value
+	
+	def _SetColumn(self, i, value):
+		"""Replace the values of column i (in place, within self.array) with those
+		in value, which must have the same length and a compatible data type."""
+		column = self._Column(i)
+		value = N.asarray(value)
+		if value.shape != column.shape:
+			msg = "new values for column %d have shape %s (column has shape %s)" % (i,
+					value.shape, column.shape)
+			raise ValueError(msg)
+		if not N.can_cast(value.dtype, column.dtype, casting="same_kind"):
+			msg = "cannot store values of type %s in column %d (type %s)" % (value.dtype,
+					i, column.dtype)
+			raise ValueError(msg)
+		column[...] = value
+	
+	def __getstate__(self):
+		return dict([ (name, getattr(self, name)) for name in ListDataFrame.__slots__ ])
+	
+	def __setstate__(self, state):
+		for name in ListDataFrame.__slots__:
+			object.__setattr__(self, name, state[name])
+	
+	def __len__(self):
+		return self.nRows
+	
 	def __str__(self):
 		outString = str(self.data)
 		if self.colNames is not None:
 			outString = str(self.colNames) + "\n" + outString
 		return outString
 	
+	def SelectRows(self, rowKey):
+		"""Returns a new ListDataFrame with the rows selected by rowKey
+		(slice, boolean mask, or index array), sharing column names and
+		metadata with this one.  For slices, the new data frame is a view
+		into this one's data.
+		"""
+		newFrame = ListDataFrame.__new__(ListDataFrame)
+		newFrame._Setup(self.array[rowKey], self._subListCols)
+		newFrame.colNames = self.colNames
+		newFrame._index = self._index.copy()
+		newFrame._attrIndex = self._attrIndex.copy()
+		newFrame._meta = self._meta.copy()
+		return newFrame
+	
+	@property
+	def dict(self):
+		"""Dictionary mapping all column names (including alternate names) to
+		the corresponding columns."""
+		return dict([ (name, self._Column(i)) for (name, i) in self._index.items() ])
+	
+	def _AddName(self, colName, i):
+		self._index[colName] = i
+		# define a new attribute, if possible (for access via x.colName); names of
+		# the data frame's own attributes and methods can't be used
+		if type(colName) is str:
+			colName_attr = colName.split()[0].strip()
+			if not hasattr(ListDataFrame, colName_attr):
+				self._attrIndex[colName_attr] = i
+	
 	def SetColumns(self, columnNames):
 		"""Define the column names (dictionary keys pointing to columns
 		within the data frame).
@@ -89,24 +251,10 @@ class ListDataFrame(object):
 		If called more than once, erases previous column-name definitions.
 		"""
 		
-		if self.dict != {}:
-			# remove old column definitions
-			for oldName in self.dict:
-				# remove old column-name attributes
-				oldName_attr = oldName.split()[0].strip()
-				if oldName_attr in self.__dict__:
-					junk = self.__dict__.pop(oldName_attr)
-			self.dict = {}
-		for i in range(self.nCols):
-			try:
-				colName = columnNames[i]
-				self.dict[colName] = self.data[i]
-				# define a new attribute, if possible (for access via x.colName)
-				if type(colName) is str:
-					colName_attr = colName.split()[0].strip()
-					self.__dict__[colName_attr] = self.data[i]
-			except IndexError:
-				pass
+		self._index = {}
+		self._attrIndex = {}
+		for i in range(min(self.nCols, len(columnNames))):
+			self._AddName(columnNames[i], i)
 		self.colNames = columnNames
 		
 	def SetAltColumns(self, columnNames):
@@ -114,16 +262,8 @@ class ListDataFrame(object):
 		to columns within the data array) for all columns.
 		Does not erase previous column-name definitions.
 		"""
-		for i in range(self.nCols):
-			try:
-				colName = columnNames[i]
-				self.dict[colName] = self.data[i]
-				# define a new attribute, if possible (for access via x.colName)
-				if type(colName) is str:
-					colName_attr = colName.split()[0].strip()
-					self.__dict__[colName_attr] = self.data[i]
-			except IndexError:
-				pass
+		for i in range(min(self.nCols, len(columnNames))):
+			self._AddName(columnNames[i], i)
 
 	def AddColumnName(self, oldName, newName):
 		if (type(newName) is not str):
@@ -133,10 +273,7 @@ class ListDataFrame(object):
 			msg = "%s is already a column name in this ListDataFrame." % newName
 			raise KeyError, msg
 		if (oldName in self.colNames):
-			column = self.dict[oldName]
-			self.dict[newName] = self.dict[oldName]
-			colName_attr = newName.split()[0].strip()
-			self.__dict__[colName_attr] = column
+			self._AddName(newName, self._index[oldName])
 		else:
 			msg = "Column name \"%s\" does not exist." % oldName
 			raise KeyError, msg
@@ -154,10 +291,6 @@ class ListDataFrame(object):
 			newList.remove(oldName)
 			# store new column names, generate keys and attributes
 			self.SetColumns(newList)
-			# clean up internal dictionary by removing old attribute ref
-			oldName_attr = oldName.split()[0].strip()
-			if oldName in self.__dict__:
-				junk = self.__dict__.pop(oldName_attr)
 		else:
 			msg = "Column name \"%s\" does not exist." % oldName
 			raise KeyError, msg
@@ -188,7 +321,7 @@ class ArrayDataFrame(object):
 	"""
 
 	def __init__(self, array, columnNames=None):
-		if type(array) != N.ndarray or len(array.shape) != 2:
+		if not isinstance(array, N.ndarray) or len(array.shape) != 2:
 			raise TypeError, "Input to ArrayDataFrame should be NumPy 2D array"
 		self.data = array
 		self.colNames = columnNames
@@ -281,32 +414,126 @@ class ArrayDataFrame(object):
 		
 		
 
-def ReadTableArray(fileName, skip="#", dataFrame=False, delimiter=None):
+def TableSidecarFilename( fileName, skip="#", delimiter=None, sidecarDir=None ):
+	"""Returns the path of the binary (.npy) sidecar file which
+	ReadTableArray(..., sidecar=True) uses for the text table fileName, read
+	with the specified skip and delimiter values.  The read options and the
+	text file's current modification time and size are encoded in the name,
+	so a sidecar file is only ever used for the exact version of the text file
+	it was made from.  By default the sidecar file is in the same directory as
+	the text file; sidecarDir can be used to specify another directory.
+	"""
+	fileStats = os.stat(fileName)
+	optionTag = hashlib.md5(repr((skip, delimiter))).hexdigest()[0:12]
+	sourceTag = hashlib.md5(repr((os.path.abspath(fileName), fileStats.st_mtime,
+							fileStats.st_size))).hexdigest()[0:12]
+	if sidecarDir is None:
+		sidecarDir = os.path.dirname(os.path.abspath(fileName))
+	sidecarName = ".%s.%s.%s.npy" % (os.path.basename(fileName), optionTag, sourceTag)
+	return os.path.join(sidecarDir, sidecarName)
+
+
+def _WriteTableSidecar( dataArray, sidecarFile ):
+	"""Utility function for ReadTableArray: save dataArray (in column-major order)
+	to sidecarFile, removing any out-of-date sidecar files for the same text file
+	and read options.
+	"""
+	# sidecar names are ".<table name>.<option tag>.<source tag>.npy", with 12-digit
+	# hexadecimal tags; match the names exactly (no glob patterns, since the table
+	# name may contain glob metacharacters or be a prefix of another table's name)
+	(sidecarDir, sidecarName) = os.path.split(sidecarFile)
+	prefix = sidecarName.rsplit(".", 2)[0] + "."
+	oldFiles = []
+	for name in os.listdir(sidecarDir):
+		sourceTag = name[len(prefix):-4]
+		if (name.startswith(prefix) and name.endswith(".npy") and len(sourceTag) == 12
+				and sourceTag.strip("0123456789abcdef") == ""):
+			oldFiles.append(os.path.join(sidecarDir, name))
+	# write to a temporary file first, so other processes never see a partial file
+	tempFile = "%s.%d.tmp" % (sidecarFile, os.getpid())
+	try:
+		outf = open(tempFile, 'wb')
+		N.save(outf, N.asfortranarray(dataArray))
+		outf.close()
+		os.rename(tempFile, sidecarFile)
+		for oldFile in oldFiles:
+			if oldFile != sidecarFile:
+				os.remove(oldFile)
+	except (IOError, OSError), e:
+		print "WARNING: unable to write table sidecar file %s (%s)" % (sidecarFile, e)
+
+
+def _ParseFloatTable( fileName, skip="#", delimiter=None ):
+	"""Utility function for ReadTableArray: read an all-numeric text table into a
+	column-major NumPy array.  If all data lines have the same number of entries,
+	the entire table is converted with a single call to N.fromstring; otherwise
+	(or if the table contains non-numeric entries), the table is split into
+	columns with _TokenizeTable and each column converted separately.
+	"""
+	# open file in "universal" mode to ensure Mac or DOS/Windows
+	# line endings are converted to \n
+	inFile = open(fileName, 'rU')
+	lines = inFile.read().splitlines()
+	inFile.close()
+	dlines = [ line.rstrip() for line in lines if len(line.strip()) > 0 and line[0] not in skip ]
+	
+	nrows = len(dlines)
+	ncols = len(dlines[0].split(delimiter))
+	dataText = "\n".join(dlines)
+	if (TokensPerLine(dataText, delimiter) == ncols).all():
+		if delimiter is None:
+			values = N.fromstring(dataText, sep=" ")
+		else:
+			values = N.fromstring(delimiter.join(dlines), sep=delimiter)
+		# N.fromstring stops at the first entry it cannot convert
+		if len(values) == nrows*ncols:
+			return N.asfortranarray(values.reshape((nrows, ncols)))
+	
+	columns, colNames = _TokenizeTable(fileName, skip, delimiter)
+	# transposing makes the result column-major
+	return N.array(columns, float).T
+
+
+def ReadTableArray(fileName, skip="#", dataFrame=False, delimiter=None, sidecar=False,
+					sidecarDir=None):
 	"""Read data from fileName, store in a NumPy array.  All values are
 	stored as floating-point.  Format is row-major: d[i][j] = d[i,j] =
 	row i, column j.  (To access an entire column, use d[:,j].)
-	Blank lines are ignored.
+	Blank lines are ignored.  The array is stored in column-major ("Fortran")
+	order, so that each column is contiguous in memory.
 	
 	skip = string containing one or more characters which.  Lines
 	beginning with any of these characters will be ignored.
 	
 	If dataFrame=True, then the result is an ArrayDataFrame object
 	containing the NumPy array.
-	"""
 	
-	# open file in "universal" mode to ensure Mac or DOS/Windows
-	# line endings are converted to \n
-	lines = open(fileName, 'rU').readlines()
-	dlines = [line.rstrip() for line in lines if len(line.strip()) > 0 and line[0] not in skip ]
+	If sidecar=True, the array is saved in a binary .npy "sidecar" file the
+	first time the table is read, and later calls (with the same skip and
+	delimiter values) memory-map that file instead of parsing the text table;
+	only the parts of the array (e.g., columns) which are actually used are
+	then read from disk.  The memory-mapped array is copy-on-write: it can be
+	modified, but changes are not written back to the file.  A new sidecar
+	file is generated automatically if the text file's modification time or
+	size changes.  By default the sidecar file is stored next to the text file;
+	sidecarDir can be used to specify another directory.  (See
+	TableSidecarFilename.)
+	"""
 	
-	nrows = len(dlines)
-	ncols = len(dlines[0].split(delimiter))
-	dataArray = N.zeros((nrows, ncols))
+	dataArray = None
+	if sidecar is True:
+		sidecarFile = TableSidecarFilename(fileName, skip, delimiter, sidecarDir)
+		if os.path.exists(sidecarFile):
+			try:
+				dataArray = N.load(sidecarFile, mmap_mode='c')
+			except (IOError, ValueError):
+				# unreadable (e.g., truncated) sidecar file: parse the table again
+				dataArray = None
 	
-	for i in range(nrows):
-		pieces = dlines[i].split(delimiter)
-		for j in range(ncols):
-			dataArray[i, j] = float(pieces[j])
+	if dataArray is None:
+		dataArray = _ParseFloatTable(fileName, skip, delimiter)
+		if sidecar is True:
+			_WriteTableSidecar(dataArray, sidecarFile)
 	
 	if dataFrame:
 		return ArrayDataFrame(dataArray)
@@ -315,50 +542,64 @@ def ReadTableArray(fileName, skip="#", dataFrame=False, delimiter=None):
 
 
 
+def SubListArray( textList, nSubLists ):
+	"""Given a list of strings, where each string is of the form "{x1, ..., xn}"
+	with n = nSubLists elements, return an (nRows, nSubLists) NumPy array.
+
+	If all strings have nSubLists elements, the entire list is converted with
+	a single call to N.fromstring; otherwise (or if some elements are blank
+	or non-numeric), the strings are processed one at a time (extra elements
+	are ignored, and blank or non-numeric elements raise ValueError).
+	"""
+	nRows = len(textList)
+	if (TokensPerLine("\n".join(textList), ",") == nSubLists).all():
+		allText = ",".join(textList).replace("{", "").replace("}", "")
+		values = N.fromstring(allText, sep=",")
+		# N.fromstring stops at the first element it cannot convert
+		if len(values) == nRows*nSubLists:
+			return values.reshape((nRows, nSubLists))
+
+	subListArray = N.zeros((nRows, nSubLists))
+	for j in range(nRows):
+		bareText = textList[j].strip().strip("{").strip("}")
+		pp = bareText.split(",")
+		for i in range(nSubLists):
+			subListArray[j, i] = float(pp[i])
+	return subListArray
+
+
 def ExtractSubLists( textList, nSubLists ):
 	"""Given a list of strings, where each string is of the
 	form "{x1, ..., xn}" with n = nSubLists elements, return
 	a list contaning nSubLists NumPy arrays (1-D).
 	"""
-	bigList = []
-	for i in range(nSubLists):
-		bigList.append([])
-	for textChunk in textList:
-		bareText = textChunk.strip().strip("{").strip("}")
-		pp = bareText.split(",")
-		for i in range(nSubLists):
-			bigList[i].append(float(pp[i]))
-	for i in range(nSubLists):
-		bigList[i] = N.array(bigList[i])
-	
-	return bigList
+	subListArray = N.ascontiguousarray(SubListArray(textList, nSubLists).T)
+	return list(subListArray)
 
 
 def InsertAndReplace( theList, ii, newItems ):
 	"""Given a list, replace the entry at index ii with the elements of
 	newItems (also a list).
 	"""
-	nNewItems = len(newItems)
 	if (ii < 0) or (ii > len(theList)):
 		msg = "\ndatautils.InsertAndReplace: *** ERROR: requested insert location"
 		msg += " (index = %d) is < 0 or > length(theList) [%d]" % (ii, len(theList))
 		msg += "\n"
 		print msg
 		return
-	del theList[ii]
-	for j in reversed(range(nNewItems)): theList.insert(ii, newItems[j])
+	theList[ii:ii + 1] = list(newItems)
 
 
 def AddExtraColumnNames( columnNames, subListColumns, subListLengths, subListSuffixes ):
 	"""Given a list of column names, process it to replace column names for those
 	columns which have sub-lists. New column names corresponding to each sub-list
 	column are inserted in place of the original name, for each such column.
+	subListColumns are the (0-based) indices of the sub-list columns in the
+	original list; columnNames is modified in place, in a single rebuild.
 	"""
-	oldColNames = [ columnNames[i] for i in subListColumns ]
-	nSubListCols = len(subListColumns)
-
-	for i in range(nSubListCols):
-		baseName = oldColNames[i]
+	expandedNames = {}
+	for i in range(len(subListColumns)):
+		baseName = columnNames[subListColumns[i]]
 		nSubLists = subListLengths[i]
 		# generate suffixes:
 		if (subListSuffixes is not None):
@@ -373,29 +614,126 @@ def AddExtraColumnNames( columnNames, subListColumns, subListLengths, subListSuf
 				suffixes = subListSuffixes
 		else:
 			suffixes = [ str(k) for k in range(nSubLists) ]
-		newNames = [ "%s_%s" % (baseName, suffixes[k]) for k in range(nSubLists) ]
-		insertLoc = columnNames.index(baseName)
-		InsertAndReplace(columnNames, insertLoc, newNames)
+		expandedNames[subListColumns[i]] = [ "%s_%s" % (baseName, suffixes[k]) for k in range(nSubLists) ]
+
+	newColumnNames = []
+	for i in range(len(columnNames)):
+		if i in expandedNames:
+			newColumnNames.extend(expandedNames[i])
+		else:
+			newColumnNames.append(columnNames[i])
+	columnNames[:] = newColumnNames
 
 
 def ColumnToFloats( inputList, blankValue ):
 	"""Takes a list of numbers in string format and converts them to floating-point,
 	with blank entries being replaced by blankValue (which should be float).
+	(Any other entries which cannot be converted are also replaced by blankValue.)
 	"""
 	try:
 		floatList = N.array(inputList, "Float64")
 	except ValueError:
-		# looks like column has some blanks in it
-		floatList = copy.copy(inputList)
-		for j in range(len(inputList)):
-			try:
-				floatList[j] = float(inputList[j])
-			except ValueError:
-				floatList[j] = blankValue
-		floatList = N.array(floatList)
+		# looks like column has some blanks in it: convert in bulk with blanks
+		# masked out, falling back to element-by-element conversion only if
+		# there are other non-numeric entries
+		textArray = N.char.strip(N.array(inputList, str))
+		blank = (textArray == "")
+		textArray[blank] = "0"
+		try:
+			floatList = textArray.astype("Float64")
+		except ValueError:
+			floatList = N.zeros(len(textArray))
+			for j in range(len(textArray)):
+				try:
+					floatList[j] = float(textArray[j])
+				except ValueError:
+					floatList[j] = blankValue
+		floatList[blank] = blankValue
 	return floatList
 
 
+def _FirstNonBlank( column, nSample ):
+	"""Returns the first non-blank entry among the first nSample entries of
+	column (a sequence of strings), or None if they are all blank.
+	"""
+	for text in column[:nSample]:
+		if len(text.strip()) > 0:
+			return text
+	return None
+
+
+def TokensPerLine( text, delimiter=None ):
+	"""Given a string consisting of lines joined by newlines, returns an integer
+	array with the number of tokens in each line (i.e., len(line.split(delimiter))),
+	computed on the character array as a whole.  If text ends with a newline,
+	the last entry is for the (empty) line following it.
+
+	Useful for checking that every line of a table has the same number of
+	columns before parsing the whole table with a single N.fromstring call.
+	"""
+	if delimiter is not None and len(delimiter) > 1:
+		return N.array([ line.count(delimiter) for line in text.split("\n") ]) + 1
+	chars = N.frombuffer(text, N.uint8)
+	newlinePos = N.flatnonzero(chars == ord("\n"))
+	if delimiter is None:
+		# tokens start with a non-whitespace character following whitespace
+		# (or at the start of the text)
+		isSpace = (chars == ord(" ")) | ((chars >= ord("\t")) & (chars <= ord("\r")))
+		tokenStart = ~isSpace
+		tokenStart[1:] &= isSpace[:-1]
+		positions = N.flatnonzero(tokenStart)
+		offset = 0
+	else:
+		positions = N.flatnonzero(chars == ord(delimiter))
+		offset = 1
+	lineNumbers = N.searchsorted(newlinePos, positions)
+	return N.bincount(lineNumbers, minlength=len(newlinePos) + 1) + offset
+
+
+def _TokenizeTable( fileName, skip="#", delimiter=None, columnRow=None ):
+	"""Read a text table in a single pass, splitting it into tokens.  Returns
+	tuple of (columns, colNames), where columns is a list of lists of strings
+	(one per column, with the number of columns set by the first data line)
+	and colNames is the list of column names from line columnRow [0-based]
+	of the file (or None if columnRow is None or outside the file).
+	
+	If all data lines have the same number of tokens, the entire table is split
+	with a single call to split() and the columns are extracted by slicing;
+	otherwise, the lines are split one at a time.
+	"""
+	# open file in "universal" mode to convert Mac or DOS line endings to \n
+	inFile = open(fileName, 'rU')
+	lines = inFile.read().splitlines()
+	inFile.close()
+
+	# if requested, extract column names
+	if ((columnRow is not None) and (columnRow >= 0) and (columnRow < len(lines))):
+		colHeaderLine = lines[columnRow].strip("#")
+		pp = colHeaderLine.split(delimiter)
+		colNames = [ p.strip() for p in pp ]
+	else:
+		colNames = None
+
+	dlines = [ line.rstrip() for line in lines if len(line.strip()) > 0 and line[0] not in skip ]
+	nInputCols = len(dlines[0].split(delimiter))
+	tokensPerLine = TokensPerLine("\n".join(dlines), delimiter)
+	if (tokensPerLine == nInputCols).all():
+		if delimiter is None:
+			tokens = " ".join(dlines).split()
+		else:
+			tokens = delimiter.join(dlines).split(delimiter)
+		columns = [ tokens[i::nInputCols] for i in range(nInputCols) ]
+	else:
+		if tokensPerLine.min() < nInputCols:
+			badLine = dlines[int(N.argmin(tokensPerLine))]
+			msg = "data line \"%s\" has fewer than %d columns" % (badLine, nInputCols)
+			raise IndexError(msg)
+		# extra entries in longer lines are ignored
+		rows = [ line.split(delimiter) for line in dlines ]
+		columns = [ [ row[i] for row in rows ] for i in range(nInputCols) ]
+	return (columns, colNames)
+
+
 def ReadCompositeTable( fileName, skip="#", delimiter=None, noConvert=None,
 			intCols=None, blankVal=0, convertSubLists=False, expandSubLists=False, 
 			dataFrame=False, columnRow=None, subListSuffixes=None ):
@@ -404,8 +742,9 @@ def ReadCompositeTable( fileName, skip="#", delimiter=None, noConvert=None,
 	(which by default is "#"); column separators are specified with "delimiter"
 	(default is whitespace).
 	   By default, all columns are converted to 1-D NumPy arrays, unless
-	the data in that column are non-numeric [only the first row of data is
-	checked to see which columns might be non-numeric] or the column number
+	the data in that column are non-numeric [only the first non-blank entry
+	(within the first N_SAMPLE_ROWS rows) is checked to see which columns might
+	be non-numeric] or the column number
 	[0-based: first column = 0, 2nd column = 1, etc.] is in the noConvert list.
 	   Numeric columns with column number in intCols (list) are converted to Int64 arrays;
 	all other numeric columns become Float64 arrays.
@@ -424,6 +763,8 @@ def ReadCompositeTable( fileName, skip="#", delimiter=None, noConvert=None,
 	modify the column names for sublists (newNames[i] = origName + "_" + subListSuffixes[i]);
 	if subListSuffixes is None [the default], then renamed column names have 
 	"_0", "_1", etc. as suffixes.
+	   The file is read and split into tokens in a single pass, and each column
+	is then converted to a NumPy array in bulk.
 	"""
 	
 	subListsFound = False
@@ -432,100 +773,55 @@ def ReadCompositeTable( fileName, skip="#", delimiter=None, noConvert=None,
 		noConvert = []
 	if intCols is None:
 		intCols = []
+	noConvert = list(noConvert)
 	if expandSubLists is True:
 		convertSubLists = True
-	if convertSubLists is True:
-		subListCols = []
-		subListLengths = {}
-		subListLengthList = []
+	subListCols = []
+	subListLengths = {}
+	subListLengthList = []
 		
-	nDataRows = CountDataLinesInFile(fileName, skip=skip)
-	nAllRows = CountLinesInFile(fileName)
-
-	# open file in "universal" mode to convert Mac or DOS line endings to \n
-	inFile = open(fileName, 'rU')
-	dlines = [line.rstrip() for line in inFile if len(line.strip()) > 0 and line[0] not in skip ]
+	columns, colNames = _TokenizeTable(fileName, skip, delimiter, columnRow)
+	nInputCols = len(columns)
 	
-	# if requested, extract column names
-	if ((columnRow is not None) and (columnRow >= 0) and (columnRow < nAllRows)):
-		inFile.seek(0,0)   # rewind to beginning of file
-		i = 0
-		while (i <= columnRow):
-			line = inFile.readline()
-			i += 1
-		colHeaderLine = line.strip("#")
-		pp = colHeaderLine.split(delimiter)
-		colNames = [ p.strip() for p in pp ]
-	else:
-		colNames = None
-	
-	inFile.close()
-	
-	
-	# Figure out number of columns, which ones are non-numeric, and which have
-	# sub-lists (if we're allowing for the latter)
-	pp = dlines[0].split(delimiter)
-	nInputCols = len(pp)
-	nonNumberCols = []
+	# Figure out which columns are non-numeric, and which have sub-lists (if
+	# we're allowing for the latter), using the first non-blank entry in each
+	# column
 	for i in range(nInputCols):
 		if (i not in intCols) and (i not in noConvert):
 			# check to make sure this column has numbers
+			text = _FirstNonBlank(columns[i], N_SAMPLE_ROWS)
 			try:
-				x = float(pp[i])
-			except ValueError:
-				if convertSubLists is True and pp[i].find("{") >= 0:
+				x = float(text)
+			except (ValueError, TypeError):
+				if convertSubLists is True and text is not None and text.find("{") >= 0:
 					# a-ha, this is a column with sublists, so let's convert it
 					subListsFound = True
 					subListCols.append(i)
-					ppp = pp[i].split(",")
-					nSubLists = len(ppp)
+					nSubLists = len(text.split(","))
 					subListLengths[i] = nSubLists
 					subListLengthList.append(nSubLists)
 				else:
 					noConvert.append(i)
 	
 	
-	# Create the master list of input columns
+	# Now convert each column in bulk (columns in noConvert are left as lists
+	# of strings); if expandSubLists=True, sub-list columns are expanded into
+	# individual, new columns
 	dataList = []
 	for i in range(nInputCols):
-		dataList.append([])
-	# go through the table and assign entries to individual-column lists
-	for n in range(nDataRows):
-		pieces = dlines[n].split(delimiter)
-		for i in range(nInputCols):
-			dataList[i].append(pieces[i])
-	
-	
-	# Now convert columns to NumPy arrays, if possible:
-	if (not expandSubLists):
-		# "Normal" approach (if sublists columns exist, then each is stored 
-		# as a list of NumPy arrays); total number of columns is unchanged.
-		# Note that columns in noConvert are left untouched (as list of strings)
-		for i in range(nInputCols):
-			if i in intCols:
-				dataList[i] = N.array(dataList[i], "Int64")
-			elif convertSubLists is True and i in subListCols:
-				dataList[i] = ExtractSubLists(dataList[i], subListLengths[i])
-			elif i not in noConvert:
-				# this must, by default, be a floating-point column
-				dataList[i] = ColumnToFloats(dataList[i], blankVal)
-	else:
-		# Alternate approach, where we expand sublists into individual, new columns.
-		# Have to be careful, since number of columns in dataList will be changing...
-		# Note that columns in noConvert are left untouched (as list of strings)
-		nAddedCols = 0
-		for i_orig in range(nInputCols):  # i_orig = index into original (input) columns
-			ii = i_orig + nAddedCols   # ii = index into current version of dataList
-			if i_orig in intCols:
-				dataList[ii] = N.array(dataList[ii], "Int64")
-			elif i_orig in subListCols:
-				# number of added cols = n(subLists) - 1, bcs. we *remove* original column
-				nAddedCols += subListLengths[i_orig] - 1
-				listOfSublists = ExtractSubLists(dataList[ii], subListLengths[i_orig])
-				InsertAndReplace(dataList, ii, listOfSublists)
-			elif i_orig not in noConvert:
-				# this must, by default, be a floating-point column
-				dataList[ii] = ColumnToFloats(dataList[ii], blankVal)
+		if i in intCols:
+			dataList.append(N.array(columns[i], "Int64"))
+		elif i in subListCols:
+			listOfSublists = ExtractSubLists(columns[i], subListLengths[i])
+			if expandSubLists:
+				dataList.extend(listOfSublists)
+			else:
+				dataList.append(listOfSublists)
+		elif i in noConvert:
+			dataList.append(columns[i])
+		else:
+			# this must, by default, be a floating-point column
+			dataList.append(ColumnToFloats(columns[i], blankVal))
 	
 	
 	# OK, if there were sublists *and* we generated extra columns, update
@@ -12,7 +12,7 @@
 # Example: ~/python/bender_magorrian_example.dat
 #
 
-import math, copy
+import math, copy, os, glob, hashlib, multiprocessing, zipfile
 import numpy as N
 import matplotlib.pyplot as p
 
@@ -52,9 +52,10 @@ SCALED_NAMES = {"ai5": "a5", "bi5": "b5", "ai6": "a6", "bi6": "b6",
 
 def EllipseCircum( a, b ):
     """Calcluate circumference of an ellipse with semi-major axis a and
-    semi-minor axis b, using the approximation of Ramanujan."""
+    semi-minor axis b, using the approximation of Ramanujan.  a and b can
+    also be NumPy arrays."""
 
-    return math.pi * ( 3*(a + b) - math.sqrt( (3*a +  b)*(a + 3*b) ) )
+    return math.pi * ( 3*(a + b) - N.sqrt( (3*a +  b)*(a + 3*b) ) )
 
 
 def EllipseR( a, ellipticity, pa, referencePA ):
@@ -210,8 +211,108 @@ def _ReadEllipse_tdump( lines ):
     return dataDict, columnNameList, imageName
 
 
+def _ColumnsFromText( dataText, colNames, nRows ):
+    """Utility function to convert a block of table text (nRows rows, whitespace-
+    separated) into a dictionary of 1-D NumPy column arrays, in bulk.  INDEF
+    entries become 0.0; columns named in integerColumns are converted to integers
+    (INDEF or non-integer values in these raise ValueError, as in _ReadEllipse_tprint).
+    The "row" column, if present, is dropped.
+    """
+
+    nCols = len(colNames)
+    dataLines = dataText.splitlines()
+    counts = du.TokensPerLine(dataText)
+    values = N.zeros(0)
+    if len(dataLines) == nRows and (counts[0:nRows] == nCols).all() and not counts[nRows:].any():
+        values = N.fromstring(dataText.replace("INDEF", "0.0"), sep=" ")
+    if len(values) != nRows*nCols:
+        msg = "Unable to parse table block as %d rows x %d numerical columns!" % (nRows, nCols)
+        raise ValueError(msg)
+    valueArray = values.reshape((nRows, nCols))
+    if "INDEF" in dataText:
+        # cells which change with the substituted value are the INDEF entries
+        indefArray = N.fromstring(dataText.replace("INDEF", "1.0"), sep=" ").reshape((nRows, nCols))
+        isIndef = (indefArray != valueArray)
+    else:
+        isIndef = N.zeros((nRows, nCols), bool)
+    dataDict = {}
+    for cc in range(nCols):
+        colName = colNames[cc]
+        if colName == "row":
+            continue
+        if colName in integerColumns:
+            column = valueArray[:,cc]
+            badRows = N.flatnonzero(isIndef[:,cc] | (column != N.floor(column)))
+            if len(badRows) > 0:
+                badLine = dataLines[badRows[0]]
+                msg = "invalid value for integer column \"%s\" in row %d: %s" % (colName,
+                        badRows[0] + 1, badLine.split()[cc])
+                raise ValueError(msg)
+            dataDict[colName] = column.astype(int)
+        else:
+            dataDict[colName] = valueArray[:,cc].copy()
+    return dataDict
+
+
+def _ReadEllipse_tprint_columnar( lines ):
+    """Bulk version of _ReadEllipse_tprint: each block of columns is parsed into
+    a NumPy array in a single pass and then split into columns, rather than being
+    converted cell by cell.  Output is a tuple of (dictionary containing the columns as NumPy arrays,
+    list of lower-cased column names).
+    """
+
+    commentlines = [line.strip() for line in lines if line[0] == "#"]
+    # skip first comment line
+    nBlocks = len(commentlines[1:]) / 2
+    columnNameLines = [ commentlines[2*i + 1] for i in range(nBlocks) ]
+
+    datalines = [line for line in lines if line[0] not in ["#", "\n"] ]
+    nPts = len(datalines)/nBlocks
+
+    dataDict = {}
+    columnNameList = []
+
+    for i in range(nBlocks):
+        pp = columnNameLines[i].split()
+        colNames = [ name.lower() for name in pp[1:] ]
+        columnNameList.extend([ name for name in colNames if name != "row" ])
+        blockText = "".join(datalines[nPts*i:nPts*(i + 1)])
+        dataDict.update(_ColumnsFromText(blockText, colNames, nPts))
+
+    return dataDict, columnNameList
+
+
+def _ReadEllipse_tdump_columnar( lines ):
+    """Bulk version of _ReadEllipse_tdump: the data rows are parsed into a NumPy
+    array in a single pass and then split into columns.  Output is a tuple of
+    (dictionary containing the columns as NumPy arrays, list of lower-cased column
+    names, name of original fitted image).
+    """
+
+    for i in range(len(lines)):
+        if lines[i].startswith("IMAGE"):
+            lastHeader = i
+
+    colHeaderlines = lines[0:lastHeader]   # very last "header" line is IMAGE name
+    imageName = lines[lastHeader].split()[-1].strip()
+    datalines = [ line for line in lines[lastHeader + 1:] if len(line.strip()) > 0 ]
+    nDataRows = len(datalines)
+
+    columnNameList = [ line.split()[0].lower() for line in colHeaderlines ]
+
+    nColumns = len(colHeaderlines)
+    nElements = len(datalines[0].split())
+    if (nElements != nColumns):
+        msg = "ERROR: Number of column titles (%d) not equal to number of columns (%d)!" % (nElements, nColumns)
+        print(msg)
+        return None, None, None
+    dataDict = _ColumnsFromText("".join(datalines), columnNameList, nDataRows)
+
+    return dataDict, columnNameList, imageName
+
+
 def ReadEllipse( filename, pix=1.0, dataFrame=True, correctPA=True,
-                    telPA=None, obs=None, flip=False, ZP=None ):
+                    telPA=None, obs=None, flip=False, ZP=None, cache=False, cacheDir=None ):
     """Read in an ellipse fit and store it in a dictionary (or, optionally,
     a ListDataFrame object). The original column names are transformed into
     lower-case (e.g., ELLIP_ERR --> ellip_err). All columns are converted to
@@ -245,6 +346,39 @@ def ReadEllipse( filename, pix=1.0, dataFrame=True, correctPA=True,
     This zero point should incorporate any necessary conversions (e.g., pixel area
     to arcsec^2, exposure time). A new column (named 'sb') is added to the ellipse-fit
     dictionary or object.
+
+    If cache=True, the post-processed columns are saved in a compressed NumPy
+    (.npz) file the first time the ellipse fit is read, and later calls with the
+    same pix/telPA/flip/ZP/correctPA values load that file instead of parsing
+    the text table.  The cache file is rebuilt automatically if the text file's
+    modification time or size changes.  By default the cache file is stored
+    next to the text file; cacheDir can be used to specify another directory.
+    (See EllipseCacheFilename.)
+    """
+
+    if cache is True:
+        dataDict, originalImage = _ReadEllipseCached(filename, pix, correctPA, telPA,
+                                                    flip, ZP, cacheDir)
+    else:
+        dataDict, originalImage = _ParseEllipseFile(filename, pix, telPA, flip, ZP)
+
+    # Convert to dataFrame, if requested:
+    if dataFrame is True:
+        result = _EllipseDictToDataFrame(dataDict, dataDict["column_list"])
+        # add meta-data
+        result.tableFile = filename
+        result.arcsec_per_pix = pix
+        result.origImage = originalImage
+    else:
+        result = dataDict
+
+    return result
+
+
+def _ParseEllipseFile( filename, pix=1.0, telPA=None, flip=False, ZP=None ):
+    """Utility function which reads and post-processes an IRAF ellipse-fit text
+    file for ReadEllipse.  Returns a tuple of (ellipse-fit dictionary, name of
+    original fitted image [None for tprint-format files]).
     """
 
     lines = open(filename).readlines()
@@ -252,11 +386,11 @@ def ReadEllipse( filename, pix=1.0, dataFrame=True, correctPA=True,
     # identify whether it's tprint or tdump output
     if lines[0].startswith("#  Table"):
         # table was generated by tprint
-        dataDict, columnNameList = _ReadEllipse_tprint(lines)
+        dataDict, columnNameList = _ReadEllipse_tprint_columnar(lines)
         originalImage = None
     elif lines[0].startswith("SMA              R           %7.2f  pixel"):
         # table was generated by tdump
-        dataDict, columnNameList, originalImage = _ReadEllipse_tdump(lines)
+        dataDict, columnNameList, originalImage = _ReadEllipse_tdump_columnar(lines)
 
 
     # Post-processing:
@@ -266,7 +400,7 @@ def ReadEllipse( filename, pix=1.0, dataFrame=True, correctPA=True,
 
     # change SMA value from pixels to arcsec:
     dataDict["sma_pix"] = dataDict["sma"]
-    dataDict["sma"] = [ pix*sma for sma in dataDict["sma"] ]
+    dataDict["sma"] = pix*N.array(dataDict["sma"])
     # provide more useful/predictable intensity-error key:
     dataDict["intens_err"] = dataDict["int_err"]
     # add list of column names in original order
@@ -305,22 +439,209 @@ def ReadEllipse( filename, pix=1.0, dataFrame=True, correctPA=True,
 
     dataDict["column_list"] = columnNameList
 
-    # Convert to dataFrame, if requested:
-    if dataFrame is True:
-        frameList = []
-        for cname in columnNameList:
-            frameList.append(dataDict[cname])
-        result = du.ListDataFrame(frameList, columnNameList)
-        # extra conveninces
-        result.AddColumnName("sma", "a")
-        result.AddColumnName("intens", "i")
-        # add meta-data
-        result.tableFile = filename
-        result.arcsec_per_pix = pix
-        result.origImage = originalImage
+    return dataDict, originalImage
+
+
+def EllipseCacheFilename( filename, pix=1.0, correctPA=True, telPA=None, flip=False,
+                            ZP=None, cacheDir=None ):
+    """Returns the path of the .npz cache file which ReadEllipse(..., cache=True)
+    uses for the ellipse-fit text file filename read with the specified options.
+    The options are encoded in the cache-file name, so reading the same file with
+    different options produces separate cache files.
+    """
+
+    optionString = repr((pix, correctPA, telPA, flip, ZP))
+    optionTag = hashlib.md5(optionString).hexdigest()[0:12]
+    if cacheDir is None:
+        cacheDir = os.path.dirname(os.path.abspath(filename))
+    cacheName = ".%s.%s.npz" % (os.path.basename(filename), optionTag)
+    return os.path.join(cacheDir, cacheName)
+
+
+def _LoadEllipseCache( cacheFile, sourceKey ):
+    """Utility function for _ReadEllipseCached: load an ellipse fit from the .npz
+    cache file cacheFile.  Returns a tuple of (ellipse-fit dictionary, name of
+    original fitted image), or None if the cache file does not match sourceKey or
+    cannot be read (e.g., it is truncated or was written in an older layout).
+    """
+
+    # (checking first avoids spurious warnings from numpy for truncated files)
+    if not zipfile.is_zipfile(cacheFile):
+        return None
+    try:
+        cachedData = N.load(cacheFile)
+    except (IOError, ValueError, zipfile.BadZipfile):
+        return None
+    try:
+        try:
+            if list(cachedData["_source_key"]) != sourceKey:
+                return None
+            columnNameList = [ str(cname) for cname in cachedData["_column_list"] ]
+            dataDict = {}
+            for cname in columnNameList:
+                dataDict[cname] = cachedData[cname]
+            dataDict["intens_err"] = dataDict["int_err"]
+            dataDict["column_list"] = columnNameList
+            originalImage = str(cachedData["_orig_image"])
+        except (IOError, KeyError, ValueError, zipfile.BadZipfile):
+            return None
+    finally:
+        cachedData.close()
+    if originalImage == "":
+        originalImage = None
+    return dataDict, originalImage
+
+
+def _ReadEllipseCached( filename, pix=1.0, correctPA=True, telPA=None, flip=False,
+                        ZP=None, cacheDir=None ):
+    """Utility function for ReadEllipse: load the ellipse fit from its .npz cache
+    file if the latter exists and matches the current text file and options;
+    otherwise, parse the text file and (re)write the cache file.  Returns a tuple
+    of (ellipse-fit dictionary, name of original fitted image).
+    """
+
+    cacheFile = EllipseCacheFilename(filename, pix, correctPA, telPA, flip, ZP, cacheDir)
+    fileStats = os.stat(filename)
+    sourceKey = [os.path.abspath(filename), repr(fileStats.st_mtime), repr(fileStats.st_size),
+                repr((pix, correctPA, telPA, flip, ZP))]
+
+    if os.path.exists(cacheFile):
+        cachedResult = _LoadEllipseCache(cacheFile, sourceKey)
+        if cachedResult is not None:
+            return cachedResult
+
+    # no usable cache file, so read the text file and save the result
+    dataDict, originalImage = _ParseEllipseFile(filename, pix, telPA, flip, ZP)
+    columnNameList = dataDict["column_list"]
+    saveDict = {}
+    for cname in columnNameList:
+        saveDict[cname] = dataDict[cname]
+    saveDict["_column_list"] = N.array(columnNameList)
+    saveDict["_source_key"] = N.array(sourceKey)
+    if originalImage is None:
+        saveDict["_orig_image"] = N.array("")
     else:
-        result = dataDict
+        saveDict["_orig_image"] = N.array(originalImage)
+    # write to a temporary file first, so other processes never see a partial file
+    tempFile = "%s.%d.tmp" % (cacheFile, os.getpid())
+    try:
+        outf = open(tempFile, 'wb')
+        N.savez_compressed(outf, **saveDict)
+        outf.close()
+        os.rename(tempFile, cacheFile)
+    except (IOError, OSError), e:
+        print("WARNING: unable to write ellipse-fit cache file %s (%s)" % (cacheFile, e))
+
+    return dataDict, originalImage
+
+
+def _ReadEllipseWorker( args ):
+    """Utility function for ReadEllipseBatch: reads one ellipse fit (in a worker
+    process) and returns a tuple of (filename, (ellipse-fit dictionary, original
+    image name), error message).  Errors are returned rather than raised, so that
+    one bad file does not abort the whole batch.
+    """
+
+    filename, readOptions = args
+    try:
+        if readOptions["cache"] is True:
+            result = _ReadEllipseCached(filename, readOptions["pix"], readOptions["correctPA"],
+                        readOptions["telPA"], readOptions["flip"], readOptions["ZP"],
+                        readOptions["cacheDir"])
+        else:
+            result = _ParseEllipseFile(filename, readOptions["pix"], readOptions["telPA"],
+                        readOptions["flip"], readOptions["ZP"])
+        return (filename, result, None)
+    except Exception, e:
+        return (filename, None, "%s: %s" % (e.__class__.__name__, e))
+
+
+def ReadEllipseBatch( files, pix=1.0, telPA=None, ZP=None, flip=False, correctPA=True,
+                        fileOptions=None, dataFrame=True, cache=False, cacheDir=None,
+                        nProcs=None, getErrors=False ):
+    """Read a set of ellipse fits in parallel, using a pool of nProcs worker processes
+    (default = number of CPUs; nProcs=1 reads the files serially in this process).
+
+    files can be a glob pattern (e.g., "el_*.ascii") or a list of file paths.
+    pix, telPA, ZP, flip, correctPA, dataFrame, cache and cacheDir are as for
+    ReadEllipse and apply to all files; options for individual files can be
+    supplied via fileOptions, a dictionary mapping file paths (or just the
+    file names) to dictionaries of overriding values, e.g.
+        fileOptions={"el_n4536_nicmos.ascii": {"pix": 0.075, "telPA": 246.74, "ZP": 15.13}}
+
+    Returns a dictionary of ellipse fits (dictionaries or ListDataFrame objects), keyed
+    by file path as given in files.  Files which could not be read are left out and
+    reported; if getErrors=True, the return value is a tuple of (ellipse-fit dictionary,
+    dictionary of error messages keyed by file path).
+    """
+
+    if isinstance(files, basestring):
+        fileList = sorted(glob.glob(files))
+    else:
+        fileList = list(files)
+    if fileOptions is None:
+        fileOptions = {}
+
+    defaultOptions = {"pix": pix, "telPA": telPA, "ZP": ZP, "flip": flip,
+                        "correctPA": correctPA, "cache": cache, "cacheDir": cacheDir}
+    jobList = []
+    for filename in fileList:
+        readOptions = defaultOptions.copy()
+        if filename in fileOptions:
+            readOptions.update(fileOptions[filename])
+        elif os.path.basename(filename) in fileOptions:
+            readOptions.update(fileOptions[os.path.basename(filename)])
+        jobList.append((filename, readOptions))
+
+    if nProcs is None:
+        nProcs = multiprocessing.cpu_count()
+    nProcs = min(nProcs, len(jobList))
+    if nProcs > 1:
+        pool = multiprocessing.Pool(nProcs)
+        try:
+            results = pool.map(_ReadEllipseWorker, jobList)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [ _ReadEllipseWorker(job) for job in jobList ]
+
+    efits = {}
+    errors = {}
+    for i in range(len(results)):
+        filename, result, errorMessage = results[i]
+        if errorMessage is not None:
+            print("ReadEllipseBatch: unable to read %s (%s)" % (filename, errorMessage))
+            errors[filename] = errorMessage
+            continue
+        dataDict, originalImage = result
+        if dataFrame is True:
+            efit = _EllipseDictToDataFrame(dataDict, dataDict["column_list"])
+            efit.tableFile = filename
+            efit.arcsec_per_pix = jobList[i][1]["pix"]
+            efit.origImage = originalImage
+        else:
+            efit = dataDict
+        efits[filename] = efit
 
+    if getErrors is True:
+        return (efits, errors)
+    else:
+        return efits
+
+
+def _EllipseDictToDataFrame( dataDict, columnNameList ):
+    """Utility function to turn an IRAF ellipse-fit dictionary into a ListDataFrame
+    object, with the extra "a" and "i" column names.
+    """
+
+    frameList = []
+    for cname in columnNameList:
+        frameList.append(dataDict[cname])
+    result = du.ListDataFrame(frameList, columnNameList)
+    # extra conveninces
+    result.AddColumnName("sma", "a")
+    result.AddColumnName("intens", "i")
     return result
 
 
@@ -371,8 +692,6 @@ def MergeEllipseFits( efit1, efit2, transitionRadius ):
     columnNameList = efit1["column_list"]
     a1 = efit1['sma']
     a2 = efit2['sma']
-    n1 = len(a1)
-    n2 = len(a2)
     # check for bad inputs
     if (transitionRadius < a1[0]) or (transitionRadius > a1[-1]):
         print("Requested transition radius (%g) is outside boundaries of efit1 (%g--%g)!" % (transitionRadius,
@@ -383,12 +702,7 @@ def MergeEllipseFits( efit1, efit2, transitionRadius ):
                     a2[0], a2[-1]))
         return None
 
-    efit1_border = NearestIndex(a1, transitionRadius, noprint=True)
-    efit2_border = NearestIndex(a2, transitionRadius, noprint=True)
-    end1 = efit1_border[1]
-    start2 = efit2_border[1]
-    if (a2[start2] <= a1[end1]):
-        start2 += 1
+    end1, start2 = MergeIndices(a1, a2, transitionRadius)
 
     for colName in columnNameList:
         efit1vals = efit1[colName]
@@ -400,6 +714,81 @@ def MergeEllipseFits( efit1, efit2, transitionRadius ):
 
 
 
+def MergeEllipseFitsMulti( efit1, efit2, transitionRadii ):
+    """Same as MergeEllipseFits, but for a sequence of candidate transition
+    radii; the merge points for all radii are found in a single vectorized
+    search.  Returns a list of merged ellipse-fit dictionaries, one per
+    transition radius (None for radii outside the range of either fit).
+    """
+
+    columnNameList = efit1["column_list"]
+    ends1, starts2 = MergeIndices(efit1['sma'], efit2['sma'], N.ravel(transitionRadii))
+    mergedFits = []
+    for end1, start2 in zip(ends1, starts2):
+        if end1 < 0:
+            mergedFits.append(None)
+            continue
+        newDict = {}
+        for colName in columnNameList:
+            newDict[colName] = N.concatenate((efit1[colName][0:end1], efit2[colName][start2:]))
+        newDict["column_list"] = columnNameList
+        mergedFits.append(newDict)
+
+    return mergedFits
+
+
+
+def InterpolateEllipseFit( efit, newSMA, linear=False ):
+    """Resample an entire IRAF-style ellipse fit (dictionary or ListDataFrame, as
+    generated by ReadEllipse) onto a new grid of semi-major axis values newSMA
+    (same units as efit['sma']).  All columns are interpolated together in a
+    single pass, using cubic-spline interpolation (or linear interpolation if
+    linear=True); integer-valued columns are rounded back to integers.
+    Requested values outside the original semi-major-axis range are set to the
+    values at the nearest end.
+
+    Returns an object of the same kind as the input (ellipse-fit dictionary
+    with "column_list" entry, or ListDataFrame).
+    """
+
+    if isinstance(efit, du.ListDataFrame):
+        columnNameList = efit.colNames
+    else:
+        columnNameList = efit["column_list"]
+    sma = N.array(efit['sma'], float)
+    newSMA = N.array(newSMA, float)
+
+    # one column per quantity, so the knot system is only factorised once
+    yArray = N.column_stack([ N.asarray(efit[cname], float) for cname in columnNameList ])
+    if linear is True:
+        newArray = spline.multilinear_interpolate(sma, yArray, newSMA)
+    else:
+        newArray = spline.multispline_interpolate(sma, yArray, newSMA)
+
+    newDict = {}
+    for j in range(len(columnNameList)):
+        cname = columnNameList[j]
+        if cname in integerColumns:
+            newDict[cname] = N.round(newArray[:,j]).astype(int)
+        else:
+            newDict[cname] = newArray[:,j]
+    newDict["sma"] = newSMA
+    if "int_err" in newDict:
+        newDict["intens_err"] = newDict["int_err"]
+    newDict["column_list"] = columnNameList
+
+    if isinstance(efit, du.ListDataFrame):
+        result = _EllipseDictToDataFrame(newDict, columnNameList)
+        for attrName in ["tableFile", "arcsec_per_pix", "origImage"]:
+            if hasattr(efit, attrName):
+                setattr(result, attrName, getattr(efit, attrName))
+    else:
+        result = newDict
+
+    return result
+
+
+
 def IntensityFromRadius( ellipseFit, radius, ZP=None ):
     """
     Given user-specified radius, ellipse fits, log-scaled image: go into
@@ -488,42 +877,54 @@ def WriteProfileFromDict( dataDict, outputFilename ):
 
 
 
+def BracketIndices( vector, values ):
+    """Given an input list or 1-D array which is assumed to be monotonically
+    increasing or decreasing, find the indices (i1, i2 = i1 + 1) of the two
+    points which bracket each of the input values, using binary search.
+    (For increasing vectors, i2 is the first index >= 1 with vector[i2] >= value;
+    for decreasing vectors, the first index >= 1 with vector[i2] <= value.)
+
+    values can be a scalar, in which case i1 and i2 are integers, or a list or
+    array, in which case i1 and i2 are integer arrays; values lying outside the
+    range of the vector get indices of -1.
+    """
+
+    vector = N.asarray(vector)
+    vals = N.asarray(values)
+    npts = len(vector)
+    if vector[1] > vector[0]:
+        # vector is increasing
+        i2 = N.searchsorted(vector, vals, side='left')
+    else:
+        # vector is decreasing: search in the reversed (increasing) vector
+        i2 = npts - N.searchsorted(vector[::-1], vals, side='right')
+    i2 = N.clip(i2, 1, npts - 1)
+    i1 = i2 - 1
+    outside = (vals < vector.min()) | (vals > vector.max())
+    if vals.ndim == 0:
+        if outside:
+            return (-1, -1)
+        return (int(i1), int(i2))
+    i1[outside] = -1
+    i2[outside] = -1
+    return (i1, i2)
+
+
 def NearestIndex( vector, value, noprint=False, debug=0 ):
     """Given an input list (or Numeric-style 1-D array), which is asumed to be
     monotonically increasing or decreasing, find the indices of the two points
-    with values closest to parameter 'value'."""
-
-    npts = len(vector)
+    with values closest to parameter 'value'.  (See BracketIndices for the
+    version which handles arrays of values.)"""
 
-    if (value < min(vector)) or (value > max(vector)):
+    i1, i2 = BracketIndices(vector, value)
+    if i1 < 0:
         if noprint:
             return (None, None)
         else:
             print("   value %f lies outside range of input vector (%g to %g)!" % \
                     (value, min(vector), max(vector)))
             return None
-
-    diff1 = vector[1] - vector[0]
-    if diff1 > 0:
-        # vector is increasing
-        Sign = 1
-    else:
-        # vector is decreasing
-        Sign = -1
-    i1 = i2 = 0
-    diff = Sign*(value - vector[0])
-    if debug: print(diff)
-    for i in range(1, npts):
-        if debug: print(i)
-        newdiff = Sign*(value - vector[i])
-        if debug: print(newdiff)
-        if (newdiff > 0) and (newdiff <= diff):
-            diff = newdiff
-            i1 = i
-        else:
-            # we just crossed over
-            i2 = i
-            break
+    if debug: print("   i1 = %d, i2 = %d" % (i1, i2))
     if noprint:
         return (i1, i2)
     else:
@@ -531,32 +932,59 @@ def NearestIndex( vector, value, noprint=False, debug=0 ):
 
 
 
+def MergeIndices( r1, r2, transitionRadii, keepEqual=False ):
+    """Given two increasing radius vectors r1 and r2, compute the slice limits
+    (end1, start2) for merging two profiles at each of the transition radii, so
+    that the merged profile is r1[0:end1] followed by r2[start2:].  If
+    keepEqual=False, start2 is advanced past a point in r2 equal to r1[end1];
+    if keepEqual=True, only past points less than r1[end1].
+
+    transitionRadii can be a scalar or an array (returned indices are then
+    integers or integer arrays); transition radii outside the range of
+    either r1 or r2 get indices of -1.
+    """
+
+    r1 = N.asarray(r1)
+    r2 = N.asarray(r2)
+    end1 = BracketIndices(r1, transitionRadii)[1]
+    start2 = BracketIndices(r2, transitionRadii)[1]
+    bad = (end1 < 0) | (start2 < 0)
+    if keepEqual:
+        advance = r2[start2] < r1[end1]
+    else:
+        advance = r2[start2] <= r1[end1]
+    start2 = N.where(bad, -1, start2 + advance)
+    end1 = N.where(bad, -1, end1)
+    if N.ndim(transitionRadii) == 0:
+        return (int(end1), int(start2))
+    return (end1, start2)
+
+
 def WeightedFlux( dataDict ):
     """Given an input ellipse-fit stored in a dictionary, compute the approximate
-    total flux."""
+    total flux.  (See the growthcurve module for curves of growth, total
+    magnitudes, etc.)"""
 
-    sma = dataDict["sma"]
-    I = dataDict["intens"]
-    ellipticity = dataDict["ellip"]
+    sma = N.asarray(dataDict["sma"])
+    I = N.asarray(dataDict["intens"])
+    ellipticity = N.asarray(dataDict["ellip"])
     npts = len(sma)
 
-    # start with flux inside innermost ellipse
-    innerFlux = dataDict["TFLUX_E"][0]
-    fluxSum = innerFlux
-    # now add up flux in elliptical annuli
-    for j in range(1, npts - 1):
-        dr = (sma[j + 1] - sma[j - 1])/2.0
-        # approximation to circumference of ellipse
-        a = sma[j]
-        b = a*(1.0 - ellipticity[j])
-        area = EllipseCircum(a,b) * dr
-        fluxSum += I[j]*area
-    # add outermost ellipse
-    dr = sma[npts - 1] - sma[npts - 2]
-    a = sma[npts - 1]
-    b = a*(1.0 - ellipticity[npts - 1])
-    area = EllipseCircum(a,b)
-    fluxSum += I[npts - 1]*area
+    # start with flux inside innermost ellipse (column names from ReadEllipse
+    # are lower-case)
+    try:
+        innerFlux = dataDict["tflux_e"][0]
+    except KeyError:
+        innerFlux = dataDict["TFLUX_E"][0]
+    # now add up flux in elliptical annuli, with widths = half the distance
+    # between neighboring ellipses (or the distance to the preceding ellipse,
+    # for the outermost ellipse)
+    dr = N.zeros(npts)
+    dr[1:npts - 1] = (sma[2:] - sma[:-2])/2.0
+    dr[npts - 1] = sma[npts - 1] - sma[npts - 2]
+    # approximation to circumference of ellipse
+    area = EllipseCircum(sma, sma*(1.0 - ellipticity)) * dr
+    fluxSum = innerFlux + N.sum(I[1:]*area[1:])
 
     return fluxSum
 
@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 #
 # Desired interface for profile extraction from galaxy image
+# (profiles are now extracted in-process by ExtractStripProfile, which mimics
+# the IRAF task pvector described below)
 # getprofile image-name radius =  Extract major-axis profile, using galaxy center, with length = 2*radius
 # getprofile image-name  PA  = extract profile along specified *sky* PA
 # getprofile image-name  PA --imagepa  =  extract profile along specfied image PA
@@ -62,14 +64,16 @@
 
 
 import sys, optparse, os, datetime, math
-from pyraf import iraf
+import numpy as N
+import scipy.ndimage
+import pyfits
 import angles
 import profiles
 
 
 TELESCOPE_PA_FILENAME = "telescope_pa.dat"
 INFO_ROOTNAME = "galaxyinfo_"
-HEADER_LINE1 = "# Profile generated via iraf task pvector (%s):\n"
+HEADER_LINE1 = "# Profile generated via getgalaxyprofiles.ExtractStripProfile (%s):\n"
 
 class DummyOptions( object ):
 	pass
@@ -163,17 +167,24 @@ def GetTelescopePA():
 
 
 
-def AnnotateProfileFile( outputProfileFilename, imageName, xCenter, yCenter, width, theta, length ):
-	"""Add a short header to a profile generated by pvect
+def ProfileHeaderLines( imageName, xCenter, yCenter, width, theta, length ):
+	"""Returns a list of the header lines (newline-terminated) which describe
+	a profile extracted from an image.
 	"""
-	lines = open(outputProfileFilename).readlines()
 	headerLines = []
 	currentDateTime = datetime.datetime.now()
-	newLine = HEADER_LINE1 % str(currentDateTime)
-	headerLines.append(newLine)
+	headerLines.append(HEADER_LINE1 % str(currentDateTime))
 	newLine = "# pvect %s xc=%f yc=%f width=%d theta=%f length=%d\n" % (imageName, xCenter,
 				yCenter, width, theta, length)
 	headerLines.append(newLine)
+	return headerLines
+
+
+def AnnotateProfileFile( outputProfileFilename, imageName, xCenter, yCenter, width, theta, length ):
+	"""Add a short header to a profile generated by pvect
+	"""
+	lines = open(outputProfileFilename).readlines()
+	headerLines = ProfileHeaderLines(imageName, xCenter, yCenter, width, theta, length)
 	outf = open(outputProfileFilename, 'w')
 	for line in headerLines:
 		outf.write(line)
@@ -182,34 +193,196 @@ def AnnotateProfileFile( outputProfileFilename, imageName, xCenter, yCenter, wid
 	outf.close()
 
 
-def GetAndSaveProfiles( options, imageName, radius, outputRootName, xOffset=0.0, yOffset=0.0 ):
+def SampleImage( imageData, xx, yy, interp="bilinear", boundaryValue=0.0 ):
+	"""Sample a 2-D image array at the (0-based, possibly fractional) pixel
+	positions given by the arrays xx (column) and yy (row), which can have
+	any (matching) shape.  interp = "bilinear" uses bilinear interpolation
+	between the four nearest pixels; interp = "spline" uses cubic-spline
+	interpolation (scipy.ndimage.map_coordinates).  Positions outside the
+	image are set to boundaryValue.
+	"""
+
+	imageData = N.asarray(imageData, float)
+	ny, nx = imageData.shape
+	xx = N.asarray(xx, float)
+	yy = N.asarray(yy, float)
+	outside = (xx < 0) | (xx > nx - 1) | (yy < 0) | (yy > ny - 1)
+	if interp == "spline":
+		values = scipy.ndimage.map_coordinates(imageData, [yy.ravel(), xx.ravel()],
+								order=3, mode="nearest").reshape(xx.shape)
+	elif interp == "bilinear":
+		x0 = N.floor(xx).astype(int).clip(0, max(nx - 2, 0))
+		y0 = N.floor(yy).astype(int).clip(0, max(ny - 2, 0))
+		x1 = N.minimum(x0 + 1, nx - 1)
+		y1 = N.minimum(y0 + 1, ny - 1)
+		dx = xx - x0
+		dy = yy - y0
+		values = ((1.0 - dx)*(1.0 - dy)*imageData[y0, x0] + dx*(1.0 - dy)*imageData[y0, x1] +
+					(1.0 - dx)*dy*imageData[y1, x0] + dx*dy*imageData[y1, x1])
+	else:
+		msg = "unrecognized interpolation type \"%s\" (must be \"bilinear\" or \"spline\")" % interp
+		raise ValueError(msg)
+	values[outside] = boundaryValue
+	return values
+
+
+def ExtractStripProfile( imageData, xCenter, yCenter, theta, length, width=1,
+						interp="bilinear", boundaryValue=0.0 ):
+	"""Extract a profile from a 2-D image array along a line centered at
+	(xCenter, yCenter), with angle theta (degrees, counter-clockwise from the
+	image +x axis) and the specified length (pixels), in the manner of the IRAF
+	task pvector in "theta" mode.  xCenter and yCenter are IRAF-style
+	(1-based) pixel coordinates.
+
+	The profile is sampled at int(length) + 1 equally spaced points from one
+	end of the line to the other.  For width > 1, the profile is the average of
+	int(width) parallel lines, spaced one pixel apart perpendicular to the
+	main line.  See SampleImage for interp and boundaryValue.
+
+	Returns a tuple of (x, y), where x = 1, 2, ... is the position along the
+	profile (as in pvector's text output) and y is the extracted profile.
+	"""
+
+	x, profileMatrix = ExtractStripProfiles(imageData, xCenter, yCenter, [theta], length,
+								width, interp, boundaryValue)
+	return (x, profileMatrix[0])
+
+
+def ExtractStripProfiles( imageData, xCenter, yCenter, thetas, length, width=1,
+						interp="bilinear", boundaryValue=0.0 ):
+	"""Same as ExtractStripProfile, but for a sequence of angles thetas; the
+	sampling positions for all angles are computed and interpolated as a single
+	array.
+
+	Returns a tuple of (x, profileMatrix), where profileMatrix has shape
+	(len(thetas), len(x)), one profile per angle.
+	"""
+
+	nPts = int(length) + 1
+	nLines = max(int(width), 1)
+	t = N.linspace(-0.5*length, 0.5*length, nPts)
+	offsets = N.arange(nLines) - 0.5*(nLines - 1)
+	thetas_rad = N.radians(N.asarray(thetas, float).ravel())
+	cosTheta = N.cos(thetas_rad)[:,N.newaxis,N.newaxis]
+	sinTheta = N.sin(thetas_rad)[:,N.newaxis,N.newaxis]
+	t = t[N.newaxis,N.newaxis,:]
+	offsets = offsets[N.newaxis,:,N.newaxis]
+	# sampling positions for all angles and lines, shape = (nAngles, nLines, nPts)
+	xx = (xCenter - 1.0) + cosTheta*t - sinTheta*offsets
+	yy = (yCenter - 1.0) + sinTheta*t + cosTheta*offsets
+	values = SampleImage(imageData, xx, yy, interp, boundaryValue)
+	return (N.arange(1.0, nPts + 1.0), values.mean(axis=1))
+
+
+def WriteStripProfile( x, y, outputName, imageName, xCenter, yCenter, width, theta, length ):
+	"""Write a profile from ExtractStripProfile to a text file, with the
+	standard header lines.
+	"""
+	outf = open(outputName, 'w')
+	for line in ProfileHeaderLines(imageName, xCenter, yCenter, width, theta, length):
+		outf.write(line)
+	for i in range(len(x)):
+		outf.write("%g  %.10g\n" % (x[i], y[i]))
+	outf.close()
 
-	# load IRAF packages
-	iraf.plot(_doprint=0)
+
+def GetImageData( imageName ):
+	"""Returns the data array from the primary HDU of a FITS image."""
+	hdulist = pyfits.open(imageName)
+	imageData = hdulist[0].data.astype(float)
+	hdulist.close()
+	return imageData
+
+
+def GetAndSaveProfiles( options, imageName, radius, outputRootName, xOffset=0.0, yOffset=0.0,
+						imageData=None, saveFiles=True, interp="bilinear" ):
+	"""Extract profiles (one per width in options.widths) through the position
+	(options.xCenter + xOffset, options.yCenter + yOffset), along image position
+	angle options.imagePA, with length = 2*radius.
+
+	The image is read from imageName unless the data array is supplied via
+	imageData.  If saveFiles is True, each profile is written to
+	"<outputRootName>_w<width>.dat" and the list of filenames is returned;
+	otherwise, a list of (x, y) tuples is returned.
+	"""
 
 	# convert position angle to pvector format:
 	posAng = options.imagePA + 90
 	if (posAng >= 360.0):
 		posAng -= 360.0
 
-	# set up pvector
-	iraf.pvector.theta = posAng
-	iraf.pvector.length = 2*radius
-	iraf.pvector.out_type = "text"
-
 	xCenter = options.xCenter + xOffset
 	yCenter = options.yCenter + yOffset
+	if imageData is None:
+		imageData = GetImageData(imageName)
+
+	outputFilenames = []
+	profileList = []
+	for w in options.widths:
+		x, y = ExtractStripProfile(imageData, xCenter, yCenter, posAng, 2*radius, w, interp)
+		if saveFiles:
+			outputName = "%s_w%g.dat" % (outputRootName, w)
+			WriteStripProfile(x, y, outputName, imageName, xCenter, yCenter, w, posAng, 2*radius)
+			outputFilenames.append(outputName)
+		else:
+			profileList.append((x, y))
+
+	if saveFiles:
+		return outputFilenames
+	else:
+		return profileList
+
 
+def GetProfileSweep( imageData, xCenter, yCenter, imagePAs, radius, width=1,
+					interp="bilinear", fold=False ):
+	"""Extract profiles with length = 2*radius through (xCenter, yCenter) for
+	each of the image position angles (degrees CCW from +y axis) in imagePAs.
+
+	Returns a tuple of (x, profileMatrix), with one row of profileMatrix per
+	position angle.  If fold=True, each profile is folded about its center
+	(see profiles.BatchFold), and x is the radius vector.
+	"""
+
+	thetas = (N.asarray(imagePAs, float) + 90.0) % 360.0
+	x, profileMatrix = ExtractStripProfiles(imageData, xCenter, yCenter, thetas, 2*radius,
+									width, interp)
+	if fold:
+		x, profileMatrix = profiles.BatchFold(profileMatrix)
+	return (x, profileMatrix)
+
+
+def GetAndSaveProfileSweep( options, imageName, radius, imagePAs, outputRootNames=None,
+							imageData=None, interp="bilinear" ):
+	"""Extract profiles through (options.xCenter, options.yCenter) for each
+	image position angle in imagePAs and each width in options.widths, loading
+	the image only once.  If outputRootNames (a list with one entry per
+	position angle) is supplied, each profile is written to
+	"<outputRootName>_w<width>.dat", as for GetAndSaveProfiles.
+
+	Returns a tuple of (x, profileMatrices, outputFilenames), where
+	profileMatrices is a list with one PA-by-position matrix per width.
+	"""
+
+	if len(imagePAs) == 0:
+		raise ValueError("GetAndSaveProfileSweep: no position angles supplied!")
+	if imageData is None:
+		imageData = GetImageData(imageName)
+	thetas = (N.asarray(imagePAs, float) + 90.0) % 360.0
+
+	profileMatrices = []
 	outputFilenames = []
 	for w in options.widths:
-		outputName = "%s_w%g.dat" % (outputRootName, w)
-		if (os.path.exists(outputName)):
-			os.remove(outputName)
-		iraf.pvector(imageName, xc=xCenter, yc=yCenter, width=w, vec_output=outputName)
-		AnnotateProfileFile(outputName, imageName, xCenter, yCenter, w,	posAng, 2*radius)
-		outputFilenames.append(outputName)
+		x, profileMatrix = GetProfileSweep(imageData, options.xCenter, options.yCenter,
+									imagePAs, radius, w, interp)
+		profileMatrices.append(profileMatrix)
+		if outputRootNames is not None:
+			for i in range(len(thetas)):
+				outputName = "%s_w%g.dat" % (outputRootNames[i], w)
+				WriteStripProfile(x, profileMatrix[i], outputName, imageName, options.xCenter,
+								options.yCenter, w, thetas[i], 2*radius)
+				outputFilenames.append(outputName)
 
-	return outputFilenames
+	return (x, profileMatrices, outputFilenames)
 
 
 def GetOneProfile( imageName, xCen, yCen, PA, width, radius, outputRootName="tempprofile",
@@ -278,6 +451,10 @@ def main(argv=None):
 						help="extract major-axis parallel profile at <parOffset> pixels along minor axis")
 	parser.add_option("--perpendicular-offset", type="float", dest="perpOffset", default=None,
 						help="extract minor-axis profile at <perpOffset> pixels along major axis")
+	htext = "extract profiles at sky PAs from <start> to <stop> (inclusive) in steps of <step>,"
+	htext += " loading the image only once (not compatible with the perpendicular or offset options)"
+	parser.add_option("--pa-range", type="float", nargs=3, dest="paRange", default=None,
+						metavar="START STOP STEP", help=htext)
 	parser.add_option("--merge", action="store_true", dest="doMerge", default=False,
 						help="merge w1, w3, w5 profiles [NOT IMPLEMENTED]")
 
@@ -285,6 +462,17 @@ def main(argv=None):
 	# args[0] = name program was called with
 	# args[1] = first actual argument, etc.
 
+	if options.paRange is not None:
+		if options.getPerpendicular or (options.parOffset is not None) or (options.perpOffset is not None):
+			msg = "--pa-range cannot be combined with --perpendicular, --parallel-offset,"
+			msg += " or --perpendicular-offset!\n"
+			print msg
+			return -1
+		(paStart, paStop, paStep) = options.paRange
+		if (paStep <= 0) or (paStop < paStart):
+			print "--pa-range requires STEP > 0 and STOP >= START!\n"
+			return -1
+
 	# Regular mode (no input profile-specification files)
 	if (len(args) < 3):
 		print "You must supply an image filename and a radius!\n"
@@ -315,6 +503,18 @@ def main(argv=None):
 	if options.widths is None:
 		options.widths = [1.0, 3.0, 5.0]
 
+	if options.paRange is not None:
+		# angular sweep: one set of profiles per sky PA, all from one image load
+		(paStart, paStop, paStep) = options.paRange
+		skyPAs = N.arange(paStart, paStop + 0.5*paStep, paStep)
+		imagePAs = [ angles.SkyAngleToImageAngle(telPA, skyPA) for skyPA in skyPAs ]
+		outputRoots = [ MakeOutputRoot(options, "pa%.1f" % skyPA, shortName) for skyPA in skyPAs ]
+		x, profileMatrices, outputFilenames = GetAndSaveProfileSweep(options, imageFilename,
+															radius, imagePAs, outputRoots)
+		print "%d profiles saved (%s ... %s)" % (len(outputFilenames), outputFilenames[0],
+											outputFilenames[-1])
+		return 0
+
 	if options.skyPA is not None:
 		paString = "pa%.1f" % options.skyPA
 	else:
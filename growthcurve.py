@@ -0,0 +1,257 @@
+# Vectorized curves of growth for IRAF ellipse fits (as read by ellipse.ReadEllipse
+# or ellipse.ReadEllipseBatch): cumulative flux as a function of semi-major axis,
+# and total magnitude, half-light and 90%-light radii, concentration, and Petrosian
+# radius and magnitude.
+#
+# All calculations are done on 2-D arrays with one row per ellipse fit (shorter
+# fits are padded with NaN), so that photometry for an entire sample of galaxies
+# can be computed at once:
+#
+#    efits = ellipse.ReadEllipseBatch(fileList, pix=0.75)
+#    phot = growthcurve.Photometry(efits, ZP=25.0)
+#    print phot["name"], phot["totalMag"], phot["r_e"]
+
+import math
+import numpy as N
+
+import datautils as du
+
+
+# Petrosian ratio I(a)/<I>(<a>) which defines the Petrosian radius
+PETROSIAN_RATIO = 0.2
+# Petrosian flux is measured within PETROSIAN_FACTOR * (Petrosian radius)
+PETROSIAN_FACTOR = 2.0
+
+CUMULATIVE_METHODS = ["annuli", "tflux_e"]
+
+
+def _IsSingleFit( efit ):
+	return isinstance(efit, du.ListDataFrame) or (type(efit) is dict and "column_list" in efit)
+
+
+def _GetColumn( efit, colNames ):
+	"""Returns the first of the columns in colNames which exists in efit (dictionary
+	or ListDataFrame), as a float array."""
+	for colName in colNames:
+		try:
+			return N.asarray(efit[colName], float)
+		except KeyError:
+			pass
+	msg = "ellipse fit has no column named %s" % " or ".join(colNames)
+	raise KeyError(msg)
+
+
+def _FitList( efits ):
+	"""Returns tuple of (fitList, names, single) for a single ellipse fit, a list
+	of ellipse fits, or a dictionary of ellipse fits (as from ReadEllipseBatch;
+	the fits are then sorted by key).
+	"""
+	if _IsSingleFit(efits):
+		name = getattr(efits, "tableFile", "0")
+		return ([efits], [name], True)
+	if type(efits) is dict:
+		names = sorted(efits.keys())
+		return ([ efits[name] for name in names ], names, False)
+	names = [ getattr(efit, "tableFile", str(i)) for (i, efit) in enumerate(efits) ]
+	return (list(efits), names, False)
+
+
+def StackColumn( fitList, colNames ):
+	"""Returns a 2-D array containing the column named colNames[0] (or, if that
+	does not exist, colNames[1], etc.) from each of the ellipse fits in fitList,
+	one row per fit; rows for shorter fits are padded with NaN."""
+	columns = [ _GetColumn(efit, colNames) for efit in fitList ]
+	nPts = max([ len(column) for column in columns ])
+	stack = N.empty((len(columns), nPts))
+	stack.fill(N.nan)
+	for i in range(len(columns)):
+		stack[i,:len(columns[i])] = columns[i]
+	return stack
+
+
+def EllipseArea( sma, ellipticity ):
+	"""Area of ellipse(s) with semi-major axis sma and ellipticity."""
+	return math.pi * sma**2 * (1.0 - ellipticity)
+
+
+def _InterpolateRows( x, y, xNew ):
+	"""For 2-D arrays x and y (NaN-padded rows, x increasing along each row),
+	linearly interpolate row i at xNew[i].  Values of xNew outside the range of
+	x[i] produce NaN."""
+	rows = N.arange(x.shape[0])
+	nValid = (~N.isnan(x)).sum(axis=1)
+	with N.errstate(invalid='ignore'):
+		i2 = N.clip((x < xNew[:,N.newaxis]).sum(axis=1), 1, x.shape[1] - 1)
+		i1 = i2 - 1
+		x1, x2 = x[rows,i1], x[rows,i2]
+		y1, y2 = y[rows,i1], y[rows,i2]
+		yNew = y1 + (xNew - x1)*(y2 - y1)/(x2 - x1)
+		inside = (xNew >= x[:,0]) & (xNew <= x[rows,N.maximum(nValid - 1, 0)])
+	return N.where(inside, yNew, N.nan)
+
+
+def _GrowthArrays( fitList, method="annuli", pix=None ):
+	"""Utility function for CumulativeFlux and Photometry: returns tuple of 2-D
+	arrays (sma, intens, area, cumFlux) for the ellipse fits in fitList, with area =
+	area within each isophote in pixels."""
+	if method not in CUMULATIVE_METHODS:
+		msg = "unrecognized method \"%s\" (must be one of %s)" % (method, CUMULATIVE_METHODS)
+		raise ValueError(msg)
+	sma = StackColumn(fitList, ["sma"])
+	intens = StackColumn(fitList, ["intens"])
+	ellipticity = StackColumn(fitList, ["ellip"])
+	if pix is None:
+		# ReadEllipse always provides the semi-major axis in pixels
+		try:
+			smaPix = StackColumn(fitList, ["sma_pix"])
+		except KeyError:
+			msg = "pix must be specified for ellipse fits without an \"sma_pix\" column"
+			raise ValueError(msg)
+	else:
+		smaPix = sma / pix
+	area = EllipseArea(smaPix, ellipticity)
+
+	if method == "tflux_e":
+		cumFlux = StackColumn(fitList, ["tflux_e", "TFLUX_E"])
+	else:
+		cumFlux = N.empty(sma.shape)
+		cumFlux[:,0] = intens[:,0]*area[:,0]
+		annulusFlux = 0.5*(intens[:,1:] + intens[:,:-1]) * N.diff(area, axis=1)
+		cumFlux[:,1:] = cumFlux[:,0:1] + N.cumsum(annulusFlux, axis=1)
+	return (sma, intens, area, cumFlux)
+
+
+def CumulativeFlux( efits, method="annuli", pix=None ):
+	"""Compute the curve of growth (flux within each isophote) for one or more
+	ellipse fits (dictionaries or ListDataFrames from ReadEllipse; a list of them;
+	or a dictionary of them, as from ReadEllipseBatch).
+
+	method = "annuli": the flux is integrated over elliptical annuli, using the
+	"intens", "ellip" and "sma" columns: the intensity is assumed constant
+	inside the innermost isophote and to vary linearly between isophotes (i.e.,
+	trapezoidal integration in isophote area).  Since intensities are per pixel,
+	areas are computed in pixels, from the "sma_pix" column which ReadEllipse
+	provides; for fits without that column, the pixel scale pix (arcsec/pixel,
+	or whatever units "sma" is in) must be specified.
+	method = "tflux_e": the IRAF "tflux_e" column (total flux within each
+	ellipse) is used.
+
+	Returns tuple of (sma, cumFlux); for a single ellipse fit these are 1-D
+	arrays, otherwise they are 2-D arrays with one row per ellipse fit (padded
+	with NaN).
+	"""
+	fitList, names, single = _FitList(efits)
+	sma, intens, area, cumFlux = _GrowthArrays(fitList, method, pix)
+	if single:
+		return (sma[0], cumFlux[0])
+	return (sma, cumFlux)
+
+
+def TotalFlux( cumFlux ):
+	"""Returns the total flux (cumulative flux at the last valid isophote) for
+	each row of cumFlux (as from CumulativeFlux)."""
+	cumFlux = N.atleast_2d(cumFlux)
+	nValid = (~N.isnan(cumFlux)).sum(axis=1)
+	totalFlux = cumFlux[N.arange(cumFlux.shape[0]), N.maximum(nValid - 1, 0)]
+	return N.where(nValid > 0, totalFlux, N.nan)
+
+
+def FractionRadius( sma, cumFlux, fraction, totalFlux=None ):
+	"""Returns the semi-major axis within which the fraction of the total flux
+	(default = TotalFlux(cumFlux)) is reached, for each row of sma and cumFlux
+	(as from CumulativeFlux).  To avoid multiple solutions, the curve of growth is
+	first made monotonic (running maximum).  Within the innermost isophote, the
+	enclosed flux is assumed to scale as sma**2 (constant intensity).
+	"""
+	sma = N.atleast_2d(sma)
+	cumFlux = N.atleast_2d(cumFlux)
+	if totalFlux is None:
+		totalFlux = TotalFlux(cumFlux)
+	target = fraction*N.asarray(totalFlux, float)
+	# running maximum (N.fmax ignores the NaN padding)
+	monoFlux = N.fmax.accumulate(cumFlux, axis=1)
+	rows = N.arange(sma.shape[0])
+	with N.errstate(invalid='ignore', divide='ignore'):
+		i2 = (monoFlux < target[:,N.newaxis]).sum(axis=1)
+		i2 = N.minimum(i2, sma.shape[1] - 1)
+		i1 = N.maximum(i2 - 1, 0)
+		x1, x2 = sma[rows,i1], sma[rows,i2]
+		y1, y2 = monoFlux[rows,i1], monoFlux[rows,i2]
+		radius = N.where(i2 == 0, x2*N.sqrt(target/y2), x1 + (target - y1)*(x2 - x1)/(y2 - y1))
+		radius[~(totalFlux > 0)] = N.nan
+	return radius
+
+
+def PetrosianRadius( sma, intens, area, cumFlux, ratio=PETROSIAN_RATIO ):
+	"""Returns the Petrosian radius (semi-major axis where the ratio of the
+	isophotal intensity to the mean intensity inside the isophote,
+	I(a)/<I>(<a>), first drops below ratio) for each row of the input 2-D arrays,
+	interpolating linearly between isophotes.  area is the area within each
+	isophote, in the same units as cumFlux/intens (i.e., pixels for cumFlux
+	from CumulativeFlux).  Fits where the ratio never drops below the specified
+	value get NaN.
+	"""
+	sma = N.atleast_2d(sma)
+	intens = N.atleast_2d(intens)
+	area = N.atleast_2d(area)
+	cumFlux = N.atleast_2d(cumFlux)
+	rows = N.arange(sma.shape[0])
+	with N.errstate(invalid='ignore', divide='ignore'):
+		# I(a)/<I>(<a>), which --> 1 as a --> 0
+		eta = N.where(area > 0, intens*area/cumFlux, 1.0)
+		below = (eta < ratio)
+		below[:,0] = False
+		i2 = N.argmax(below, axis=1)
+		i1 = N.maximum(i2 - 1, 0)
+		x1, x2 = sma[rows,i1], sma[rows,i2]
+		e1, e2 = eta[rows,i1], eta[rows,i2]
+		radius = x1 + (ratio - e1)*(x2 - x1)/(e2 - e1)
+	return N.where(below.any(axis=1), radius, N.nan)
+
+
+def Photometry( efits, ZP=None, method="annuli", pix=None, petrosianRatio=PETROSIAN_RATIO,
+				petrosianFactor=PETROSIAN_FACTOR ):
+	"""Compute global photometric quantities from the curves of growth of one
+	or more ellipse fits (see CumulativeFlux for the types of input and for
+	method and pix).  Magnitudes are ZP - 2.5 log10(flux), where flux is in
+	counts (intensity x pixels) and ZP is the magnitude zero point for counts
+	(if ZP=None, instrumental magnitudes with ZP = 0 are returned).
+
+	Returns a numpy structured array with one entry per ellipse fit (or a single
+	record, for a single ellipse fit) with fields:
+		"name" = tableFile attribute, dictionary key, or index of the fit
+		"nPts" = number of isophotes
+		"totalFlux", "totalMag" = flux and magnitude within the outermost isophote
+		"r_e", "r_90" = semi-major axes containing 50% and 90% of totalFlux
+		"concentration" = r_90/r_e
+		"r_petro" = Petrosian radius (see PetrosianRadius), for the ratio petrosianRatio
+		"petroFlux", "petroMag" = flux and magnitude within petrosianFactor*r_petro
+			(NaN if that is outside the outermost isophote)
+	Radii are in the same units as the "sma" column.
+	"""
+	if ZP is None:
+		ZP = 0.0
+	fitList, names, single = _FitList(efits)
+	sma, intens, area, cumFlux = _GrowthArrays(fitList, method, pix)
+
+	nameLength = max([1] + [ len(name) for name in names ])
+	dtype = [("name", "S%d" % nameLength), ("nPts", int), ("totalFlux", float),
+			("totalMag", float), ("r_e", float), ("r_90", float), ("concentration", float),
+			("r_petro", float), ("petroFlux", float), ("petroMag", float)]
+	photArray = N.zeros(len(fitList), dtype=dtype)
+	photArray["name"] = names
+	photArray["nPts"] = (~N.isnan(sma)).sum(axis=1)
+	totalFlux = TotalFlux(cumFlux)
+	photArray["totalFlux"] = totalFlux
+	photArray["r_e"] = FractionRadius(sma, cumFlux, 0.5, totalFlux)
+	photArray["r_90"] = FractionRadius(sma, cumFlux, 0.9, totalFlux)
+	photArray["r_petro"] = PetrosianRadius(sma, intens, area, cumFlux, petrosianRatio)
+	photArray["petroFlux"] = _InterpolateRows(sma, cumFlux, petrosianFactor*photArray["r_petro"])
+	with N.errstate(invalid='ignore', divide='ignore'):
+		photArray["concentration"] = photArray["r_90"] / photArray["r_e"]
+		photArray["totalMag"] = ZP - 2.5*N.log10(totalFlux)
+		photArray["petroMag"] = ZP - 2.5*N.log10(photArray["petroFlux"])
+
+	if single:
+		return photArray[0]
+	return photArray
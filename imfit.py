@@ -1,5 +1,7 @@
 # Code for reading in and analyzing output of profilefit and imfit
 
+import os, inspect
+import numpy as N
 import astro_funcs as af
 
 
@@ -23,6 +25,28 @@ imfitFunctionMap = {"Exponential": {"function": af.Exponential, "nSkip": 2, "ell
 				"BrokenExponential":  {"function": af.BrokenExp, "nSkip": 2, "ell": 1, "a": [3,4,5]}}
 
 
+# dictionary mapping function names (from functionMap and imfitFunctionMap) to the unit
+# types of each of the function's own parameters (i.e., not including X0, Y0), in order:
+# "sb" = surface brightness (mag arcsec^-2 or counts/pixel), "length" = length (arcsec
+# or pixels), "inverse_length" (e.g., BrokenExponential alpha), None = dimensionless
+# or angle
+parameterUnits = {"Exponential-1D": ["sb", "length"],
+				"Sersic-1D": [None, "sb", "length"],
+				"Gaussian-1D": ["sb", "length"],
+				"Gaussian2Side-1D": ["sb", "length", "length"],
+				"Moffat-1D": ["sb", "length", None],
+				"Sech-1D": ["sb", "length"],
+				"Sech2-1D": ["sb", "length"],
+				"vdKSech-1D": ["sb", "length", None],
+				"BrokenExponential-1D": ["sb", "length", "length", "length", "inverse_length"],
+				"Exponential": [None, None, "sb", "length"],
+				"Exponential_GenEllipse": [None, None, None, "sb", "length"],
+				"Sersic": [None, None, None, "sb", "length"],
+				"Sersic_GenEllipse": [None, None, None, None, "sb", "length"],
+				"Gaussian": [None, None, "sb", "length"],
+				"BrokenExponential": [None, None, "sb", "length", "length", "length", "inverse_length"]}
+
+
 def ChopComments( theLine ):
 	return theLine.split("#")[0]
 
@@ -37,6 +61,257 @@ def GetFunctionImageNames( baseName, funcNameList ):
 	return imageNameList
 
 
+class ConfigModel(object):
+	"""Structured description of the model in an imfit or profilefit config file
+	(or best-fit parameter file), as returned by ParseConfigFile.
+
+	All parameters -- including the X0 (and Y0, for imfit) values -- are stored
+	in flat lists: paramNames, values, lowerLimits, upperLimits (None if no
+	limits) and fixed.  For function i:
+		functionNames[i] = function name as given in the file
+		functions[i] = corresponding 1-D astro_funcs function
+		centerIndices[i] = indices of the X0 (and Y0) parameters for the function's
+			block (functions in the same block share them)
+		paramIndices[i] = indices of the function's own parameters
+	Other settings lines (e.g., "GAIN  4.5") are kept, in order, in the list options.
+	imfitFormat is True if the file contains Y0 lines.
+	"""
+
+	def __init__(self):
+		self.imfitFormat = False
+		self.options = []
+		self.functionNames = []
+		self.functions = []
+		self.centerIndices = []
+		self.paramIndices = []
+		self.paramNames = []
+		self.values = []
+		self.lowerLimits = []
+		self.upperLimits = []
+		self.fixed = []
+
+	def AddParameter(self, name, value, lowerLimit=None, upperLimit=None, fixed=False):
+		"""Add a parameter to the flat parameter lists; returns its index."""
+		self.paramNames.append(name)
+		self.values.append(value)
+		self.lowerLimits.append(lowerLimit)
+		self.upperLimits.append(upperLimit)
+		self.fixed.append(fixed)
+		return len(self.values) - 1
+
+	def Copy(self):
+		"""Returns an independent copy of the model (the flat lists can then be
+		modified without affecting the original)."""
+		newModel = ConfigModel()
+		newModel.imfitFormat = self.imfitFormat
+		newModel.options = list(self.options)
+		newModel.functionNames = list(self.functionNames)
+		newModel.functions = list(self.functions)
+		newModel.centerIndices = [ list(indices) for indices in self.centerIndices ]
+		newModel.paramIndices = [ list(indices) for indices in self.paramIndices ]
+		for name in ["paramNames", "values", "lowerLimits", "upperLimits", "fixed"]:
+			setattr(newModel, name, list(getattr(self, name)))
+		return newModel
+
+	def FunctionIndices(self, i):
+		"""Returns indices of the parameter vector for 1-D function i of a
+		profilefit model: [X0 index, own-parameter indices...].
+		"""
+		return self.centerIndices[i][:1] + self.paramIndices[i]
+
+	def ParameterIndex(self, i, paramName):
+		"""Returns the flat index of the parameter named paramName in function i."""
+		for j in self.paramIndices[i]:
+			if self.paramNames[j] == paramName:
+				return j
+		msg = "function %d (%s) has no parameter named \"%s\"" % (i, self.functionNames[i], paramName)
+		raise KeyError(msg)
+
+	def GetValue(self, i, paramName):
+		return self.values[self.ParameterIndex(i, paramName)]
+
+	def SetValue(self, i, paramName, value):
+		self.values[self.ParameterIndex(i, paramName)] = value
+
+	def GetParameterLists(self, values=None):
+		"""Returns a list of per-function parameter lists for the 1-D astro_funcs
+		functions, using the flat vector values (default = self.values).  For
+		profilefit models, this is [X0, p1, p2, ...] (as from ReadConfigFile); for
+		imfit models, it is [0.0, ...] followed by the non-2D parameters (as from
+		ReadImfitConfigFile with the default arguments).
+		"""
+		if values is None:
+			values = self.values
+		paramLists = []
+		for i in range(len(self.functionNames)):
+			if self.imfitFormat:
+				nSkip = imfitFunctionMap[self.functionNames[i]]["nSkip"]
+				paramLists.append([0.0] + [ values[j] for j in self.paramIndices[i][nSkip:] ])
+			else:
+				paramLists.append([ values[j] for j in self.FunctionIndices(i) ])
+		return paramLists
+
+	def Evaluate(self, r, values=None, mag=True):
+		"""Compute the total 1-D model profile at r.  If mag=True, the (intensity)
+		parameters are surface brightnesses and the output is in magnitudes;
+		the components are always added in intensity.
+		"""
+		paramLists = self.GetParameterLists(values)
+		I = N.zeros(N.shape(r))
+		for i in range(len(self.functions)):
+			I = I + self.functions[i](r, paramLists[i], mag, False)
+		if mag:
+			return -2.5*N.log10(I)
+		return I
+
+	def Write(self, fileName, header=None):
+		"""Write the model to a config file in the same format (imfit or profilefit)
+		as it was read, including limits and fixed flags.  Optionally, header
+		(a string or list of strings) is written first as comment lines.
+		"""
+		outf = open(fileName, 'w')
+		if header is not None:
+			if type(header) is str:
+				header = [header]
+			for line in header:
+				outf.write("# %s\n" % line)
+			outf.write("\n")
+		for line in self.options:
+			outf.write(line + "\n")
+		if len(self.options) > 0:
+			outf.write("\n")
+		currentCenter = None
+		for i in range(len(self.functionNames)):
+			if self.centerIndices[i] != currentCenter:
+				currentCenter = self.centerIndices[i]
+				for j in currentCenter:
+					outf.write(self.ParameterLine(j))
+			outf.write("FUNCTION %s\n" % self.functionNames[i])
+			for j in self.paramIndices[i]:
+				outf.write(self.ParameterLine(j))
+			outf.write("\n")
+		outf.close()
+
+	def ParameterLine(self, j, comment=None):
+		"""Returns config-file line for parameter j (with newline)."""
+		line = "%s\t\t%.10g" % (self.paramNames[j], self.values[j])
+		if self.fixed[j]:
+			line += "\t\tfixed"
+		elif self.lowerLimits[j] is not None:
+			line += "\t\t%.10g,%.10g" % (self.lowerLimits[j], self.upperLimits[j])
+		if comment is not None:
+			line += "\t\t# %s" % comment
+		return line + "\n"
+
+
+# cache for ParseConfigFile: absolute path --> (mtime, size, ConfigModel)
+_configCache = {}
+
+def _ParseLimits( limitString ):
+	"""Parse a parameter-limit specification ("fixed" or "lower,upper") from a
+	config file; returns tuple of (lowerLimit, upperLimit, fixed).
+	"""
+	if limitString.lower() == "fixed":
+		return (None, None, True)
+	pp = limitString.split(",")
+	lowerLimit = float(pp[0])
+	upperLimit = float(pp[1])
+	if lowerLimit > upperLimit:
+		lowerLimit, upperLimit = upperLimit, lowerLimit
+	return (lowerLimit, upperLimit, (lowerLimit == upperLimit))
+
+
+def _ParseParameterLine( model, pp ):
+	"""Add the parameter on a (split) config-file line to model; returns its index."""
+	if len(pp) > 2:
+		(lowerLimit, upperLimit, fixed) = _ParseLimits("".join(pp[2:]))
+	else:
+		(lowerLimit, upperLimit, fixed) = (None, None, False)
+	return model.AddParameter(pp[0], float(pp[1]), lowerLimit, upperLimit, fixed)
+
+
+def _ParseConfigText( text ):
+	"""Parse the contents of an imfit or profilefit config file; returns a ConfigModel.
+	Raises ValueError if a function name is not known for the file's format
+	(functionMap for profilefit files, imfitFunctionMap for imfit files).
+	"""
+
+	model = ConfigModel()
+	currentCenter = []
+	newBlock = True
+	currentIndices = None
+	for line in text.splitlines():
+		pp = ChopComments(line).split()
+		if len(pp) == 0:
+			continue
+		if pp[0] in ["X0", "Y0"]:
+			if newBlock:
+				currentCenter = []
+				newBlock = False
+			if pp[0] == "Y0":
+				model.imfitFormat = True
+			currentCenter.append(_ParseParameterLine(model, pp))
+		elif pp[0] == "FUNCTION":
+			newBlock = True
+			if len(currentCenter) == 0:
+				# no X0 before first function: profilefit default of X0 = 0
+				currentCenter = [model.AddParameter("X0", 0.0, fixed=True)]
+			fname = pp[1]
+			model.functionNames.append(fname)
+			model.centerIndices.append(currentCenter)
+			currentIndices = []
+			model.paramIndices.append(currentIndices)
+		elif currentIndices is None:
+			# setting (e.g., GAIN) preceding the function definitions
+			model.options.append(" ".join(pp))
+		else:
+			currentIndices.append(_ParseParameterLine(model, pp))
+
+	# function lookup waits until the format (Y0 present or not) is known
+	for fname in model.functionNames:
+		if model.imfitFormat:
+			if fname not in imfitFunctionMap:
+				msg = "unknown imfit function \"%s\" in config file" % fname
+				raise ValueError(msg)
+			model.functions.append(imfitFunctionMap[fname]["function"])
+		else:
+			if fname not in functionMap:
+				msg = "unknown profilefit function \"%s\" in config file" % fname
+				raise ValueError(msg)
+			model.functions.append(functionMap[fname])
+	return model
+
+
+def ParseConfigFile( fileName, useCache=True ):
+	"""Read and parse an imfit or profilefit config file (or best-fit parameter
+	file), returning a ConfigModel instance with function names, parameter
+	names, values, limits and fixed flags.
+
+	Parsed files are cached by path, modification time and size; repeated calls
+	for an unchanged file return a copy of the cached model (so the result can be
+	modified freely).  Set useCache=False to force re-parsing.  Raises
+	ValueError (naming the file) if the file uses an unknown function.
+	"""
+
+	path = os.path.abspath(fileName)
+	fileStat = os.stat(path)
+	if useCache and path in _configCache:
+		(mtime, size, model) = _configCache[path]
+		if mtime == fileStat.st_mtime and size == fileStat.st_size:
+			return model.Copy()
+	try:
+		model = _ParseConfigText(open(path).read())
+	except ValueError, e:
+		raise ValueError("%s: %s" % (fileName, e))
+	_configCache[path] = (fileStat.st_mtime, fileStat.st_size, model)
+	return model.Copy()
+
+
+def WriteConfigFile( model, fileName, header=None ):
+	"""Write a ConfigModel to a file; see ConfigModel.Write."""
+	model.Write(fileName, header)
+
+
 def ReadImfitConfigFile( fileName, minorAxis=False, pix=1.0, getNames=False, X0=0.0 ):
 	"""Function to read and parse an imfit-generated parameter file
 	(or input config file) and return a tuple consisting of:
@@ -52,68 +327,33 @@ def ReadImfitConfigFile( fileName, minorAxis=False, pix=1.0, getNames=False, X0=
 		Returns tuple of (functionNameList, functionList, trimmedParameterList)
 	"""
 	
-	dlines = [ line for line in open(fileName) if len(line.strip()) > 0 and line[0] != "#" ]
-
-	funcNameList = []
-	paramMetaList = []
-	currentParamList = []
-	nLines = len(dlines)
-	for line in dlines:
-		trimmedLine = ChopComments(line)
-		#print(trimmedLine)
-		if trimmedLine.find("X0") == 0:
-			continue
-		if trimmedLine.find("Y0") == 0:
-			continue
-		if trimmedLine.find("FUNCTION") == 0:
-			# if this isn't the first function, store the previous set of parameters
-			if len(currentParamList) > 0:
-				paramMetaList.append(currentParamList)
-			# make a new parameter list for the new function
-			currentParamList = [X0]
-			pp = trimmedLine.split()
-			fname = pp[1].strip()
-			funcNameList.append(fname)
-			continue
-		else:
-			pp = trimmedLine.split()
-			newValue = float(pp[1])
-			currentParamList.append(newValue)
-
-	# ensure that final set of parameters get stored:
-	paramMetaList.append(currentParamList)
-	
-	# process function list to remove unneeded parameters (and convert size measures
-	# from major-axis to minor-axis, if requested)
+	model = ParseConfigFile(fileName)
+	funcNameList = model.functionNames
 	funcList = [ imfitFunctionMap[fname]["function"] for fname in funcNameList ]
 	trimmedParamList = []
 	nFuncs = len(funcList)
 	for i in range(nFuncs):
 		fname = funcNameList[i]
 		nSkipParams = imfitFunctionMap[fname]["nSkip"]
-		fullParams = paramMetaList[i]
+		fullParams = [ model.values[j] for j in model.paramIndices[i] ]
 		# calculate scaling factor for minor-axis values, if needed
 		if minorAxis is True:
-			print fname
 			ellIndex = imfitFunctionMap[fname]["ell"]
-			print ellIndex
-			ell = fullParams[ellIndex+1]
+			ell = fullParams[ellIndex]
 			q = 1.0 - ell
 		else:
 			q = 1.0
-		print i, fname
 		smaIndices = imfitFunctionMap[fname]["a"]
 		# convert length values to arcsec and/or minor-axis, if needed,
 		for smaIndex in smaIndices:
-			# +1 to account for X0 value at beginning of parameter list
-			fullParams[smaIndex+1] = pix*q*fullParams[smaIndex+1]
+			fullParams[smaIndex] = pix*q*fullParams[smaIndex]
 		# construct the final 1-D parameter set for this function: X0 value, followed
 		# by post-2D-shape parameters
-		trimmedParams = [fullParams[0]]
-		trimmedParams.extend(fullParams[nSkipParams+1:])
+		trimmedParams = [X0]
+		trimmedParams.extend(fullParams[nSkipParams:])
 		trimmedParamList.append(trimmedParams)
-		
-	
+
+
 	if getNames is True:
 		return (funcNameList, funcList, trimmedParamList)
 	else:
@@ -126,39 +366,211 @@ def ReadConfigFile( fileName ):
 	(list of astro_funcs functions, list of lists of parameters)
 	"""
 	
-	dlines = [ line for line in open(fileName) if len(line.strip()) > 0 and line[0] != "#" ]
-
-	currentX0 = 0.0
-
-	funcList = []
-	paramMetaList = []
-	currentParamList = []
-	for line in dlines:
-		trimmedLine = ChopComments(line)
-		if trimmedLine.find("X0") == 0:
-			pp = trimmedLine.split()
-			currentX0 = float(pp[1])
-			continue
-		if trimmedLine.find("Y0") == 0:
-			print("WARNING: 'Y0' entry found!  This is not a profilefit-compatible config file!")
+	model = ParseConfigFile(fileName)
+	if model.imfitFormat:
+		print("WARNING: 'Y0' entry found!  This is not a profilefit-compatible config file!")
+	funcList = [ functionMap[fname] for fname in model.functionNames ]
+	return (funcList, model.GetParameterLists())
+
+
+
+# Conversion of model parameters between (mag arcsec^-2, arcsec) and (counts/pixel, pixels)
+
+def ParameterUnitTypes( model ):
+	"""Returns a list giving the unit type (see parameterUnits) of each parameter in
+	the flat parameter list of a ConfigModel.  The X0 (and Y0) parameters have
+	type None, so they are never converted (profile centers and image coordinates
+	are left as they are).
+	"""
+	unitTypes = [None] * len(model.values)
+	for i in range(len(model.functionNames)):
+		funcUnits = parameterUnits[model.functionNames[i]]
+		for k, j in enumerate(model.paramIndices[i]):
+			unitTypes[j] = funcUnits[k]
+	return unitTypes
+
+
+def ConvertParameterArray( paramArray, unitTypes, ZP, pix, toCounts=True ):
+	"""Convert a whole batch of flat parameter vectors in one step.  paramArray
+	has shape (nModels, nParams) (or (nParams,) for a single model) and
+	unitTypes is the corresponding list from ParameterUnitTypes.  ZP (magnitude
+	zero point) and pix (arcsec/pixel) can be scalars or vectors of length
+	nModels (e.g., for a multi-instrument sample).
+
+	If toCounts=True, surface brightnesses are converted from mag arcsec^-2 to
+	counts/pixel via I = 10**(0.4*(ZP - mu)), and lengths from arcsec to pixels
+	(divided by pix); if toCounts=False, the reverse conversion is done.
+
+	Returns a new array with the same shape as paramArray.
+	"""
+
+	paramArray = N.array(paramArray, float)
+	singleModel = (paramArray.ndim == 1)
+	paramArray = N.atleast_2d(paramArray)
+	ZP = N.asarray(ZP, float).reshape(-1, 1)
+	pix = N.asarray(pix, float).reshape(-1, 1)
+	unitTypes = N.array(unitTypes, dtype=object)
+	sbCols = (unitTypes == "sb")
+	lengthCols = (unitTypes == "length")
+	invLengthCols = (unitTypes == "inverse_length")
+	if toCounts:
+		paramArray[:,sbCols] = 10**(0.4*(ZP - paramArray[:,sbCols]))
+		lengthScale = 1.0/pix
+	else:
+		paramArray[:,sbCols] = ZP - 2.5*N.log10(paramArray[:,sbCols])
+		lengthScale = pix
+	paramArray[:,lengthCols] = paramArray[:,lengthCols] * lengthScale
+	paramArray[:,invLengthCols] = paramArray[:,invLengthCols] / lengthScale
+	if singleModel:
+		return paramArray[0]
+	return paramArray
+
+
+def ConvertModel( model, ZP, pix, toCounts=True ):
+	"""Returns a copy of the ConfigModel model with parameter values and limits
+	converted (see ConvertParameterArray) using zero point ZP and pixel scale pix.
+	"""
+
+	newModel = model.Copy()
+	unitTypes = ParameterUnitTypes(model)
+	newModel.values = list(ConvertParameterArray(model.values, unitTypes, ZP, pix, toCounts))
+	for j in range(len(model.values)):
+		if model.lowerLimits[j] is None:
 			continue
-		if trimmedLine.find("FUNCTION") == 0:
-			# if this isn't the first function, store the previous set of parameters
-			if len(currentParamList) > 0:
-				paramMetaList.append(currentParamList)
-			# make a new parameter list for the new function
-			currentParamList = [currentX0]
-			pp = trimmedLine.split()
-			fname = pp[1].strip()
-			newFunc = functionMap[fname]
-			funcList.append(newFunc)
-		else:
-			pp = trimmedLine.split()
-			newValue = float(pp[1])
-			currentParamList.append(newValue)
+		limits = ConvertParameterArray([[model.lowerLimits[j]], [model.upperLimits[j]]],
+									[unitTypes[j]], ZP, pix, toCounts)[:,0]
+		# conversion between magnitudes and intensities reverses the order
+		newModel.lowerLimits[j] = min(limits)
+		newModel.upperLimits[j] = max(limits)
+	return newModel
+
+
+
+# Evaluation of the (1-D) models described by config files
+
+class CompiledModel(object):
+	"""A multi-component 1-D model, built once from the (functionList,
+	parameterList) output of ReadConfigFile or ReadImfitConfigFile (or any
+	equivalent pair of lists), which can then be evaluated repeatedly on
+	new radius vectors and/or with new parameter values.
+
+	The calling convention of each function (whether it accepts mag and
+	magOutput) is determined once, when the model is built.  Evaluation
+	adds all components in intensity and -- if mag=True, meaning that the
+	parameters are surface brightnesses and the output should be in
+	magnitudes -- converts the total to magnitudes only at the end.
+
+	Example:
+		>>> model = CompiledModel(*ReadConfigFile("fit.profilefit"))
+		>>> mu = model(r)
+		>>> mu_new = model(r_new, newParamList)
+	"""
 
-	# ensure that final set of parameters get stored:
-	paramMetaList.append(currentParamList)
+	def __init__(self, functionList, parameterList, mag=True, functionNames=None):
+		self.functions = list(functionList)
+		self.functionNames = functionNames
+		self.mag = mag
+		self.nFunctions = len(self.functions)
+		# calling convention for each function: "magOutput" = can return intensity
+		# directly; "mag" = accepts mag keyword only; None = func(r, params)
+		self.callTypes = []
+		for func in self.functions:
+			argNames = inspect.getargspec(func)[0]
+			if "magOutput" in argNames:
+				self.callTypes.append("magOutput")
+			elif "mag" in argNames:
+				self.callTypes.append("mag")
+			else:
+				self.callTypes.append(None)
+		self.SetParameters(parameterList)
 
-	return (funcList, paramMetaList)
+	def SetParameters(self, parameterList):
+		"""Replace the current parameters (list of per-function parameter lists)."""
+		if len(parameterList) < self.nFunctions:
+			msg = "CompiledModel: %d parameter lists for %d functions!" % (len(parameterList),
+						self.nFunctions)
+			raise ValueError(msg)
+		self.parameterList = [ list(params) for params in parameterList ]
+		self.nParams = [ len(params) for params in self.parameterList ]
+		self.offsets = N.cumsum([0] + self.nParams)
 
+	def GetParameterVector(self):
+		"""Returns all the current parameters as one flat array."""
+		return N.concatenate([ N.asarray(params, float) for params in self.parameterList ])
+
+	def SetParameterVector(self, paramVector):
+		"""Replace the current parameters with values from a flat vector (same
+		ordering as GetParameterVector).
+		"""
+		self.parameterList = [ list(paramVector[self.offsets[i]:self.offsets[i + 1]])
+								for i in range(self.nFunctions) ]
+
+	def ComponentIntensities(self, r, parameterList=None):
+		"""Returns a list of the individual component profiles at r, in
+		intensity units.
+		"""
+		if parameterList is None:
+			parameterList = self.parameterList
+		intensities = []
+		for i in range(self.nFunctions):
+			func = self.functions[i]
+			callType = self.callTypes[i]
+			if callType == "magOutput":
+				I = func(r, parameterList[i], self.mag, False)
+			else:
+				if callType == "mag":
+					yVals = func(r, parameterList[i], mag=self.mag)
+				else:
+					yVals = func(r, parameterList[i])
+				if self.mag:
+					I = 10**(-0.4*N.asarray(yVals))
+				else:
+					I = yVals
+			intensities.append(I)
+		return intensities
+
+	def Components(self, r, parameterList=None):
+		"""Returns a list of the individual component profiles at r (in
+		magnitudes if mag=True).
+		"""
+		return self.EvaluateWithComponents(r, parameterList)[1]
+
+	def Evaluate(self, r, parameterList=None):
+		"""Returns the total model profile at r (in magnitudes if mag=True),
+		using parameterList if supplied, or else the current parameters.
+		"""
+		I_total = N.zeros(N.shape(r))
+		for I in self.ComponentIntensities(r, parameterList):
+			I_total = I_total + I
+		if self.mag:
+			return -2.5*N.log10(I_total)
+		return I_total
+
+	def EvaluateWithComponents(self, r, parameterList=None):
+		"""Returns a tuple of (total model profile, list of individual component
+		profiles) at r (in magnitudes if mag=True), with each component evaluated
+		only once.
+		"""
+		intensities = self.ComponentIntensities(r, parameterList)
+		I_total = N.zeros(N.shape(r))
+		for I in intensities:
+			I_total = I_total + I
+		if self.mag:
+			return (-2.5*N.log10(I_total), [ -2.5*N.log10(I) for I in intensities ])
+		return (I_total, intensities)
+
+	def __call__(self, r, parameterList=None):
+		return self.Evaluate(r, parameterList)
+
+
+def CompileConfigFile( fileName, imfitFormat=False, mag=True, **kwargs ):
+	"""Read a profilefit config/parameter file (or an imfit file, if
+	imfitFormat=True; extra keywords are passed to ReadImfitConfigFile)
+	and return the corresponding CompiledModel.
+	"""
+	if imfitFormat:
+		(funcNames, funcList, paramList) = ReadImfitConfigFile(fileName, getNames=True, **kwargs)
+		return CompiledModel(funcList, paramList, mag, funcNames)
+	else:
+		(funcList, paramList) = ReadConfigFile(fileName)
+		return CompiledModel(funcList, paramList, mag)
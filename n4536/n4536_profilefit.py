@@ -1,19 +1,15 @@
-import os, subprocess
+import os
 import numpy as n
 import pylab as p
-import profiles, imfit, plotutils
+import profiles, imfit, plotutils, profilefit
 import concatenate_nicmos_sings
 
 d = os.path.expanduser("~/research/2012/smbhpb/data/n4536/profilefit_tinybulge/")
 d = os.path.expanduser("~/research/2012/smbhpb/data/n4536/profilefit/")
-exe = os.path.expanduser("~/research/2012/smbhpb/code/imfit/profilefit")
 datfile = d + "n4536_nicmosirac1_pa120.0_w1.dat"
 cfgfile = d + "n4536_nicmosirac1_pa120.0_w1.config"
 outfile = d + "n4536_nicmosirac1_pa120.0_w1.profilefit"
-opt1 = "--usemask"
-opt2 = "--save-params"
-
-subprocess.call([exe, datfile, cfgfile, opt1, opt2, outfile])
+profilefit.FitProfileFile(datfile, cfgfile, outfile, useMask=True)
 
 r_dat, mu_dat = profiles.ReadProfile(datfile)
 
@@ -1,18 +1,14 @@
-import os, subprocess
+import os
 import numpy as n
 import pylab as p
-import profiles, imfit, plotutils
+import profiles, imfit, plotutils, profilefit
 import match_n4536_elfixed0epa
 
 d = os.path.expanduser("~/research/2012/smbhpb/data/n4536/profilefit_ellipse/")
-exe = os.path.expanduser("~/research/2012/smbhpb/code/imfit/profilefit")
 datfile = d + "n4536_nicmosirac1_el_fixed0epa.dat"
 cfgfile = d + "n4536_nicmosirac1_el_fixed0epa.config"
 outfile = d + "n4536_nicmosirac1_el_fixed0epa.profilefit"
-opt1 = "--usemask"
-opt2 = "--save-params"
-
-subprocess.call([exe, datfile, cfgfile, opt1, opt2, outfile])
+profilefit.FitProfileFile(datfile, cfgfile, outfile, useMask=True)
 
 r_dat, mu_dat = profiles.ReadProfile(datfile)
 
@@ -9,6 +9,7 @@ import pyfits
 
 #import astro_utils
 import profiles
+import imfit
 
 
 PATH_TO_EPSTOPDF = "/usr/texbin/epstopdf"
@@ -184,7 +185,21 @@ def PlotFuncsWithSum( xVals, funcList, paramList, fmtList=["b--", "r--", "g--",
 		plt.ylim(yrange[0], yrange[1])
 
 
-def GetFuncSum( xVals, funcList, paramList, mag=True ):
+# most recently used CompiledModel in GetFuncSum, as tuple of ((funcList, mag), model)
+_funcSumModel = None
+
+def _GetCompiledModel( funcList, paramList, mag ):
+	"""Returns a CompiledModel for the functions in funcList, reusing the one
+	from the previous call if the functions and mag are the same.
+	"""
+	global _funcSumModel
+	key = (tuple(funcList), mag)
+	if _funcSumModel is None or _funcSumModel[0] != key:
+		_funcSumModel = (key, imfit.CompiledModel(funcList, paramList, mag))
+	return _funcSumModel[1]
+
+
+def GetFuncSum( xVals, funcList, paramList, mag=True, compiledModel=None ):
 	"""Given a vector of x-values and two lists containing functions and corresponding
 	parameter vectors, return the sum of the functions.
 	Functions in funcList must have the signature func(xVals, params), where params is
@@ -194,42 +209,29 @@ def GetFuncSum( xVals, funcList, paramList, mag=True ):
 		paramList = list parameter vectors (i.e., a list of lists, or tuple of tuples)
 		mag=True --> parameters in paramList are magnitudes, and output should be in
 			magnitudes as well
+		compiledModel = optional imfit.CompiledModel for funcList (and mag) to use
+			for the evaluation; if paramList is None, its current parameters are used
+
+	Without compiledModel, the CompiledModel from the previous call is reused when
+	funcList and mag are unchanged, so repeated calls with new x-values or
+	parameters do not re-inspect the functions.
 	"""
 
-	nX = len(xVals)
-	nFuncs = len(funcList)
-	
-	yValList = []
-	for i in range(nFuncs):
-		thisFunc = funcList[i]
-		# check to see if this function has a "mag" keyword
-		if "mag" in inspect.getargspec(thisFunc)[0]:
-			yVals = funcList[i](xVals, paramList[i], mag=mag)
-		else:
-			yVals = funcList[i](xVals, paramList[i])
-		yValList.append(yVals)
-	
-	# make combined profile
-	combinedVals = N.zeros(nX)
-	if mag:
-		combinedVals = yValList[0]
-		for i in range(1, nFuncs):
-			combinedVals = addmag(combinedVals, yValList[i])
-	else:
-		for i in range(nFuncs):
-			combinedVals += yValList[i]
-	
-	return combinedVals
+	if compiledModel is None:
+		compiledModel = _GetCompiledModel(funcList, paramList, mag)
+	return compiledModel.Evaluate(xVals, paramList)
 
 
 
 def PlotFit( xVals, yDataVals, fitFuncList, fitParamList, x_fitted=None, y_fitted=None,
 				fmtList=["b--", "r--", "g--", "m--"], fmtSum="k", mag=True, 
 				xlog=False, ylog=False, xrange=None, yrange=None, residrange=None, ms=5,
-				ylabel=None, filterName=None, title=None ):
+				ylabel=None, filterName=None, title=None, compiledModel=None ):
 	"""Plots data w/ fit, including a separate panel for residuals.
 		x_fitted = range of x-values to plot as filled circles (actual data fitted)
 		y_fitted = range of y-values to plot as filled circles (actual data fitted)
+		compiledModel = optional imfit.CompiledModel for fitFuncList (and mag);
+			otherwise, one is built (once) from fitFuncList and fitParamList
 	"""
 	
 	nX = len(xVals)
@@ -268,22 +270,18 @@ def PlotFit( xVals, yDataVals, fitFuncList, fitParamList, x_fitted=None, y_fitte
 		plt.plot(x_fitted, y_fitted, 'ko', ms=ms)
 	
 	# 2.a Plot individual-function sub-profiles
-	yValList = []
+	if compiledModel is None:
+		model = imfit.CompiledModel(fitFuncList, fitParamList, mag)
+	else:
+		model = compiledModel
+	(combinedVals, yValList) = model.EvaluateWithComponents(xVals, fitParamList)
 	for i in range(nFuncs):
-		thisFunc = fitFuncList[i]
-		# check to see if this function accepts a "mag" keyword
-		if "mag" in inspect.getargspec(thisFunc)[0]:
-			yVals = fitFuncList[i](xVals, fitParamList[i], mag=mag)
-		else:
-			yVals = fitFuncList[i](xVals, fitParamList[i])
 		if (xlog is True):
-			plt.semilogx(xVals, yVals, fmtList[i])
+			plt.semilogx(xVals, yValList[i], fmtList[i])
 		else:
-			plt.plot(xVals, yVals, fmtList[i])
-		yValList.append(yVals)
+			plt.plot(xVals, yValList[i], fmtList[i])
 	
-	# 2.b Make & plot combined-functions profile
-	combinedVals = GetFuncSum(xVals, fitFuncList, fitParamList, mag=mag)
+	# 2.b Plot combined-functions profile
 #	combinedVals = N.zeros(nX)
 #	if mag:
 #		combinedVals = yValList[0]
@@ -328,7 +326,7 @@ def PlotFit( xVals, yDataVals, fitFuncList, fitParamList, x_fitted=None, y_fitte
 
 	# 2. Overplot residuals for fitted data (if latter supplied by user) as solid circles
 	if (x_fitted is not None) and (y_fitted is not None):
-		combinedVals_fitted = GetFuncSum(x_fitted, fitFuncList, fitParamList, mag=mag)
+		combinedVals_fitted = model.Evaluate(x_fitted, fitParamList)
 		residVals_fitted = y_fitted - combinedVals_fitted
 		plt.plot(x_fitted, residVals_fitted, 'ko', ms=ms)
 
@@ -0,0 +1,456 @@
+#!/usr/bin/env python
+#
+# In-process fitting of 1-D surface-brightness profiles with sums of the
+# astro_funcs functions, as an alternative to running the external profilefit
+# program.  Reads the same config files (FUNCTION blocks, X0, parameter limits)
+# and writes the same kind of best-fit parameter file (readable with
+# imfit.ReadConfigFile).
+#
+# Usage: python profilefit.py <data-file> <config-file> [--usemask] [--save-params <output-file>]
+#
+# FitProfileBatch fits the same model to many profiles using a pool of worker
+# processes.
+
+import sys, optparse, datetime, math, time, multiprocessing
+import numpy as N
+import scipy.optimize
+
+import astro_funcs as af
+import imfit
+import datautils as du
+
+
+# conversion from d(intensity)/I to d(magnitude)
+MAG_FACTOR = -2.5/math.log(10.0)
+# derivative of 10**(-0.4*mu) with respect to mu, divided by the intensity
+DIDMU_FACTOR = -0.4*math.log(10.0)
+# ProfileFitResult.status value for models with no free parameters
+STATUS_ALL_FIXED = 100
+
+
+class ProfileFitResult(object):
+	"""Holds the outcome of FitProfile: best-fit flat parameter vector (values)
+	and 1-sigma errors (errors; 0 for fixed parameters), per-function parameter
+	lists (params), chi^2 (or sum of squared residuals if no errors were used),
+	number of degrees of freedom, number of function evaluations, and the
+	status and message from scipy.optimize.least_squares.
+	"""
+	pass
+
+
+
+def ReadProfilefitConfig( fileName ):
+	"""Read and parse a profilefit config file (or profilefit-generated parameter
+	file), including parameter limits and "fixed" flags; returns an
+	imfit.ConfigModel instance.  If no X0 line precedes the first FUNCTION line,
+	X0 is fixed at 0.
+	"""
+	return imfit.ParseConfigFile(fileName)
+
+
+def ReadProfileData( fileName, useMask=False, useErrors=False ):
+	"""Read a profile data file (as written by profiles.WriteProfile): columns
+	are x, y, and optionally errors and mask (1 = bad value).  Returns a tuple of
+	(x, y, errs, mask), where errs is None unless useErrors=True, and mask is a
+	boolean array which is True for points to be *excluded* (mask column = 1,
+	if useMask=True, and any non-finite y values).
+	"""
+
+	dataArray = du.ReadTableArray(fileName)
+	x = dataArray[:,0]
+	y = dataArray[:,1]
+	errs = None
+	if useErrors:
+		errs = dataArray[:,2]
+	mask = ~N.isfinite(y)
+	if useMask:
+		mask = mask | (dataArray[:,3] > 0)
+	return (x, y, errs, mask)
+
+
+
+# Analytic derivatives of component intensities with respect to each of the
+# function's parameters (including X0); each function returns a list of arrays,
+# one per parameter.  If mag=True, the intensity parameter is in magnitudes.
+
+def _IntensityDerivative( I, I_param, mag ):
+	if mag:
+		return DIDMU_FACTOR * I
+	return I / I_param
+
+
+def _ExponentialJacobian( r, params, mag ):
+	X = r - params[0]
+	R = N.abs(X)
+	h = params[2]
+	I = af.Exponential(r, params, mag, False)
+	return [I*N.sign(X)/h, _IntensityDerivative(I, params[1], mag), I*R/(h*h)]
+
+
+def _SersicJacobian( r, params, mag ):
+	X = r - params[0]
+	R = N.abs(X)
+	n, r_e = params[1], params[3]
+	I = af.Sersic(r, params, mag, False)
+	bn = af.b_n(n)
+	dbn_dn = af.db_n_dn(n)
+	x = R/r_e
+	safeX = N.where(x > 0, x, 1.0)
+	xn = N.where(x > 0, safeX**(1.0/n), 0.0)
+	dI_dn = I*(-dbn_dn*(xn - 1.0) + N.where(x > 0, bn*xn*N.log(safeX)/(n*n), 0.0))
+	dI_dre = I*bn*xn/(n*r_e)
+	dI_dx0 = N.where(x > 0, I*bn*xn/(n*safeX*r_e), 0.0) * N.sign(X)
+	return [dI_dx0, dI_dn, _IntensityDerivative(I, params[2], mag), dI_dre]
+
+
+def _GaussJacobian( r, params, mag ):
+	X = r - params[0]
+	sigma = params[2]
+	I = af.Gauss(r, params, mag, False)
+	return [I*X/(sigma*sigma), _IntensityDerivative(I, params[1], mag), I*X*X/(sigma**3)]
+
+
+def _SechJacobian( r, params, mag ):
+	X = r - params[0]
+	R = N.abs(X)
+	h = params[2]
+	I = af.Sech(r, params, mag, False)
+	tanhR = N.tanh(R/h)
+	return [I*tanhR*N.sign(X)/h, _IntensityDerivative(I, params[1], mag), I*tanhR*R/(h*h)]
+
+
+def _Sech2Jacobian( r, params, mag ):
+	X = r - params[0]
+	R = N.abs(X)
+	h = params[2]
+	I = af.Sech2(r, params, mag, False)
+	tanhR = N.tanh(R/h)
+	return [2*I*tanhR*N.sign(X)/h, _IntensityDerivative(I, params[1], mag), 2*I*tanhR*R/(h*h)]
+
+
+jacobianMap = {af.Exponential: _ExponentialJacobian, af.Sersic: _SersicJacobian,
+				af.Gauss: _GaussJacobian, af.Sech: _SechJacobian, af.Sech2: _Sech2Jacobian}
+
+
+def _NumericalJacobian( func, r, params, mag ):
+	"""Forward-difference derivatives of func's intensity for functions without
+	an entry in jacobianMap.
+	"""
+	I = func(r, params, mag, False)
+	derivs = []
+	for j in range(len(params)):
+		newParams = list(params)
+		step = 1.0e-7 * max(abs(params[j]), 1.0)
+		newParams[j] = params[j] + step
+		derivs.append((func(r, newParams, mag, False) - I) / step)
+	return derivs
+
+
+def ModelJacobian( model, r, values, mag=True ):
+	"""Returns tuple of (I, dI), where I is the total model intensity at r and dI
+	is an array with shape (len(r), len(values)) of its derivatives with respect
+	to all the parameters in the flat vector values.
+	"""
+
+	paramLists = model.GetParameterLists(values)
+	I = N.zeros(len(r))
+	dI = N.zeros((len(r), len(values)))
+	for i in range(len(model.functions)):
+		func = model.functions[i]
+		I = I + func(r, paramLists[i], mag, False)
+		if func in jacobianMap:
+			derivs = jacobianMap[func](r, paramLists[i], mag)
+		else:
+			derivs = _NumericalJacobian(func, r, paramLists[i], mag)
+		for j, paramIndex in enumerate(model.FunctionIndices(i)):
+			dI[:,paramIndex] += derivs[j]
+	return (I, dI)
+
+
+def FitProfile( r, y, model, errs=None, mask=None, mag=True, initialValues=None ):
+	"""Fit the imfit.ConfigModel model to the profile (r, y), using
+	scipy.optimize.least_squares with analytic Jacobians (where available; see
+	jacobianMap) and the parameter limits and fixed flags from the model.
+
+	If mag=True, y is in magnitudes (surface brightness) and the intensity
+	parameters of the model are surface brightnesses; the residuals are computed
+	in magnitudes.  Otherwise, the fit is done in intensity.
+
+	errs = optional vector of 1-sigma errors for y (residuals are divided by
+	errs); mask = optional boolean vector which is True for points to exclude.
+	initialValues = optional flat vector of starting values (default = model.values).
+
+	Returns a ProfileFitResult instance.
+	"""
+
+	r = N.asarray(r, float)
+	y = N.asarray(y, float)
+	good = N.isfinite(y)
+	if mask is not None:
+		good = good & ~N.asarray(mask, bool)
+	r = r[good]
+	y = y[good]
+	if errs is not None:
+		weights = 1.0/N.asarray(errs, float)[good]
+	else:
+		weights = N.ones(len(y))
+
+	if initialValues is None:
+		initialValues = model.values
+	allValues = N.array(initialValues, float)
+	freeIndices = N.array([ j for j in range(len(allValues)) if not model.fixed[j] ], dtype=int)
+	lower = N.array([ -N.inf if model.lowerLimits[j] is None else model.lowerLimits[j]
+						for j in freeIndices ])
+	upper = N.array([ N.inf if model.upperLimits[j] is None else model.upperLimits[j]
+						for j in freeIndices ])
+	p0 = allValues[freeIndices].clip(lower, upper)
+
+	def FullValues( p ):
+		values = allValues.copy()
+		values[freeIndices] = p
+		return values
+
+	def Residuals( p ):
+		modelVals = model.Evaluate(r, FullValues(p), mag)
+		return (modelVals - y)*weights
+
+	def Jacobian( p ):
+		(I, dI) = ModelJacobian(model, r, FullValues(p), mag)
+		J = dI[:,freeIndices]
+		if mag:
+			J = MAG_FACTOR * J / I[:,N.newaxis]
+		return J * weights[:,N.newaxis]
+
+	if len(freeIndices) == 0:
+		# all parameters are fixed, so there is nothing to optimize
+		result = ProfileFitResult()
+		result.values = allValues
+		result.params = model.GetParameterLists(result.values)
+		result.chi2 = float(N.sum(Residuals(p0)**2))
+		result.nDOF = len(y)
+		result.nfev = 1
+		result.status = STATUS_ALL_FIXED
+		result.message = "all parameters are fixed"
+		result.success = True
+		result.errors = N.zeros(len(result.values))
+		return result
+
+	if N.isfinite(lower).any() or N.isfinite(upper).any():
+		method = "trf"
+	else:
+		method = "lm"
+	fitResult = scipy.optimize.least_squares(Residuals, p0, jac=Jacobian, bounds=(lower, upper),
+										method=method)
+
+	result = ProfileFitResult()
+	result.values = FullValues(fitResult.x)
+	result.params = model.GetParameterLists(result.values)
+	result.chi2 = float(N.sum(fitResult.fun**2))
+	result.nDOF = len(y) - len(freeIndices)
+	result.nfev = fitResult.nfev
+	result.status = fitResult.status
+	result.message = fitResult.message
+	result.success = fitResult.success
+	# parameter errors from the covariance matrix, scaled by the reduced
+	# residuals if no data errors were supplied
+	result.errors = N.zeros(len(result.values))
+	try:
+		covariance = N.linalg.inv(N.dot(fitResult.jac.T, fitResult.jac))
+		if errs is None and result.nDOF > 0:
+			covariance = covariance * result.chi2/result.nDOF
+		result.errors[freeIndices] = N.sqrt(N.abs(N.diag(covariance)))
+	except N.linalg.LinAlgError:
+		result.errors[freeIndices] = N.nan
+	return result
+
+
+def WriteProfilefitParams( outputFilename, model, result, dataFile=None, configFile=None ):
+	"""Write the best-fit parameters in result (from FitProfile) to a profilefit-style
+	parameter file, which can be read with imfit.ReadConfigFile (or ReadProfilefitConfig).
+	"""
+
+	outf = open(outputFilename, 'w')
+	outf.write("# Best-fit parameters from profilefit.py (%s)\n" % str(datetime.datetime.now()))
+	if dataFile is not None:
+		outf.write("# Data file: %s\n" % dataFile)
+	if configFile is not None:
+		outf.write("# Config file: %s\n" % configFile)
+	outf.write("# chi^2 = %f (%d degrees of freedom)\n" % (result.chi2, result.nDOF))
+	outf.write("# status = %d (%s)\n\n" % (result.status, result.message))
+	x0Written = []
+	for i in range(len(model.functions)):
+		indices = model.FunctionIndices(i)
+		if indices[0] not in x0Written:
+			outf.write(_ParameterLine(model, result, indices[0]))
+			x0Written.append(indices[0])
+		outf.write("FUNCTION %s\n" % model.functionNames[i])
+		for j in indices[1:]:
+			outf.write(_ParameterLine(model, result, j))
+		outf.write("\n")
+	outf.close()
+
+
+def _ParameterLine( model, result, j ):
+	if model.fixed[j]:
+		errString = "fixed"
+	else:
+		errString = "+/- %g" % result.errors[j]
+	return "%s\t\t%.10g\t\t# %s\n" % (model.paramNames[j], result.values[j], errString)
+
+
+def FitProfileFile( dataFile, configFile, outputFile=None, useMask=False, useErrors=False,
+					mag=True ):
+	"""Read a profile and a config file, fit the profile, and (optionally) save
+	the best-fit parameters to outputFile.  Returns tuple of (imfit.ConfigModel, ProfileFitResult).
+	"""
+
+	(r, y, errs, mask) = ReadProfileData(dataFile, useMask, useErrors)
+	model = ReadProfilefitConfig(configFile)
+	result = FitProfile(r, y, model, errs, mask, mag)
+	if outputFile is not None:
+		WriteProfilefitParams(outputFile, model, result, dataFile, configFile)
+	return (model, result)
+
+
+
+# status value used in FitProfileBatch output for fits which raised an exception
+STATUS_EXCEPTION = -100
+
+
+def _FitChunkWorker( args ):
+	"""Utility function for FitProfileBatch: fits a list of profiles in sequence
+	(in a worker process), starting each fit from the previous successful fit's
+	parameters if warmStart is True.  Returns a list of tuples of (ProfileFitResult
+	or None, elapsed time, error message).
+	"""
+
+	model, profileList, fitOptions = args
+	startValues = None
+	results = []
+	for profile in profileList:
+		t0 = time.time()
+		try:
+			if type(profile) is str:
+				(r, y, errs, mask) = ReadProfileData(profile, fitOptions["useMask"],
+													fitOptions["useErrors"])
+			else:
+				(r, y, errs, mask) = (tuple(profile) + (None, None))[:4]
+			result = FitProfile(r, y, model, errs, mask, fitOptions["mag"], startValues)
+			if fitOptions["warmStart"] and result.success:
+				startValues = result.values
+			results.append((result, time.time() - t0, None))
+		except Exception, e:
+			results.append((None, time.time() - t0, "%s: %s" % (e.__class__.__name__, e)))
+	return results
+
+
+def FitProfileBatch( profileList, model, useMask=False, useErrors=False, mag=True,
+					warmStart=True, nProcs=None, names=None ):
+	"""Fit the same model to a sequence of profiles, using a pool of nProcs
+	worker processes (default = number of CPUs; nProcs=1 does all the fits
+	serially in this process).
+
+	profileList = list of profile-data filenames (read with ReadProfileData,
+	using useMask and useErrors) and/or tuples of (r, y[, errs[, mask]]).
+	model = imfit.ConfigModel instance or name of a profilefit config file.
+
+	The profiles are split into nProcs contiguous chunks, each fitted by one
+	worker; if warmStart=True, each fit within a chunk starts from the best-fit
+	parameters of the preceding (neighbouring) profile, so profiles should be
+	ordered so that neighbours are similar (e.g., by position angle).
+
+	Returns a numpy structured array with one entry per profile and fields
+	"name" (filename or names[i] or str(i)), "status" (from least_squares, or
+	STATUS_EXCEPTION if the fit raised an exception), "success", "chi2", "nDOF",
+	"nfev", "time" (seconds), and "values" and "errors" (flat parameter vectors,
+	in the order of model.paramNames).
+	"""
+
+	if type(model) is str:
+		model = ReadProfilefitConfig(model)
+	nProfiles = len(profileList)
+	if names is None:
+		names = [ p if type(p) is str else str(i) for (i, p) in enumerate(profileList) ]
+	fitOptions = {"useMask": useMask, "useErrors": useErrors, "mag": mag, "warmStart": warmStart}
+
+	if nProcs is None:
+		nProcs = multiprocessing.cpu_count()
+	nProcs = max(1, min(nProcs, nProfiles))
+	chunkBounds = N.linspace(0, nProfiles, nProcs + 1).astype(int)
+	jobList = [ (model, profileList[chunkBounds[k]:chunkBounds[k + 1]], fitOptions)
+				for k in range(nProcs) ]
+	if nProcs > 1:
+		pool = multiprocessing.Pool(nProcs)
+		try:
+			chunkResults = pool.map(_FitChunkWorker, jobList)
+		finally:
+			pool.close()
+			pool.join()
+	else:
+		chunkResults = [ _FitChunkWorker(job) for job in jobList ]
+
+	nParams = len(model.values)
+	nameLength = max([1] + [ len(name) for name in names ])
+	dtype = [("name", "S%d" % nameLength), ("status", int), ("success", bool), ("chi2", float),
+			("nDOF", int), ("nfev", int), ("time", float), ("values", float, (nParams,)),
+			("errors", float, (nParams,))]
+	fitArray = N.zeros(nProfiles, dtype=dtype)
+	i = 0
+	for results in chunkResults:
+		for (result, elapsedTime, errorMessage) in results:
+			fitArray["name"][i] = names[i]
+			fitArray["time"][i] = elapsedTime
+			if errorMessage is not None:
+				print("FitProfileBatch: fit of %s failed (%s)" % (names[i], errorMessage))
+				fitArray["status"][i] = STATUS_EXCEPTION
+				fitArray["chi2"][i] = N.nan
+				fitArray["values"][i] = N.nan
+				fitArray["errors"][i] = N.nan
+			else:
+				fitArray["status"][i] = result.status
+				fitArray["success"][i] = result.success
+				fitArray["chi2"][i] = result.chi2
+				fitArray["nDOF"][i] = result.nDOF
+				fitArray["nfev"][i] = result.nfev
+				fitArray["values"][i] = result.values
+				fitArray["errors"][i] = result.errors
+			i += 1
+	return fitArray
+
+
+
+def main(argv=None):
+
+	usageString = "%prog <data-file> <config-file> [options]\n"
+	parser = optparse.OptionParser(usage=usageString, version="%prog ")
+	parser.add_option("--usemask", action="store_true", dest="useMask", default=False,
+						help="use mask in fourth column of data file (1 = bad value)")
+	parser.add_option("--useerrors", action="store_true", dest="useErrors", default=False,
+						help="use errors in third column of data file")
+	parser.add_option("--intensity", action="store_false", dest="mag", default=True,
+						help="data and intensity parameters are intensities, not magnitudes")
+	parser.add_option("--save-params", type="str", dest="outputName", default=None,
+						help="save best-fit parameters to file")
+
+	(options, args) = parser.parse_args(argv)
+	# args[0] = name program was called with
+	# args[1] = first actual argument, etc.
+
+	if (len(args) < 3):
+		print "You must supply a data filename and a config filename!\n"
+		return -1
+
+	(model, result) = FitProfileFile(args[1], args[2], options.outputName, options.useMask,
+										options.useErrors, options.mag)
+	print "Fit status = %d (%s)" % (result.status, result.message)
+	print "chi^2 = %f (%d degrees of freedom)" % (result.chi2, result.nDOF)
+	for j in range(len(model.values)):
+		print "%s\t\t%g\t+/- %g" % (model.paramNames[j], result.values[j], result.errors[j])
+	if options.outputName is not None:
+		print "Best-fit parameters saved to %s" % options.outputName
+	return 0
+
+
+if __name__ == '__main__':
+
+	main(sys.argv)
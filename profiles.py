@@ -3,15 +3,16 @@
 #
 # Includes code for unfolding a profile about a specified index
 
-import copy
+import copy, itertools, math
 import numpy as N
 import spline
 #import spline2 as spline
 import ellipse
+import datautils as du
 
 
 
-def ReadProfile( inputFile, pix=1.0, ZP=None, skip=None ):
+def ReadProfile( inputFile, pix=1.0, ZP=None, skip=None, chunkSize=50000 ):
 	"""Read in a two-column profile, returning a tuple of (x, y),
 	where x is first column and y is second column, with all values converted
 	to floating-point numpy arrays.  Blank lines and lines beginning with '#' are skipped.
@@ -21,19 +22,81 @@ def ReadProfile( inputFile, pix=1.0, ZP=None, skip=None ):
 	unchanged.)
 		If ZP is specified, then it is treated as a magnitude zero point and the
 	y-values become ZP - 2.5*N.log10(y).
+		The file is read in chunks of chunkSize lines (see IterProfileChunks),
+	which are copied into growing output arrays, so the whole file is never held
+	in memory as text.
+	"""
+
+	nPts = 0
+	x = N.zeros(chunkSize)
+	y = N.zeros(chunkSize)
+	for (x_chunk, y_chunk) in IterProfileChunks(inputFile, pix, ZP, skip, chunkSize):
+		nNew = len(x_chunk)
+		if nPts + nNew > len(x):
+			# grow the output buffers
+			newSize = max(2*len(x), nPts + nNew)
+			x = N.resize(x, newSize)
+			y = N.resize(y, newSize)
+		x[nPts:nPts + nNew] = x_chunk
+		y[nPts:nPts + nNew] = y_chunk
+		nPts += nNew
+	return (x[0:nPts].copy(), y[0:nPts].copy())
+
+
+def IterProfileChunks( inputFile, pix=1.0, ZP=None, skip=None, chunkSize=50000 ):
+	"""Generator which reads a profile file in chunks of (at most) chunkSize lines,
+	yielding a tuple of (x, y) numpy arrays for each chunk, so that very large
+	profile files can be processed without reading the whole file into memory.
+	pix, ZP and skip have the same meaning as for ReadProfile(); concatenating
+	all the chunks gives the same result as ReadProfile().
+	"""
+
+	inFile = open(inputFile)
+	try:
+		lineIter = iter(inFile)
+		if skip is not None:
+			lineIter = itertools.islice(lineIter, skip, None)
+		while True:
+			lines = list(itertools.islice(lineIter, chunkSize))
+			if len(lines) == 0:
+				break
+			(x, y) = _ParseProfileLines(lines)
+			if len(x) == 0:
+				continue
+			x = pix * x
+			if ZP is not None:
+				y = ZP - 2.5*N.log10(y)
+			yield (x, y)
+	finally:
+		inFile.close()
+
+
+def _ParseProfileLines( lines ):
+	"""Convert a list of lines from a profile file into a tuple of (x, y) numpy arrays
+	(first and second columns).  Comments and blank lines are skipped.  If every data
+	line has the same number of numerical columns, the lines are parsed in a single
+	pass with numpy; otherwise, we fall back to splitting each line.
 	"""
 
-	lines = open(inputFile).readlines()
-	if skip is not None:
-		lines = lines[skip:]
 	datalines = [ line for line in lines if line[0] != "#" and len(line.strip()) > 0 ]
-	x = [ line.split()[0] for line in datalines ]
-	y = [ line.split()[1] for line in datalines ]
-	x = pix * N.array([ float(i) for i in x ])
-	y = N.array([ float(i) for i in y ])
-	if ZP is not None:
-		y = ZP - 2.5*N.log10(y)
-	return (x, y)
+	nRows = len(datalines)
+	if nRows == 0:
+		return (N.zeros(0), N.zeros(0))
+	text = "".join(datalines)
+	# token counts for each line (trailing newline adds an empty last line)
+	counts = du.TokensPerLine(text)[0:nRows]
+	nCols = counts[0]
+	values = N.zeros(0)
+	if (counts == nCols).all():
+		values = N.fromstring(text, sep=" ")
+	if nCols >= 2 and len(values) == nRows*nCols:
+		values = values.reshape((nRows, nCols))
+		return (values[:,0].copy(), values[:,1].copy())
+	else:
+		# ragged lines or non-numerical extra columns
+		x = N.array([ float(line.split()[0]) for line in datalines ])
+		y = N.array([ float(line.split()[1]) for line in datalines ])
+		return (x, y)
 
 
 def WriteProfile( x, y, outputFilename, header=None, errs=None, mask=False,
@@ -186,6 +249,154 @@ def SimpleFold( vector, exclude=None ):
 
 
 
+def PivotFold( y, pivot, exclude=None, linear=False ):
+	"""Fold a profile about an arbitrary (possibly fractional) pivot location,
+	specified as a 0-based index into y (e.g., pivot=35.7 for a center between
+	y[35] and y[36]).  Works for profiles with either even or odd numbers of
+	points.
+
+	The left- and right-hand sides are both sampled at radii r = 0, 1, 2, ...
+	from the pivot (out to the shorter of the two sides), using a single vectorized
+	spline evaluation (or linear interpolation if linear=True).  If the pivot lies
+	exactly halfway between two points, the radii are r = 0.5, 1.5, 2.5, ...
+	instead.  In both cases the original data values are used directly when the
+	pivot is an integer or half-integer (e.g., the midpoint of an odd- or
+	even-length profile, as for SimpleFold).
+
+	Optionally, regions can be excluded by supplying exclude as a two-element
+	[start, stop] list of (inclusive) index values, or a list of such pairs;
+	at radii where one side falls in an excluded region, only the other side is
+	used.  Radii where both sides are excluded get NaN.
+
+	Returns: tuple of (r, folded_y, asymmetry), all numpy arrays, where
+	asymmetry = (y_left - y_right)/(y_left + y_right) at each radius (NaN where
+	either side is excluded).  Raises ValueError if the pivot lies outside the
+	profile.
+	"""
+
+	y = N.asarray(y, float)
+	nPts = len(y)
+	if (pivot < 0) or (pivot > nPts - 1):
+		msg = "pivot (%g) lies outside the profile (0--%d)!" % (pivot, nPts - 1)
+		raise ValueError(msg)
+
+	rMax = min(pivot, nPts - 1 - pivot)
+	if abs(pivot - math.floor(pivot) - 0.5) < 1.0e-9:
+		rStart = 0.5
+	else:
+		rStart = 0.0
+	r = N.arange(rStart, rMax + 1.0e-9, 1.0)
+	nR = len(r)
+	positions = N.concatenate((pivot - r, pivot + r))
+	indices = N.arange(float(nPts))
+	if nPts == 1:
+		# single-point profile (pivot = 0): nothing to interpolate
+		values = y[[0, 0]]
+	elif linear is True:
+		values = spline.LinInt(indices, y)(positions)
+	else:
+		values = spline.Spline(indices, y)(positions)
+	y_left = values[0:nR]
+	y_right = values[nR:]
+
+	asymmetry = (y_left - y_right) / (y_left + y_right)
+	if exclude is not None:
+		leftBad = _ExcludedPositions(positions[0:nR], exclude)
+		rightBad = _ExcludedPositions(positions[nR:], exclude)
+		y_left, y_right = N.where(leftBad, y_right, y_left), N.where(rightBad, y_left, y_right)
+		bothBad = leftBad & rightBad
+		y_left[bothBad] = N.nan
+		y_right[bothBad] = N.nan
+		asymmetry[leftBad | rightBad] = N.nan
+	foldedVector = 0.5*(y_left + y_right)
+
+	return (r, foldedVector, asymmetry)
+
+
+def _ExcludedPositions( positions, exclude ):
+	"""Returns a boolean array which is True for those values in positions that lie
+	within any of the excluded regions ([start, stop] or list of [start, stop]).
+	"""
+
+	if N.ndim(exclude) == 1:
+		exclude = [exclude]
+	excluded = N.zeros(len(positions), bool)
+	for (start, stop) in exclude:
+		excluded |= (positions >= start) & (positions <= stop)
+	return excluded
+
+
+
+def BatchFold( profileArray, pivots=None, linear=False ):
+	"""Fold a whole stack of profiles at once.  profileArray is a 2-D array
+	with shape (nProfiles, nPixels), one profile per row (e.g., strips
+	extracted at a series of position angles); pivots is a scalar or a vector
+	of nProfiles (possibly fractional) 0-based pivot positions, one per row.
+	If pivots is None, each row is folded about its midpoint, as in SimpleFold().
+
+	As in PivotFold(), each row is sampled at radii r = 0, 1, 2, ... from its
+	pivot using spline interpolation (or linear interpolation if linear=True);
+	if *all* pivots are half-integers, the radii are r = 0.5, 1.5, ... instead.
+	All rows are interpolated and folded together with array operations.
+
+	Returns: tuple of (r, foldedArray), where foldedArray has shape
+	(nProfiles, len(r)).  Radii beyond the shorter side of a given row are
+	set to NaN in that row.  Raises ValueError if any pivot lies outside the
+	profiles.
+	"""
+
+	stack = N.asarray(profileArray, float)
+	nProfiles, nPixels = stack.shape
+	if pivots is None:
+		pivots = 0.5*(nPixels - 1)
+	pivots = N.zeros(nProfiles) + N.asarray(pivots, float)
+	if (pivots < 0).any() or (pivots > nPixels - 1).any():
+		msg = "one or more pivots lie outside the profiles (0--%d)!" % (nPixels - 1)
+		raise ValueError(msg)
+
+	fracPart = pivots - N.floor(pivots)
+	if (N.abs(fracPart - 0.5) < 1.0e-9).all():
+		rStart = 0.5
+	else:
+		rStart = 0.0
+	rMaxRow = N.minimum(pivots, nPixels - 1 - pivots)
+	r = N.arange(rStart, rMaxRow.max() + 1.0e-9, 1.0)
+
+	if (linear is True) or (nPixels == 1):
+		y2 = None
+	else:
+		# second derivatives for all rows from one banded solve
+		indices = N.arange(float(nPixels))
+		y2 = spline.SplineSecondDerivs(indices, stack.T).T
+	y_left = _InterpolateRows(stack, pivots[:,N.newaxis] - r, y2)
+	y_right = _InterpolateRows(stack, pivots[:,N.newaxis] + r, y2)
+	foldedArray = 0.5*(y_left + y_right)
+	foldedArray[r > rMaxRow[:,N.newaxis] + 1.0e-9] = N.nan
+
+	return (r, foldedArray)
+
+
+def _InterpolateRows( stack, positions, y2=None ):
+	"""Interpolate each row of stack (sampled at integer positions 0, 1, ...) at the
+	corresponding row of positions, using cubic splines with second derivatives y2
+	(same shape as stack), or linear interpolation if y2 is None.
+	"""
+
+	nPixels = stack.shape[1]
+	rowIndex = N.arange(stack.shape[0])[:,N.newaxis]
+	if nPixels == 1:
+		return stack[rowIndex, N.zeros(positions.shape, int)]
+	lo = N.floor(positions).astype(int).clip(0, nPixels - 2)
+	hi = lo + 1
+	b = positions - lo
+	a = 1.0 - b
+	y = a*stack[rowIndex, lo] + b*stack[rowIndex, hi]
+	if y2 is not None:
+		y += ((a*a*a - a)*y2[rowIndex, lo] + (b*b*b - b)*y2[rowIndex, hi]) / 6.0
+	return y
+
+
+
 def FoldProfileIDL( x, y, midIndex, offset ):
 	"""Fold a profile about a user-specified midpoint.  User must specify
 	the midpoint as follows: index value of the closest *leftmost* point to
@@ -208,7 +419,7 @@ def FoldProfileIDL( x, y, midIndex, offset ):
 	offset_x = N.array(x) + offset
 	# generate new y-values via spline interpolation
 	spline_func = spline.Spline(x, y)
-	y_new = [ spline_func(xx) for xx in offset_x ]
+	y_new = spline_func(offset_x)
 
 	print midIndex, Npts, Npts/2
 	# Now extract a symmetric subvector centered on the new midpoint:
@@ -246,19 +457,12 @@ def FoldProfile( x, y, foldIndex, pivot=False ):
 		leftEnd = foldIndex
 		rightStart = foldIndex
 	print leftEnd, rightStart
-	yy = copy.copy(y)
-	yy = yy[0:leftEnd]
-	yy.reverse()
-	y_left = N.array(yy)
+	y_left = N.array(y[0:leftEnd])[::-1]
 	y_right = N.array(y[rightStart:])
 	print len(y_left), len(y_right)
 	y_folded = 0.5*(y_left + y_right)
 	if pivot is True:
-		extended = []
-		extended.append(y[foldIndex])
-		for yval in y_folded:
-			extended.append(yval)
-		y_folded = N.array(extended)
+		y_folded = N.concatenate(([y[foldIndex]], y_folded))
 
 	return y_folded
 
@@ -269,10 +473,12 @@ def ReadAndFoldProfile( fileName, midIndex=None, pix=1.0, ZP=None ):
 	midpoint.
 		If midIndex is None (the default), then we fold about the
 	middle of the profile using SimpleFold().  If midIndex is specified,
-	then it must be a 1-based location; this is then fed to FoldProfileIDL(),
-	which uses spline interpolation.
+	then it must be a 1-based location (which can be fractional); the
+	profile is then folded about that point with PivotFold(), which uses
+	spline interpolation.
 		Returns tuple of (radii, intensities), both of which will be
 	numpy arrays.  If ZP is specified, then intensities --> magnitudes.
+	Raises ValueError if midIndex lies outside the profile.
 	"""
 
 	(rr, ii) = ReadProfile(fileName)
@@ -280,13 +486,7 @@ def ReadAndFoldProfile( fileName, midIndex=None, pix=1.0, ZP=None ):
 	if midIndex is None:
 		(rfold, ifold) = SimpleFold(ii)
 	else:
-		(offset, midIndex_floor) = math.modf(midIndex)
-		midIndex_int = int(midIndex_floor) - 1
-		nPts_orig = len(ii)
-		indices = range(nPts_orig)
-		ifold = FoldProfileIDL(indices, ii, midIndex_int, offset)
-		rfold = N.arange(len(ifold))
-		print "Non-simple folding not yet implemented!"
+		(rfold, ifold, asymmetry) = PivotFold(ii, midIndex - 1)
 
 	if ZP is not None:
 		ifold = ZP - 2.5*N.log10(ifold)
@@ -311,12 +511,7 @@ def MergeTwoProfiles( r1, y1, r2, y2, r ):
 		print "Requested transition radius (%g) is outside boundaries of r2 (%g--%g)!" % (r,
 					r2[0], r2[-1])
 		return None
-	r1_border = ellipse.NearestIndex(r1, r, noprint=True)
-	r2_border = ellipse.NearestIndex(r2, r, noprint=True)
-	end1 = r1_border[1]
-	start2 = r2_border[1]
-	if (r2[start2] < r1[end1]):
-		start2 += 1
+	end1, start2 = ellipse.MergeIndices(r1, r2, r, keepEqual=True)
 
 	newR = N.concatenate((r1[0:end1], r2[start2:]))
 	newY = N.concatenate((y1[0:end1], y2[start2:]))
@@ -325,6 +520,31 @@ def MergeTwoProfiles( r1, y1, r2, y2, r ):
 
 
 
+def MergeTwoProfilesMulti( r1, y1, r2, y2, transitionRadii ):
+	"""Same as MergeTwoProfiles, but for a sequence of candidate transition
+	radii, with the merge points for all radii found in a single vectorized
+	search.  Returns a list of (newR, newY) tuples, one per transition radius
+	(None for radii outside the range of either r1 or r2).
+	"""
+
+	r1 = N.asarray(r1)
+	y1 = N.asarray(y1)
+	r2 = N.asarray(r2)
+	y2 = N.asarray(y2)
+	ends1, starts2 = ellipse.MergeIndices(r1, r2, N.ravel(transitionRadii), keepEqual=True)
+	mergedProfiles = []
+	for end1, start2 in zip(ends1, starts2):
+		if end1 < 0:
+			mergedProfiles.append(None)
+		else:
+			newR = N.concatenate((r1[0:end1], r2[start2:]))
+			newY = N.concatenate((y1[0:end1], y2[start2:]))
+			mergedProfiles.append((newR, newY))
+
+	return mergedProfiles
+
+
+
 def MirrorReplace( y, xcenter, xstart, xend ):
 	"""Given an input vector y, replace values y[xstart:xend] with the
 	corresponding values on the other side of the profile, assuming the
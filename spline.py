@@ -18,18 +18,92 @@ Example usage:
 Uses "searchsorted" from the Numeric module, aka "binarysearch" in older
 versions.
 
+The second derivatives are found with a single banded (tridiagonal) solve,
+and arrays are evaluated in one pass with a batched searchsorted, so calling
+a Spline on a numpy array is much faster than calling it point by point.
+
 """
 
 import func
 #from Numeric import *
 from numpy import *
+import scipy.linalg
 
 BadInput = "Bad xa input to routine splint."
 
+
+def SplineSecondDerivs(x_vals, y_vals, low_slope=None, high_slope=None):
+    """
+    Solve for the second derivatives of the cubic spline through
+    (x_vals, y_vals) as one tridiagonal system.  If y_vals is 2-D, each
+    column is treated as a separate function sampled on x_vals.  A slope
+    of None gives a "natural" end (second derivative = 0).
+    """
+    x_vals = asarray(x_vals, float)
+    y_vals = asarray(y_vals, float)
+    n = len(x_vals)
+    h = x_vals[1:] - x_vals[:-1]
+    h_col = h.reshape((n-1,) + (1,)*(y_vals.ndim - 1))
+    dydx = (y_vals[1:] - y_vals[:-1]) / h_col
+
+    # banded storage for solve_banded: row 0 = upper diagonal,
+    # row 1 = main diagonal, row 2 = lower diagonal
+    ab = zeros((3, n), float)
+    rhs = zeros(y_vals.shape, float)
+    ab[0,2:] = h[1:] / 6.0
+    ab[1,1:-1] = (h[:-1] + h[1:]) / 3.0
+    ab[2,:-2] = h[:-1] / 6.0
+    rhs[1:-1] = dydx[1:] - dydx[:-1]
+
+    if low_slope is not None:
+	ab[0,1] = h[0] / 6.0
+	ab[1,0] = h[0] / 3.0
+	rhs[0] = dydx[0] - low_slope
+    else:
+	ab[1,0] = 1.0      # natural spline
+    if high_slope is not None:
+	ab[1,n-1] = h[-1] / 3.0
+	ab[2,n-2] = h[-1] / 6.0
+	rhs[n-1] = high_slope - dydx[-1]
+    else:
+	ab[1,n-1] = 1.0    # natural spline
+
+    return scipy.linalg.solve_banded((1, 1), ab, rhs)
+
+
+def SplineEval(x_vals, y_vals, y2_vals, x):
+    """
+    Evaluate the spline defined by (x_vals, y_vals, y2_vals) at every point
+    of the array x.  Points outside the range of x_vals get the endpoint
+    value.  If y_vals is 2-D, the result has shape x.shape + y_vals.shape[1:].
+    """
+    x = asarray(x, float)
+    n = len(x_vals)
+    pos = searchsorted(x_vals, x).clip(1, n-1)
+    x_lo = x_vals[pos-1]
+    x_hi = x_vals[pos]
+    h = x_hi - x_lo
+    if (h == 0.0).any():
+	raise ValueError(BadInput)
+
+    # reshape so the coefficients broadcast against multi-column y values
+    shape = x.shape + (1,)*(y_vals.ndim - 1)
+    a = ((x_hi - x) / h).reshape(shape)
+    b = ((x - x_lo) / h).reshape(shape)
+    h = h.reshape(shape)
+    y = (a*y_vals[pos-1] + b*y_vals[pos] +
+	 ((a*a*a - a)*y2_vals[pos-1] + (b*b*b - b)*y2_vals[pos]) * h*h/6.0)
+
+    # if out of range, return endpoint
+    y[x <= x_vals[0]] = y_vals[0]
+    y[x >= x_vals[-1]] = y_vals[-1]
+    return y
+
+
 class Spline(func.FuncOps):
     def __init__(self, x_array, y_array, low_slope=None, high_slope=None):
-	self.x_vals = x_array
-	self.y_vals = y_array
+	self.x_vals = asarray(x_array, float)
+	self.y_vals = asarray(y_array, float)
 	self.low_slope  = low_slope
 	self.high_slope = high_slope
 	# must be careful, so that a slope of 0 still works...
@@ -42,58 +116,17 @@ class Spline(func.FuncOps):
 	else:
 	    self.use_high_slope = 0
 	self.calc_ypp()
-   
+
     def calc_ypp(self):
-	x_vals = self.x_vals
-	y_vals = self.y_vals
-	n = len(x_vals)
-	y2_vals  = zeros(n, float)
-	u        = zeros(n-1, float)
-	
-	if self.use_low_slope:
-	    u[0] = (3.0/(x_vals[1]-x_vals[0])) * \
-		   ((y_vals[1]-y_vals[0])/
-		    (x_vals[1]-x_vals[0])-self.low_slope)
-	    y2_vals[0] = -0.5
-	else:
-	    u[0] = 0.0
-	    y2_vals[0] = 0.0   # natural spline
-	    
-	for i in range(1, n-1):
-	    sig = (x_vals[i]-x_vals[i-1]) / \
-		  (x_vals[i+1]-x_vals[i-1])
-	    p   = sig*y2_vals[i-1]+2.0
-	    y2_vals[i] = (sig-1.0)/p
-	    u[i] = (y_vals[i+1]-y_vals[i]) / \
-		   (x_vals[i+1]-x_vals[i]) - \
-		   (y_vals[i]-y_vals[i-1])/ \
-		   (x_vals[i]-x_vals[i-1])
-	    u[i] = (6.0*u[i]/(x_vals[i+1]-x_vals[i-1]) - 
-		    sig*u[i-1]) / p
-	    
-	if self.use_high_slope:
-	    qn = 0.5
-	    un = (3.0/(x_vals[n-1]-x_vals[n-2])) * \
-		 (self.high_slope - (y_vals[n-1]-y_vals[n-2]) /
-		  (x_vals[n-1]-x_vals[n-2]))
-	else:
-	    qn = 0.0
-	    un = 0.0    # natural spline
-      
-	y2_vals[n-1] = (un-qn*u[n-2])/(qn*y2_vals[n-1]+1.0)
+	self.y2_vals = SplineSecondDerivs(self.x_vals, self.y_vals,
+					  self.low_slope, self.high_slope)
+
 
-	rng = range(n-1)
-	rng.reverse()
-	for k in rng:         # backsubstitution step
-	    y2_vals[k] = y2_vals[k]*y2_vals[k+1]+u[k]
-	self.y2_vals = y2_vals
-      
-      
     # compute approximation
     def __call__(self, arg):
 	"Simulate a ufunc; handle being called on an array."
-	if type(arg) == func.ArrayType:
-	    return func.array_map(self.call, arg)
+	if ndim(arg) > 0:
+	    return SplineEval(self.x_vals, self.y_vals, self.y2_vals, arg)
 	else:
 	    return self.call(arg)
 
@@ -110,7 +143,7 @@ class Spline(func.FuncOps):
       
 	h = self.x_vals[pos]-self.x_vals[pos-1]
 	if h == 0.0:
-	    raise BadInput
+	    raise ValueError(BadInput)
       
 	a = (self.x_vals[pos] - x) / h
 	b = (x - self.x_vals[pos-1]) / h
@@ -119,16 +152,60 @@ class Spline(func.FuncOps):
 		 (b*b*b - b)*self.y2_vals[pos]) * h*h/6.0)
 
 
+class MultiSpline(Spline):
+    """
+    Cubic spline for several functions sampled on the same x values.
+    y_array is 2-D, with one column per function; the second derivatives
+    for all columns come from a single banded solve.  Calling the object
+    with an array of n points returns an (n, nColumns) array.
+    """
+    def __call__(self, arg):
+	"Evaluate all columns at x (scalar or array)."
+	if ndim(arg) > 0:
+	    return SplineEval(self.x_vals, self.y_vals, self.y2_vals, arg)
+	else:
+	    return SplineEval(self.x_vals, self.y_vals, self.y2_vals, [arg])[0]
+
+    def call(self, x):
+	return self(x)
+
+
+def LinIntEval(x_vals, y_vals, x):
+    """
+    Linearly interpolate (x_vals, y_vals) at every point of the array x.
+    Points outside the range of x_vals get the endpoint value.  If y_vals
+    is 2-D, the result has shape x.shape + y_vals.shape[1:].
+    """
+    x = asarray(x, float)
+    n = len(x_vals)
+    pos = searchsorted(x_vals, x).clip(1, n-1)
+    x_lo = x_vals[pos-1]
+    x_hi = x_vals[pos]
+    h = x_hi - x_lo
+    if (h == 0.0).any():
+	raise ValueError(BadInput)
+
+    shape = x.shape + (1,)*(y_vals.ndim - 1)
+    a = ((x_hi - x) / h).reshape(shape)
+    b = ((x - x_lo) / h).reshape(shape)
+    y = a*y_vals[pos-1] + b*y_vals[pos]
+
+    # if out of range, return endpoint
+    y[x <= x_vals[0]] = y_vals[0]
+    y[x >= x_vals[-1]] = y_vals[-1]
+    return y
+
+
 class LinInt(func.FuncOps):
     def __init__(self, x_array, y_array):
-	self.x_vals = x_array
-	self.y_vals = y_array
+	self.x_vals = asarray(x_array, float)
+	self.y_vals = asarray(y_array, float)
       
     # compute approximation
     def __call__(self, arg):
 	"Simulate a ufunc; handle being called on an array."
-	if type(arg) == func.ArrayType:
-	    return func.array_map(self.call, arg)
+	if ndim(arg) > 0:
+	    return LinIntEval(self.x_vals, self.y_vals, arg)
 	else:
 	    return self.call(arg)
 
@@ -145,12 +222,30 @@ class LinInt(func.FuncOps):
       
 	h = self.x_vals[pos]-self.x_vals[pos-1]
 	if h == 0.0:
-	    raise BadInput
+	    raise ValueError(BadInput)
       
 	a = (self.x_vals[pos] - x) / h
 	b = (x - self.x_vals[pos-1]) / h
 	return a*self.y_vals[pos-1] + b*self.y_vals[pos]
 
+
+class MultiLinInt(LinInt):
+    """
+    Linear interpolation for several functions sampled on the same x
+    values (y_array is 2-D, one column per function).  Calling the object
+    with an array of n points returns an (n, nColumns) array.
+    """
+    def __call__(self, arg):
+	"Evaluate all columns at x (scalar or array)."
+	if ndim(arg) > 0:
+	    return LinIntEval(self.x_vals, self.y_vals, arg)
+	else:
+	    return LinIntEval(self.x_vals, self.y_vals, [arg])[0]
+
+    def call(self, x):
+	return self(x)
+
+
 def spline_interpolate(x1, y1, x2):
     """
     Given a function at a set of points (x1, y1), interpolate to
@@ -175,3 +270,21 @@ def linear_interpolate(x1, y1, x2):
     """
     li = LinInt(x1, y1)
     return li(x2)
+
+
+def multispline_interpolate(x1, y1, x2):
+    """
+    Given several functions sampled at the same points x1 (y1 is 2-D, one
+    column per function), interpolate all of them to points x2.
+    """
+    sp = MultiSpline(x1, y1)
+    return sp(x2)
+
+
+def multilinear_interpolate(x1, y1, x2):
+    """
+    Given several functions sampled at the same points x1 (y1 is 2-D, one
+    column per function), linearly interpolate all of them to points x2.
+    """
+    li = MultiLinInt(x1, y1)
+    return li(x2)
@@ -0,0 +1,175 @@
+# Tests for astro_funcs.py (run with "python -m unittest discover tests")
+
+import math, os, sys, unittest
+import numpy as N
+try:
+	import mpmath
+except ImportError:
+	mpmath = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import astro_funcs as af
+import benchmarks
+
+
+class TestBn(unittest.TestCase):
+
+	def testTabulatedAccuracy(self):
+		# dense grid across the table (including points between table nodes)
+		n = N.exp(N.linspace(N.log(af.BN_TABLE_NMIN), N.log(af.BN_TABLE_NMAX), 20001))
+		maxError = N.abs(af.b_n_tabulated(n) - af.b_n_exact(n)).max()
+		self.assertTrue(maxError < af.BN_TABLE_TOLERANCE, "max. error = %g" % maxError)
+		n = N.random.RandomState(42).uniform(af.BN_TABLE_NMIN, af.BN_TABLE_NMAX, 10000)
+		maxError = N.abs(af.b_n_tabulated(n) - af.b_n_exact(n)).max()
+		self.assertTrue(maxError < af.BN_TABLE_TOLERANCE, "max. error = %g" % maxError)
+
+	def testOutsideTable(self):
+		n = N.array([[0.05, 1.0], [4.0, 25.0]])
+		bn = af.b_n_tabulated(n)
+		self.assertEqual(bn.shape, (2, 2))
+		self.assertTrue(N.allclose(bn, af.b_n_exact(n), rtol=0, atol=af.BN_TABLE_TOLERANCE))
+		self.assertEqual(af.b_n_tabulated(0.05), af.b_n_exact(0.05))
+		self.assertEqual(af.b_n_tabulated(25.0), af.b_n_exact(25.0))
+
+	def testExact(self):
+		# b_n = 2n - 1/3 + ... for large n; b_1 = 1.67835
+		self.assertAlmostEqual(af.b_n_exact(1.0), 1.678346990, 8)
+		self.assertAlmostEqual(af.b_n_exact(4.0), af.b_n(4.0), 5)
+		self.assertTrue(isinstance(af.b_n_tabulated(1.0), float))
+
+
+def OldMoffat( r, params ):
+	# Moffat (mag=True) as it was before the batched versions were added
+	I_0 = 10**(-0.4*params[1])
+	exponent = math.pow(2.0, 1.0/params[3])
+	alpha = 0.5*params[2]/math.sqrt(exponent - 1.0)
+	scaledR = N.abs(r - params[0]) / alpha
+	return -2.5 * N.log10(I_0 / (1.0 + scaledR*scaledR)**params[3])
+
+
+def OldCoreSersic( r, params ):
+	# CoreSersic (mag=True) as it was before the batched versions were added
+	R = N.abs(r - params[0])
+	n, I_b, r_e, r_b, alpha, gamma = params[1], 10**(-0.4*params[2]), params[3], params[4], params[5], params[6]
+	bn = af.b_n(n)
+	Iprime = I_b * math.pow(2.0, -gamma/alpha) * math.exp( bn * math.pow( math.pow(2.0, 1.0/alpha) * r_b/r_e, (1.0/n) ))
+	p1 = (1.0 + (r_b/R)**alpha)**(gamma/alpha)
+	p2 = N.exp(-bn * ((R**alpha + r_b**alpha)/(r_e**alpha))**(1.0/(alpha*n)))
+	return -2.5 * N.log10(Iprime * p1 * p2)
+
+
+class TestBatch(unittest.TestCase):
+
+	def setUp(self):
+		self.r = N.linspace(0.5, 30.0, 60)
+		self.x = N.linspace(-20.0, 20.0, 81)
+
+	def CheckRows( self, batchFunc, paramArray, referenceFunc, r, **kwargs ):
+		result = batchFunc(r, paramArray, **kwargs)
+		self.assertEqual(result.shape, (len(paramArray), len(r)))
+		for i in range(len(paramArray)):
+			expected = referenceFunc(r, list(paramArray[i]))
+			self.assertTrue(N.allclose(result[i], expected, rtol=1e-12, atol=1e-12),
+							"%s: row %d" % (batchFunc.__name__, i))
+
+	def test_changed_functions(self):
+		self.CheckRows(af.MoffatBatch, N.array([[0.0, 18.0, 3.0, 2.5], [1.0, 19.0, 5.0, 4.0]]),
+						OldMoffat, self.r)
+		self.CheckRows(af.CoreSersicBatch, N.array([[0.0, 4.0, 17.0, 20.0, 2.0, 3.0, 0.2],
+						[0.0, 2.5, 16.0, 10.0, 1.0, 5.0, 0.1]]), OldCoreSersic, self.r)
+		self.CheckRows(af.Gauss2SideBatch, N.array([[0.0, 18.0, 3.0, 6.0], [-2.0, 19.0, 4.0, 1.5]]),
+						benchmarks._Gauss2Side_loop, self.x)
+
+	def test_looped_functions(self):
+		# batched results match a Python loop over the single-model functions
+		checks = [ (af.SersicBatch, af.Sersic, [[0.0, 4.0, 20.0, 10.0], [0.0, 1.5, 19.0, 5.0]]),
+				(af.ExponentialBatch, af.Exponential, [[0.0, 18.0, 5.0], [2.0, 20.0, 10.0]]),
+				(af.BrokenExpBatch, af.BrokenExp, [[0.0, 18.0, 5.0, 2.5, 10.0, 1.0],
+												[0.0, 19.0, 8.0, 3.0, 15.0, 30.0]]),
+				(af.SechBatch, af.Sech, [[0.0, 18.0, 5.0], [1.0, 20.0, 2.0]]),
+				(af.Sech2Batch, af.Sech2, [[0.0, 18.0, 5.0], [1.0, 20.0, 2.0]]),
+				(af.vdKSechBatch, af.vdKSech, [[0.0, 18.0, 5.0, 1.0], [0.0, 18.0, 5.0, 0.25]]),
+				(af.EdgeOnDisk1DBatch, af.EdgeOnDisk1D, [[0.0, 18.0, 5.0], [3.0, 19.0, 7.0]]) ]
+		for (batchFunc, singleFunc, paramArray) in checks:
+			paramArray = N.array(paramArray)
+			for (mag, magOutput) in [(True, True), (True, False)]:
+				def func( r, params ):
+					return singleFunc(r, params, mag, magOutput)
+				self.CheckRows(batchFunc, paramArray, func, self.r, mag=mag, magOutput=magOutput)
+		self.CheckRows(af.GaussBatch, N.array([[0.0, 18.0, 3.0], [2.0, 1.0e3, 5.0]]),
+						lambda x, p: af.Gauss(x, p, mag=False), self.x, mag=False)
+
+
+class TestBrokenExpAndGauss2Side(unittest.TestCase):
+
+	def setUp(self):
+		self.r = N.linspace(0.0, 60.0, 241)
+
+	def test_gauss2side(self):
+		x = N.linspace(-20.0, 20.0, 81)
+		params = [1.5, 18.0, 3.0, 6.0]
+		expected = benchmarks._Gauss2Side_loop(x, params)
+		self.assertTrue(N.allclose(af.Gauss2Side(x, params), expected, rtol=1e-14, atol=0))
+		for i in [0, 21, 40, 80]:
+			self.assertTrue(N.allclose(af.Gauss2Side(x[i], params), expected[i], rtol=1e-14, atol=0))
+		I = af.Gauss2Side(x, params, magOutput=False)
+		self.assertTrue(N.allclose(-2.5*N.log10(I), expected, rtol=1e-14, atol=0))
+
+	def test_brokenexp_crossover(self):
+		# sharp break: the old code switched to the outer exponential where
+		# alpha*(r - r_b) > 100
+		params = [0.0, 18.0, 5.0, 2.5, 20.0, 8.0]
+		expected = benchmarks._BrokenExp_branching(self.r, params)
+		self.assertTrue(N.allclose(af.BrokenExp(self.r, params), expected, rtol=1e-12, atol=0))
+		# unsorted and scalar input
+		order = N.random.RandomState(42).permutation(len(self.r))
+		self.assertTrue(N.allclose(af.BrokenExp(self.r[order], params), expected[order], rtol=1e-12, atol=0))
+		for i in [0, 100, 240]:
+			self.assertTrue(N.allclose(af.BrokenExp(self.r[i], params), expected[i], rtol=1e-12, atol=0))
+
+	def test_brokenexp_soft(self):
+		# soft break (no r beyond the old crossover point): full formula
+		params = [0.0, 18.0, 5.0, 2.5, 20.0, 0.5]
+		h1, h2, Rb, alpha = params[2:6]
+		exponent = (1.0/alpha) * (1.0/h1 - 1.0/h2)
+		S = (1.0 + N.exp(-alpha*Rb))**(-exponent)
+		I_0 = 10.0**(-0.4*params[1])
+		expected = I_0 * S * N.exp(-self.r/h1) * (1.0 + N.exp(alpha*(self.r - Rb)))**exponent
+		I = af.BrokenExp(self.r, params, magOutput=False)
+		self.assertTrue(N.allclose(I, expected, rtol=1e-12, atol=0))
+		# alpha = 0 is the limit of very soft breaks
+		I0 = af.BrokenExp(self.r, params[0:5] + [0.0], magOutput=False)
+		Ismall = af.BrokenExp(self.r, params[0:5] + [1.0e-7], magOutput=False)
+		self.assertTrue(N.allclose(I0, Ismall, rtol=1e-5, atol=0))
+
+
+def OldvdKBessel( r, mu00, h ):
+	# scalar mpmath version used before vdKBessel was vectorized
+	if r == 0:
+		return mu00
+	else:
+		return mu00 * (r/h) * mpmath.besselk(1, r/h)
+
+
+class TestvdKBessel(unittest.TestCase):
+
+	def test_tabulated(self):
+		# K_1(x) for x = 0.1, 1, 2, 5
+		x = N.array([0.1, 1.0, 2.0, 5.0])
+		k1 = N.array([9.853844780870606, 0.6019072301972346, 0.13986588181652243,
+					0.004044613445452165])
+		self.assertTrue(N.allclose(af.vdKBessel(3.0*x, 2.0, 3.0), 2.0*x*k1, rtol=1e-13, atol=0))
+		self.assertEqual(af.vdKBessel(0.0, 2.0, 3.0), 2.0)
+		self.assertTrue(isinstance(af.vdKBessel(1.5, 2.0, 3.0), float))
+
+	@unittest.skipIf(mpmath is None, "mpmath is not installed")
+	def test_old_version(self):
+		r = N.linspace(0.0, 100.0, 201)
+		expected = N.array([ float(OldvdKBessel(rr, 2.0, 7.0)) for rr in r ])
+		self.assertTrue(N.allclose(af.vdKBessel(r, 2.0, 7.0), expected, rtol=1e-12, atol=0))
+		expected = N.array([ float(OldvdKBessel(rr, 2*7.0*0.3, 7.0)) for rr in r ])
+		self.assertTrue(N.allclose(af.EdgeOnDisk(r, [0.3, 7.0]), expected, rtol=1e-12, atol=0))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,332 @@
+# Tests for datautils.py (run with "python -m unittest discover tests")
+
+import os, sys, shutil, tempfile, unittest
+import numpy as N
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import datautils as du
+
+
+class TestListDataFrame(unittest.TestCase):
+
+	def setUp(self):
+		self.frame = du.ListDataFrame([N.arange(5.0), [1, 2, 3, 4, 5], ["a", "b", "c", "d", "e"]],
+									["x", "n", "name"])
+		self.frame.AddColumnName("x", "r")
+
+	def testColumnAssignment(self):
+		newValues = N.linspace(10.0, 14.0, 5)
+		self.frame.x = newValues
+		self.assertTrue(N.array_equal(self.frame.x, newValues))
+		self.assertTrue(N.array_equal(self.frame["x"], newValues))
+		# alternate name refers to the same column
+		self.assertTrue(N.array_equal(self.frame.r, newValues))
+		self.frame.n = [5, 4, 3, 2, 1]
+		self.assertTrue(N.array_equal(self.frame["n"], [5, 4, 3, 2, 1]))
+
+	def testBadColumnAssignment(self):
+		oldValues = self.frame.x.copy()
+		self.assertRaises(ValueError, setattr, self.frame, "x", N.arange(4.0))
+		self.assertRaises(ValueError, setattr, self.frame, "n", N.arange(5.0))
+		self.assertRaises(ValueError, setattr, self.frame, "x", self.frame.name)
+		self.assertTrue(N.array_equal(self.frame.x, oldValues))
+
+	def testMetadataAssignment(self):
+		self.frame.tableFile = "table.dat"
+		self.assertEqual(self.frame.tableFile, "table.dat")
+		self.assertEqual(self.frame.SelectRows(slice(1, 3)).tableFile, "table.dat")
+
+	def testColumnIndexing(self):
+		# integers and slices index the list of columns, as for the original
+		# list-of-lists ListDataFrame
+		self.assertTrue(N.array_equal(self.frame[0], N.arange(5.0)))
+		self.assertTrue(N.array_equal(self.frame[-1], ["a", "b", "c", "d", "e"]))
+		columns = self.frame[1:3]
+		self.assertEqual(len(columns), 2)
+		self.assertTrue(N.array_equal(columns[0], [1, 2, 3, 4, 5]))
+		self.assertTrue(N.array_equal(columns[1], ["a", "b", "c", "d", "e"]))
+		self.assertEqual(len(self.frame.data), 3)
+		self.assertTrue(N.array_equal(self.frame.data[1], self.frame.n))
+		self.assertRaises(IndexError, self.frame.__getitem__, 3)
+
+	def testColumnAttributes(self):
+		self.assertTrue(N.array_equal(self.frame.x, N.arange(5.0)))
+		self.assertTrue(N.array_equal(self.frame.r, N.arange(5.0)))
+		self.assertTrue(N.array_equal(self.frame.name, ["a", "b", "c", "d", "e"]))
+		self.assertTrue(N.array_equal(self.frame.dict["r"], N.arange(5.0)))
+		self.frame.ChangeColumnName("n", "count")
+		self.assertTrue(N.array_equal(self.frame.count, [1, 2, 3, 4, 5]))
+		self.assertRaises(AttributeError, getattr, self.frame, "n")
+		self.assertRaises(KeyError, self.frame.__getitem__, "n")
+
+	def testReservedColumnNames(self):
+		frame = du.ListDataFrame([N.arange(3.0), N.ones(3)], ["data", "nRows"])
+		self.assertEqual(frame.nRows, 3)
+		self.assertEqual(len(frame.data), 2)
+		self.assertTrue(N.array_equal(frame["data"], N.arange(3.0)))
+		self.assertTrue(N.array_equal(frame["nRows"], N.ones(3)))
+
+	def testListColumns(self):
+		# list-valued columns are returned as NumPy arrays (views into frame.array)
+		column = self.frame.n
+		self.assertTrue(isinstance(column, N.ndarray))
+		self.assertEqual(list(column), [1, 2, 3, 4, 5])
+		column[0] = 10
+		self.assertEqual(self.frame["n"][0], 10)
+		self.assertEqual(self.frame.array["f1"][0], 10)
+
+	def testSubListColumns(self):
+		subLists = [N.array([1.0, 2.0]), N.array([3.0, 4.0]), N.array([5.0, 6.0])]
+		frame = du.ListDataFrame([N.arange(2.0), subLists], ["x", "y"])
+		self.assertEqual(len(frame.y), 3)
+		for i in range(3):
+			self.assertTrue(N.array_equal(frame.y[i], subLists[i]))
+
+	def testSelectRows(self):
+		rows = self.frame.SelectRows(slice(1, 3))
+		self.assertEqual(len(rows), 2)
+		self.assertTrue(N.array_equal(rows.x, [1.0, 2.0]))
+		self.assertTrue(N.array_equal(rows.r, [1.0, 2.0]))
+		# slices are views
+		rows.x[0] = -1.0
+		self.assertEqual(self.frame.x[1], -1.0)
+		# masks are copies
+		rows = self.frame.SelectRows(self.frame.n > 3)
+		self.assertTrue(N.array_equal(rows.name, ["d", "e"]))
+		rows.x[0] = -2.0
+		self.assertEqual(self.frame.x[3], 3.0)
+		rows = self.frame.SelectRows(N.array([4, 0]))
+		self.assertTrue(N.array_equal(rows.n, [5, 1]))
+
+	def testPickle(self):
+		import pickle
+		self.frame.tableFile = "table.dat"
+		newFrame = pickle.loads(pickle.dumps(self.frame, 2))
+		self.assertTrue(N.array_equal(newFrame.r, self.frame.x))
+		self.assertEqual(newFrame.tableFile, "table.dat")
+
+
+class TestTableSidecar(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.mkdtemp()
+		# table name with glob metacharacters, plus a second table whose name
+		# starts with the first one's
+		self.fileName = os.path.join(self.tempDir, "tab[1]*.dat")
+		self.otherFileName = os.path.join(self.tempDir, "tab[1]*.dat.x")
+		self.data = N.arange(30.0).reshape((10, 3))
+		self.WriteTable(self.fileName, self.data)
+		self.WriteTable(self.otherFileName, self.data + 1)
+		self._ParseFloatTable = du._ParseFloatTable
+
+	def tearDown(self):
+		du._ParseFloatTable = self._ParseFloatTable
+		shutil.rmtree(self.tempDir)
+
+	def WriteTable(self, fileName, data):
+		outf = open(fileName, 'w')
+		outf.write("# x  y  z\n")
+		for row in data:
+			outf.write("%g %g %g\n" % tuple(row))
+		outf.close()
+
+	def _DisableParsing(self):
+		def NoParsing( *args ):
+			raise AssertionError("text table parsed instead of read from sidecar")
+		du._ParseFloatTable = NoParsing
+
+	def testReuse(self):
+		d = du.ReadTableArray(self.fileName, sidecar=True)
+		self.assertTrue(N.array_equal(d, self.data))
+		sidecarFile = du.TableSidecarFilename(self.fileName)
+		self.assertTrue(os.path.exists(sidecarFile))
+		self._DisableParsing()
+		d = du.ReadTableArray(self.fileName, sidecar=True)
+		self.assertTrue(isinstance(d, N.memmap))
+		self.assertTrue(N.array_equal(d, self.data))
+		self.assertTrue(d.flags.f_contiguous)
+		# copy-on-write: changes are not written back to the sidecar file
+		d[:,1] = -1.0
+		d = du.ReadTableArray(self.fileName, sidecar=True, dataFrame=True)
+		self.assertTrue(N.array_equal(d.data, self.data))
+
+	def testInvalidation(self):
+		du.ReadTableArray(self.fileName, sidecar=True)
+		du.ReadTableArray(self.otherFileName, sidecar=True)
+		oldSidecar = du.TableSidecarFilename(self.fileName)
+		otherSidecar = du.TableSidecarFilename(self.otherFileName)
+		newData = self.data[0:5] * 2
+		self.WriteTable(self.fileName, newData)
+		stats = os.stat(self.fileName)
+		os.utime(self.fileName, (stats.st_atime, stats.st_mtime + 10))
+		d = du.ReadTableArray(self.fileName, sidecar=True)
+		self.assertTrue(N.array_equal(d, newData))
+		self.assertNotEqual(du.TableSidecarFilename(self.fileName), oldSidecar)
+		self.assertFalse(os.path.exists(oldSidecar))
+		# the other table's sidecar is left alone
+		self.assertTrue(os.path.exists(otherSidecar))
+		self.assertTrue(N.array_equal(du.ReadTableArray(self.otherFileName, sidecar=True),
+									self.data + 1))
+
+	def testSidecarDirAndBadFile(self):
+		sidecarDir = os.path.join(self.tempDir, "sidecars")
+		os.mkdir(sidecarDir)
+		du.ReadTableArray(self.fileName, sidecar=True, sidecarDir=sidecarDir)
+		sidecarFile = du.TableSidecarFilename(self.fileName, sidecarDir=sidecarDir)
+		self.assertEqual(os.listdir(sidecarDir), [os.path.basename(sidecarFile)])
+		outf = open(sidecarFile, 'wb')
+		outf.write("junk")
+		outf.close()
+		d = du.ReadTableArray(self.fileName, sidecar=True, sidecarDir=sidecarDir)
+		self.assertTrue(N.array_equal(d, self.data))
+		self._DisableParsing()
+		d = du.ReadTableArray(self.fileName, sidecar=True, sidecarDir=sidecarDir)
+		self.assertTrue(isinstance(d, N.memmap))
+
+
+def OldReadTableArray( fileName, skip="#", delimiter=None ):
+	# element-by-element ReadTableArray from before _ParseFloatTable existed
+	lines = open(fileName, 'rU').readlines()
+	dlines = [line.rstrip() for line in lines if len(line.strip()) > 0 and line[0] not in skip ]
+	ncols = len(dlines[0].split(delimiter))
+	dataArray = N.zeros((len(dlines), ncols))
+	for i in range(len(dlines)):
+		pieces = dlines[i].split(delimiter)
+		for j in range(ncols):
+			dataArray[i, j] = float(pieces[j])
+	return dataArray
+
+
+def OldColumnToFloats( inputList, blankValue ):
+	# element-by-element fallback used by the old ReadCompositeTable
+	try:
+		return N.array(inputList, "Float64")
+	except ValueError:
+		floatList = list(inputList)
+		for j in range(len(inputList)):
+			try:
+				floatList[j] = float(inputList[j])
+			except ValueError:
+				floatList[j] = blankValue
+		return N.array(floatList)
+
+
+class TestReadTables(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.tempDir)
+
+	def WriteText(self, text):
+		fileName = os.path.join(self.tempDir, "table%d.dat" % len(os.listdir(self.tempDir)))
+		outf = open(fileName, 'wb')
+		outf.write(text)
+		outf.close()
+		return fileName
+
+	def testParseFloatTable(self):
+		rng = N.random.RandomState(42)
+		data = rng.normal(0.0, 1.0e3, (50, 4))
+		text = "# a b c d\n\n" + "".join([ "%.12g  %.12g\t%.12g %.12g\n" % tuple(row) for row in data ])
+		tables = [ (text, None), (text.replace("\n", "\r\n"), None),
+				("1,2.5,3\n# comment\n4,5,6e3\n", ","),
+				("1 2 3\n4 5 6 7\n8 9 10\n", None),
+				("1 2 3\n4 5 6 x\n8 9 10\n", None) ]
+		for (text, delimiter) in tables:
+			fileName = self.WriteText(text)
+			expected = OldReadTableArray(fileName, delimiter=delimiter)
+			d = du._ParseFloatTable(fileName, delimiter=delimiter)
+			self.assertTrue(N.array_equal(d, expected), repr(text[0:20]))
+			self.assertTrue(d.flags.f_contiguous)
+			self.assertTrue(N.array_equal(du.ReadTableArray(fileName, delimiter=delimiter), expected))
+
+	def testColumnToFloats(self):
+		for column in [["1.5", "2", "3e2"], ["1.5", " ", "3"], ["1.5", "", "x", " 4 "]]:
+			self.assertTrue(N.array_equal(du.ColumnToFloats(column, -99.0),
+										OldColumnToFloats(column, -99.0)))
+
+	def testCompositeTable(self):
+		text = "# name, x, n, y\n"
+		text += "a, 1.5, 3, 2.0\n"
+		text += "b, 2.5, 4, \n"
+		text += "c, , 5, 7.5\n"
+		fileName = self.WriteText(text)
+		columns = zip(*[ line.split(",") for line in text.splitlines()[1:] ])
+		dataList = du.ReadCompositeTable(fileName, delimiter=",", intCols=[2], blankVal=-1)
+		self.assertEqual(dataList[0], list(columns[0]))
+		self.assertTrue(N.array_equal(dataList[1], OldColumnToFloats(columns[1], -1)))
+		self.assertTrue(N.array_equal(dataList[2], N.array(columns[2], "Int64")))
+		self.assertTrue(N.array_equal(dataList[3], OldColumnToFloats(columns[3], -1)))
+		text = "# name x v\na 1.5 {1,2,3}\nb 2.5 {4,5,6}\nc 3.5 {7,8,9.5}\n"
+		fileName = self.WriteText(text)
+		subLists = [ N.array([1.0, 4.0, 7.0]), N.array([2.0, 5.0, 8.0]), N.array([3.0, 6.0, 9.5]) ]
+		frame = du.ReadCompositeTable(fileName, expandSubLists=True, dataFrame=True, columnRow=0)
+		self.assertEqual(frame.colNames, ["name", "x", "v_0", "v_1", "v_2"])
+		for k in range(3):
+			self.assertTrue(N.array_equal(frame["v_%d" % k], subLists[k]))
+		dataList = du.ReadCompositeTable(fileName, convertSubLists=True)
+		self.assertEqual(len(dataList), 3)
+		for k in range(3):
+			self.assertTrue(N.array_equal(dataList[2][k], subLists[k]))
+
+
+def OldExtractSubLists( textList, nSubLists ):
+	# string-by-string ExtractSubLists from before SubListArray existed
+	bigList = [ [] for i in range(nSubLists) ]
+	for textChunk in textList:
+		pp = textChunk.strip().strip("{").strip("}").split(",")
+		for i in range(nSubLists):
+			bigList[i].append(float(pp[i]))
+	return [ N.array(values) for values in bigList ]
+
+
+def OldAddExtraColumnNames( columnNames, subListColumns, subListLengths, subListSuffixes ):
+	# one-name-at-a-time insertion from before AddExtraColumnNames was rewritten
+	oldColNames = [ columnNames[i] for i in subListColumns ]
+	for i in range(len(subListColumns)):
+		if subListSuffixes is not None:
+			suffixes = subListSuffixes
+		else:
+			suffixes = [ str(k) for k in range(subListLengths[i]) ]
+		newNames = [ "%s_%s" % (oldColNames[i], suffixes[k]) for k in range(subListLengths[i]) ]
+		insertLoc = columnNames.index(oldColNames[i])
+		del columnNames[insertLoc]
+		for j in reversed(range(len(newNames))):
+			columnNames.insert(insertLoc, newNames[j])
+
+
+class TestSubLists(unittest.TestCase):
+
+	def testSubListArray(self):
+		textLists = [ ["{1,2,3}", "{4,5,6}", "{7,8,9.5}"],
+					[" {1.5, -2, 3e2} ", "{4, 5.25,6}"],
+					["{1,2,3,4}", "{5,6,7}", "{8,9,10,11,12}"],
+					["{1,2,3}"] ]
+		for textList in textLists:
+			expected = OldExtractSubLists(textList, 3)
+			subListArray = du.SubListArray(textList, 3)
+			self.assertEqual(subListArray.shape, (len(textList), 3))
+			subLists = du.ExtractSubLists(textList, 3)
+			self.assertEqual(len(subLists), 3)
+			for k in range(3):
+				self.assertTrue(N.array_equal(subListArray[:,k], expected[k]))
+				self.assertTrue(N.array_equal(subLists[k], expected[k]))
+		self.assertRaises(ValueError, du.SubListArray, ["{1,2,3}", "{4,,6}"], 3)
+		self.assertRaises(ValueError, du.SubListArray, ["{1,2,3}", "{4,x,6}"], 3)
+
+	def testExpandedNames(self):
+		for suffixes in [None, ["x", "y"]]:
+			colNames = ["name", "pos", "r", "vel", "flag"]
+			oldNames = list(colNames)
+			du.AddExtraColumnNames(colNames, [1, 3], [2, 2], suffixes)
+			OldAddExtraColumnNames(oldNames, [1, 3], [2, 2], suffixes)
+			self.assertEqual(colNames, oldNames)
+		theList = [0, 1, 2, 3]
+		du.InsertAndReplace(theList, 1, N.array([10, 11, 12]))
+		self.assertEqual(theList, [0, 10, 11, 12, 2, 3])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,280 @@
+# Tests for ellipse.py (run with "python -m unittest discover tests")
+
+import os, sys, shutil, tempfile, unittest
+import numpy as N
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import ellipse
+import datautils as du
+import spline
+
+
+colNames = ["row", "sma", "intens", "ndata"]
+
+
+def WriteEllipseFit( fileName, nPts=20, I0=1000.0, h=5.0 ):
+	"""Write a small tprint-style ellipse fit (exponential profile)."""
+	outf = open(fileName, 'w')
+	outf.write("#  Table el.tab  Mon 10:00:00 01-Jan-2013\n\n")
+	outf.write("#  row          SMA       INTENS      INT_ERR        ELLIP           PA        NDATA\n")
+	outf.write("#                 u            u            u            u            u            u\n\n")
+	for i in range(nPts):
+		sma = 0.5*(i + 1)
+		outf.write("%6d %.10g %.10g 0.1 0.2 %.10g %d\n" % (i + 1, sma, I0*N.exp(-sma/h),
+					10.0 + i, 10 + i))
+	outf.close()
+
+
+class TestColumnsFromText(unittest.TestCase):
+
+	def test_columns(self):
+		text = "1  0.5  10.0  12\n2  1.0  INDEF  18\n"
+		dataDict = ellipse._ColumnsFromText(text, colNames, 2)
+		self.assertEqual(sorted(dataDict.keys()), ["intens", "ndata", "sma"])
+		self.assertTrue(N.array_equal(dataDict["intens"], [10.0, 0.0]))
+		self.assertTrue(N.array_equal(dataDict["ndata"], [12, 18]))
+		self.assertTrue(dataDict["ndata"].dtype.kind == "i")
+
+	def test_ragged_lines(self):
+		# right total number of values, but not the right number on each line
+		text = "1  0.5  10.0\n2  1.0  8.0  18  12\n"
+		self.assertRaises(ValueError, ellipse._ColumnsFromText, text, colNames, 2)
+
+	def test_bad_integer(self):
+		text = "1  0.5  10.0  12\n2  1.0  8.0  INDEF\n"
+		self.assertRaisesRegexp(ValueError, "ndata.*row 2: INDEF", ellipse._ColumnsFromText,
+								text, colNames, 2)
+		text = "1  0.5  10.0  12\n2  1.0  8.0  18.5\n"
+		self.assertRaises(ValueError, ellipse._ColumnsFromText, text, colNames, 2)
+
+
+class TestInterpolateEllipseFit(unittest.TestCase):
+
+	def setUp(self):
+		fd, self.fileName = tempfile.mkstemp(suffix=".ascii")
+		os.close(fd)
+		WriteEllipseFit(self.fileName, nPts=30)
+
+	def tearDown(self):
+		os.remove(self.fileName)
+
+	def testMatchesColumnByColumn(self):
+		newSMA = N.linspace(0.0, 20.0, 57)
+		for dataFrame in [False, True]:
+			efit = ellipse.ReadEllipse(self.fileName, dataFrame=dataFrame)
+			for linear in [False, True]:
+				newFit = ellipse.InterpolateEllipseFit(efit, newSMA, linear=linear)
+				self.assertTrue(N.array_equal(newFit["sma"], newSMA))
+				for cname in ["intens", "ellip", "pa", "int_err"]:
+					if linear:
+						expected = spline.linear_interpolate(efit["sma"], efit[cname], newSMA)
+					else:
+						expected = spline.spline_interpolate(efit["sma"], efit[cname], newSMA)
+					self.assertTrue(N.allclose(newFit[cname], expected, rtol=1e-12, atol=1e-12))
+				expected = spline.linear_interpolate(efit["sma"], N.array(efit["ndata"], float),
+													newSMA)
+				if linear:
+					self.assertTrue(N.array_equal(newFit["ndata"], N.round(expected).astype(int)))
+				self.assertEqual(newFit["ndata"].dtype.kind, "i")
+				if dataFrame:
+					self.assertTrue(isinstance(newFit, du.ListDataFrame))
+					self.assertEqual(newFit.colNames, efit.colNames)
+				else:
+					self.assertEqual(newFit["column_list"], efit["column_list"])
+
+
+def OldNearestIndex( vector, value ):
+	# linear-scan NearestIndex(noprint=True) from before BracketIndices existed
+	npts = len(vector)
+	if (value < min(vector)) or (value > max(vector)):
+		return (None, None)
+	if vector[1] - vector[0] > 0:
+		Sign = 1
+	else:
+		Sign = -1
+	i1 = i2 = 0
+	diff = Sign*(value - vector[0])
+	for i in range(1, npts):
+		newdiff = Sign*(value - vector[i])
+		if (newdiff > 0) and (newdiff <= diff):
+			diff = newdiff
+			i1 = i
+		else:
+			i2 = i
+			break
+	return (i1, i2)
+
+
+def OldMergeIndices( r1, r2, r, keepEqual ):
+	# merge points as computed by the old MergeEllipseFits (keepEqual=False)
+	# and profiles.MergeTwoProfiles (keepEqual=True)
+	end1 = OldNearestIndex(r1, r)[1]
+	start2 = OldNearestIndex(r2, r)[1]
+	if keepEqual:
+		if r2[start2] < r1[end1]:
+			start2 += 1
+	elif r2[start2] <= r1[end1]:
+		start2 += 1
+	return (end1, start2)
+
+
+class TestBracketIndices(unittest.TestCase):
+
+	def setUp(self):
+		self.vector = N.array([0.5, 1.0, 2.0, 3.5, 5.0, 8.0, 13.0])
+		self.values = [0.5, 0.7, 1.0, 1.5, 2.0, 3.6, 7.999, 8.0, 12.0, 13.0, 0.4, 13.1]
+
+	def test_matches_linear_scan(self):
+		for vector in [self.vector, self.vector[::-1]]:
+			(i1, i2) = ellipse.BracketIndices(vector, self.values)
+			for j, value in enumerate(self.values):
+				old = OldNearestIndex(vector, value)
+				if old[0] is None:
+					self.assertEqual((i1[j], i2[j]), (-1, -1))
+				else:
+					self.assertEqual((i1[j], i2[j]), old, "value = %g" % value)
+				self.assertEqual(ellipse.NearestIndex(vector, value, noprint=True), old)
+
+	def test_merge_indices(self):
+		r1 = N.array([0.5, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+		r2 = N.array([2.5, 3.0, 3.5, 4.0, 5.5, 7.0, 9.0])
+		radii = [2.5, 2.9, 3.0, 3.2, 4.0, 4.5, 6.0]
+		for keepEqual in [False, True]:
+			(ends1, starts2) = ellipse.MergeIndices(r1, r2, radii, keepEqual=keepEqual)
+			for j, r in enumerate(radii):
+				old = OldMergeIndices(r1, r2, r, keepEqual)
+				self.assertEqual((ends1[j], starts2[j]), old)
+				self.assertEqual(ellipse.MergeIndices(r1, r2, r, keepEqual), old)
+		# the keepEqual edge case: r2 has a point equal to r1[end1]
+		self.assertEqual(ellipse.MergeIndices(r1, r2, 2.9, keepEqual=False), (3, 2))
+		self.assertEqual(ellipse.MergeIndices(r1, r2, 2.9, keepEqual=True), (3, 1))
+		(ends1, starts2) = ellipse.MergeIndices(r1, r2, [0.5, 9.0])
+		self.assertTrue(N.array_equal(ends1, [-1, -1]))
+		self.assertTrue(N.array_equal(starts2, [-1, -1]))
+
+
+class TestEllipseCache(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.mkdtemp()
+		self.fileName = os.path.join(self.tempDir, "el.ascii")
+		WriteEllipseFit(self.fileName)
+		self._ParseEllipseFile = ellipse._ParseEllipseFile
+
+	def tearDown(self):
+		ellipse._ParseEllipseFile = self._ParseEllipseFile
+		shutil.rmtree(self.tempDir)
+
+	def _DisableParsing(self):
+		def NoParsing( *args ):
+			raise AssertionError("text file parsed instead of read from cache")
+		ellipse._ParseEllipseFile = NoParsing
+
+	def _AssertSameFit(self, efit1, efit2):
+		self.assertEqual(efit1["column_list"], efit2["column_list"])
+		for cname in efit1["column_list"]:
+			self.assertTrue(N.array_equal(efit1[cname], efit2[cname]))
+
+	def testCacheHit(self):
+		efit = ellipse.ReadEllipse(self.fileName, pix=0.5, dataFrame=False)
+		efitCached = ellipse.ReadEllipse(self.fileName, pix=0.5, dataFrame=False, cache=True)
+		self._AssertSameFit(efit, efitCached)
+		self.assertTrue(os.path.exists(ellipse.EllipseCacheFilename(self.fileName, pix=0.5)))
+		self._DisableParsing()
+		efitCached = ellipse.ReadEllipse(self.fileName, pix=0.5, dataFrame=False, cache=True)
+		self._AssertSameFit(efit, efitCached)
+		frame = ellipse.ReadEllipse(self.fileName, pix=0.5, cache=True)
+		self.assertTrue(N.array_equal(frame.sma, efit["sma"]))
+
+	def testOptionsChange(self):
+		ellipse.ReadEllipse(self.fileName, pix=0.5, dataFrame=False, cache=True)
+		efit = ellipse.ReadEllipse(self.fileName, pix=0.25, ZP=20.0, dataFrame=False, cache=True)
+		self.assertTrue(N.allclose(efit["sma"], 0.25*efit["sma_pix"]))
+		self.assertTrue("sb" in efit["column_list"])
+		cacheFile1 = ellipse.EllipseCacheFilename(self.fileName, pix=0.5)
+		cacheFile2 = ellipse.EllipseCacheFilename(self.fileName, pix=0.25, ZP=20.0)
+		self.assertNotEqual(cacheFile1, cacheFile2)
+		self.assertTrue(os.path.exists(cacheFile1) and os.path.exists(cacheFile2))
+
+	def testSourceChange(self):
+		ellipse.ReadEllipse(self.fileName, dataFrame=False, cache=True)
+		WriteEllipseFit(self.fileName, nPts=30)
+		stats = os.stat(self.fileName)
+		os.utime(self.fileName, (stats.st_atime, stats.st_mtime + 10))
+		efit = ellipse.ReadEllipse(self.fileName, dataFrame=False, cache=True)
+		self.assertEqual(len(efit["sma"]), 30)
+		self._DisableParsing()
+		efit = ellipse.ReadEllipse(self.fileName, dataFrame=False, cache=True)
+		self.assertEqual(len(efit["sma"]), 30)
+
+	def testBadCacheFile(self):
+		efit = ellipse.ReadEllipse(self.fileName, dataFrame=False)
+		cacheFile = ellipse.EllipseCacheFilename(self.fileName)
+		ellipse.ReadEllipse(self.fileName, dataFrame=False, cache=True)
+		goodCache = open(cacheFile, 'rb').read()
+		oldLayout = os.path.join(self.tempDir, "old.npz")
+		N.savez(oldLayout, sma=efit["sma"])
+		for badContents in ["", "not a cache file", goodCache[0:len(goodCache)//2],
+							open(oldLayout, 'rb').read()]:
+			outf = open(cacheFile, 'wb')
+			outf.write(badContents)
+			outf.close()
+			efitCached = ellipse.ReadEllipse(self.fileName, dataFrame=False, cache=True)
+			self._AssertSameFit(efit, efitCached)
+			# cache file was rewritten
+			self._DisableParsing()
+			efitCached = ellipse.ReadEllipse(self.fileName, dataFrame=False, cache=True)
+			self._AssertSameFit(efit, efitCached)
+			ellipse._ParseEllipseFile = self._ParseEllipseFile
+
+
+class TestReadEllipseBatch(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.mkdtemp()
+		self.fileNames = []
+		for i in range(3):
+			fileName = os.path.join(self.tempDir, "el_%d.ascii" % i)
+			WriteEllipseFit(fileName, nPts=10 + 5*i, h=3.0 + i)
+			self.fileNames.append(fileName)
+		self.fileOptions = {"el_1.ascii": {"pix": 0.1, "ZP": 20.0}}
+
+	def tearDown(self):
+		shutil.rmtree(self.tempDir)
+
+	def _CheckBatch(self, efits, dataFrame):
+		self.assertEqual(sorted(efits.keys()), self.fileNames)
+		for fileName in self.fileNames:
+			if fileName.endswith("el_1.ascii"):
+				efit = ellipse.ReadEllipse(fileName, pix=0.1, ZP=20.0, dataFrame=dataFrame)
+			else:
+				efit = ellipse.ReadEllipse(fileName, pix=0.5, dataFrame=dataFrame)
+			if dataFrame:
+				columnList = efit.colNames
+				self.assertEqual(efits[fileName].colNames, columnList)
+				self.assertEqual(efits[fileName].arcsec_per_pix, efit.arcsec_per_pix)
+				self.assertEqual(efits[fileName].tableFile, efit.tableFile)
+			else:
+				columnList = efit["column_list"]
+				self.assertEqual(efits[fileName]["column_list"], columnList)
+			for cname in columnList:
+				self.assertTrue(N.array_equal(efits[fileName][cname], efit[cname]))
+
+	def testSerialAndParallel(self):
+		pattern = os.path.join(self.tempDir, "el_*.ascii")
+		for nProcs in [1, 2]:
+			for dataFrame in [False, True]:
+				efits = ellipse.ReadEllipseBatch(pattern, pix=0.5, fileOptions=self.fileOptions,
+												dataFrame=dataFrame, nProcs=nProcs)
+				self._CheckBatch(efits, dataFrame)
+		# unicode glob pattern and explicit list of files
+		efits = ellipse.ReadEllipseBatch(unicode(pattern), pix=0.5, fileOptions=self.fileOptions,
+										dataFrame=False, nProcs=1)
+		self._CheckBatch(efits, False)
+		efits = ellipse.ReadEllipseBatch(self.fileNames, pix=0.5, fileOptions=self.fileOptions,
+										dataFrame=False, nProcs=2)
+		self._CheckBatch(efits, False)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,131 @@
+# Tests for getgalaxyprofiles.py (run with "python -m unittest discover tests")
+
+import os, sys, shutil, tempfile, unittest
+import numpy as N
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import getgalaxyprofiles as ggp
+import profiles
+
+
+class TestExtractStripProfile(unittest.TestCase):
+
+	def setUp(self):
+		rng = N.random.RandomState(42)
+		self.image = rng.uniform(1.0, 100.0, (50, 40))
+		# plane: bilinear interpolation (as in pvector) is exact
+		(yy, xx) = N.mgrid[0:50, 0:40]
+		self.plane = 2.0 + 0.5*xx + 0.25*yy
+
+	def test_axis_aligned(self):
+		# profiles through pixel centers along rows/columns are just the pixel values
+		(x, y) = ggp.ExtractStripProfile(self.image, 21.0, 26.0, 0.0, 10)
+		self.assertTrue(N.array_equal(x, N.arange(1.0, 12.0)))
+		self.assertTrue(N.allclose(y, self.image[25, 15:26], rtol=1e-12, atol=0))
+		(x, y) = ggp.ExtractStripProfile(self.image, 21.0, 26.0, 90.0, 10)
+		self.assertTrue(N.allclose(y, self.image[20:31, 20], rtol=1e-12, atol=0))
+		(x, y) = ggp.ExtractStripProfile(self.image, 21.0, 26.0, 0.0, 10, width=3)
+		self.assertTrue(N.allclose(y, self.image[24:27, 15:26].mean(axis=0), rtol=1e-12, atol=0))
+
+	def test_plane(self):
+		xc, yc, length = 20.3, 24.6, 20
+		t = N.linspace(-0.5*length, 0.5*length, length + 1)
+		for theta in [0.0, 30.0, 117.5, 245.0]:
+			ct = N.cos(N.radians(theta))
+			st = N.sin(N.radians(theta))
+			expected = 2.0 + 0.5*(xc - 1.0 + ct*t) + 0.25*(yc - 1.0 + st*t)
+			for width in [1, 3, 4]:
+				(x, y) = ggp.ExtractStripProfile(self.plane, xc, yc, theta, length, width)
+				self.assertTrue(N.allclose(y, expected, rtol=1e-12, atol=0))
+
+	def test_boundary(self):
+		(x, y) = ggp.ExtractStripProfile(self.image, 3.0, 26.0, 0.0, 10, boundaryValue=-1.0)
+		self.assertTrue((y[0:3] == -1.0).all())
+		self.assertTrue(N.allclose(y[3:], self.image[25, 0:8], rtol=1e-12, atol=0))
+
+	def test_multiple_angles(self):
+		thetas = [0.0, 33.0, 90.0, 201.0]
+		(x, profileMatrix) = ggp.ExtractStripProfiles(self.image, 20.3, 24.6, thetas, 15, 3)
+		self.assertEqual(profileMatrix.shape, (len(thetas), len(x)))
+		for i in range(len(thetas)):
+			(x1, y1) = ggp.ExtractStripProfile(self.image, 20.3, 24.6, thetas[i], 15, 3)
+			self.assertTrue(N.allclose(profileMatrix[i], y1, rtol=1e-12, atol=0))
+
+	def test_write_and_read(self):
+		(x, y) = ggp.ExtractStripProfile(self.image, 20.3, 24.6, 33.0, 15, 3)
+		fd, fileName = tempfile.mkstemp(suffix=".dat")
+		os.close(fd)
+		try:
+			ggp.WriteStripProfile(x, y, fileName, "test.fits", 20.3, 24.6, 3, 33.0, 15)
+			lines = open(fileName).readlines()
+			self.assertTrue(lines[0].startswith("# Profile generated"))
+			self.assertTrue(lines[1].startswith("# pvect test.fits"))
+			(xRead, yRead) = profiles.ReadProfile(fileName)
+			self.assertTrue(N.array_equal(xRead, x))
+			self.assertTrue(N.allclose(yRead, y, rtol=1e-9, atol=0))
+		finally:
+			os.remove(fileName)
+
+
+class TestProfileSweep(unittest.TestCase):
+
+	def setUp(self):
+		rng = N.random.RandomState(7)
+		self.image = rng.uniform(1.0, 100.0, (60, 50))
+		self.options = ggp.DummyOptions()
+		self.options.xCenter = 25.4
+		self.options.yCenter = 30.2
+		self.options.widths = [1, 3]
+		self.imagePAs = [0.0, 45.0, 110.0, 125.0, 300.0]
+		self.tempDir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.tempDir)
+
+	def SingleProfiles( self, width, saveFiles=False ):
+		# one GetAndSaveProfiles call per PA, as the per-PA scripts did
+		results = []
+		for pa in self.imagePAs:
+			self.options.imagePA = pa
+			rootName = os.path.join(self.tempDir, "single_pa%.1f" % pa)
+			self.options.widths = [width]
+			results.append(ggp.GetAndSaveProfiles(self.options, "test.fits", 12, rootName,
+									imageData=self.image, saveFiles=saveFiles)[0])
+		self.options.widths = [1, 3]
+		return results
+
+	def test_sweep(self):
+		for width in self.options.widths:
+			(x, profileMatrix) = ggp.GetProfileSweep(self.image, self.options.xCenter,
+									self.options.yCenter, self.imagePAs, 12, width)
+			self.assertEqual(profileMatrix.shape, (len(self.imagePAs), 25))
+			for i, (x1, y1) in enumerate(self.SingleProfiles(width)):
+				self.assertTrue(N.array_equal(x, x1))
+				self.assertTrue(N.allclose(profileMatrix[i], y1, rtol=1e-12, atol=0))
+
+	def test_fold(self):
+		(r, foldedMatrix) = ggp.GetProfileSweep(self.image, self.options.xCenter,
+								self.options.yCenter, self.imagePAs, 12, 3, fold=True)
+		for i, fileName in enumerate(self.SingleProfiles(3, saveFiles=True)):
+			(rFold, yFold) = profiles.ReadAndFoldProfile(fileName)
+			self.assertTrue(N.allclose(r, rFold))
+			self.assertTrue(N.allclose(foldedMatrix[i], yFold, rtol=1e-9, atol=0))
+
+	def test_saved_files(self):
+		rootNames = [ os.path.join(self.tempDir, "sweep_pa%.1f" % pa) for pa in self.imagePAs ]
+		(x, profileMatrices, fileNames) = ggp.GetAndSaveProfileSweep(self.options, "test.fits",
+										12, self.imagePAs, rootNames, imageData=self.image)
+		self.assertEqual(len(fileNames), len(self.imagePAs)*len(self.options.widths))
+		singleFiles = self.SingleProfiles(3, saveFiles=True)
+		for i in range(len(self.imagePAs)):
+			fileName = rootNames[i] + "_w3.dat"
+			self.assertTrue(fileName in fileNames)
+			(x1, y1) = profiles.ReadProfile(fileName)
+			(x2, y2) = profiles.ReadProfile(singleFiles[i])
+			self.assertTrue(N.array_equal(x1, x2))
+			self.assertTrue(N.array_equal(y1, y2))
+			self.assertEqual(open(fileName).readlines()[1], open(singleFiles[i]).readlines()[1])
+
+
+if __name__ == "__main__":
+	unittest.main()
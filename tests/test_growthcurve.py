@@ -0,0 +1,64 @@
+# Tests for growthcurve.py (run with "python -m unittest discover tests")
+
+import os, sys, tempfile, unittest
+import numpy as N
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import ellipse
+import growthcurve
+
+
+def WriteExponentialEllipseFit( fileName, I0=1000.0, h=20.0, ellipticity=0.3, nPts=2000,
+								amax=400.0 ):
+	"""Write a tprint-style ellipse fit for an exponential profile (scale
+	length h pixels) with constant ellipticity."""
+	sma = N.linspace(0.0, amax, nPts)
+	intens = I0*N.exp(-sma/h)
+	x = sma/h
+	tflux = 2*N.pi*h*h*I0*(1.0 - ellipticity)*(1.0 - (1.0 + x)*N.exp(-x))
+	outf = open(fileName, 'w')
+	outf.write("#  Table el.tab  Mon 10:00:00 01-Jan-2013\n\n")
+	outf.write("#  row          SMA       INTENS      INT_ERR        ELLIP           PA      TFLUX_E\n")
+	outf.write("#                 u            u            u            u            u            u\n\n")
+	for i in range(nPts):
+		outf.write("%6d %.10g %.10g 0.1 %.10g 10.0 %.10g\n" % (i + 1, sma[i], intens[i],
+					ellipticity, tflux[i]))
+	outf.close()
+	return 2*N.pi*h*h*I0*(1.0 - ellipticity)
+
+
+class TestPhotometry(unittest.TestCase):
+
+	def setUp(self):
+		fd, self.fileName = tempfile.mkstemp(suffix=".ascii")
+		os.close(fd)
+		self.trueFlux = WriteExponentialEllipseFit(self.fileName)
+
+	def tearDown(self):
+		os.remove(self.fileName)
+
+	def testDictAndFrameInputAgree(self):
+		pix = 0.5
+		efitFrame = ellipse.ReadEllipse(self.fileName, pix=pix)
+		efitDict = ellipse.ReadEllipse(self.fileName, pix=pix, dataFrame=False)
+		for method in growthcurve.CUMULATIVE_METHODS:
+			photFrame = growthcurve.Photometry(efitFrame, method=method)
+			photDict = growthcurve.Photometry(efitDict, method=method)
+			photBoth = growthcurve.Photometry([efitFrame, efitDict], method=method)
+			self.assertAlmostEqual(photFrame["totalFlux"]/self.trueFlux, 1.0, 3)
+			for name in ["totalFlux", "r_e", "r_90", "r_petro"]:
+				self.assertAlmostEqual(photDict[name], photFrame[name], 8)
+				self.assertAlmostEqual(photBoth[name][1], photBoth[name][0], 8)
+		# radii are in arcsec: r_e = 1.678 h (pixels)
+		self.assertAlmostEqual(photFrame["r_e"]/(pix*1.67835*20.0), 1.0, 3)
+
+	def testMissingPixelScale(self):
+		efitDict = ellipse.ReadEllipse(self.fileName, pix=0.5, dataFrame=False)
+		del efitDict["sma_pix"]
+		self.assertRaises(ValueError, growthcurve.Photometry, efitDict)
+		phot = growthcurve.Photometry(efitDict, pix=0.5)
+		self.assertAlmostEqual(phot["totalFlux"]/self.trueFlux, 1.0, 3)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,126 @@
+# Tests for imfit.py (run with "python -m unittest discover tests")
+
+import os, sys, copy, unittest
+import numpy as N
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import astro_funcs as af
+import imfit
+
+
+profilefitConfig = """GAIN   4.5   # comment
+ORIGINAL_SKY  120.0  extra tokens
+X0   0.0   fixed
+FUNCTION Sersic-1D   LABEL bulge
+n      2.5    0.5,8
+mu_e   18.0
+r_e    5.0    fixed
+FUNCTION Exponential-1D
+mu_0   20.0   15,25
+h      30.0
+"""
+
+imfitConfig = """X0   100.0   90,110
+Y0   101.0   90,110
+FUNCTION Exponential
+PA     10.0
+ell    0.2   0,1
+I_0    50.0
+h      20.0
+"""
+
+
+class TestParseConfigText(unittest.TestCase):
+
+	def test_profilefit(self):
+		model = imfit._ParseConfigText(profilefitConfig)
+		self.assertFalse(model.imfitFormat)
+		self.assertEqual(model.options, ["GAIN 4.5", "ORIGINAL_SKY 120.0 extra tokens"])
+		self.assertEqual(model.functionNames, ["Sersic-1D", "Exponential-1D"])
+		self.assertEqual(model.functions, [af.Sersic, af.Exponential])
+		self.assertEqual(model.paramNames, ["X0", "n", "mu_e", "r_e", "mu_0", "h"])
+		self.assertEqual(model.lowerLimits, [None, 0.5, None, None, 15.0, None])
+		self.assertEqual(model.fixed, [True, False, False, True, False, False])
+
+	def test_imfit(self):
+		model = imfit._ParseConfigText(imfitConfig)
+		self.assertTrue(model.imfitFormat)
+		self.assertEqual(model.functions, [af.Exponential])
+		self.assertEqual(model.GetParameterLists(), [[0.0, 50.0, 20.0]])
+
+	def test_unknown_function(self):
+		badName = profilefitConfig.replace("Exponential-1D", "NoSuchFunction")
+		self.assertRaisesRegexp(ValueError, "NoSuchFunction", imfit._ParseConfigText, badName)
+		# imfit 2D function in a profilefit-format file, and vice versa
+		wrongFormat = profilefitConfig.replace("Exponential-1D", "Exponential")
+		self.assertRaisesRegexp(ValueError, "\"Exponential\"", imfit._ParseConfigText,
+								wrongFormat)
+		wrongFormat = imfitConfig.replace("Exponential", "Exponential-1D")
+		self.assertRaisesRegexp(ValueError, "Exponential-1D", imfit._ParseConfigText,
+								wrongFormat)
+
+
+brokenExpConfig = """X0   1.5   fixed
+FUNCTION BrokenExponential-1D
+mu_0   18.0   16,20
+h1     10.0   5,20
+h2     4.0
+r_b    30.0   20,40
+alpha  0.5    0.2,2
+"""
+
+
+class TestConvertModel(unittest.TestCase):
+
+	def test_matches_explicit_conversion(self):
+		# same values as the original hard-coded conversion in n4536/convertprofilefit.py
+		(ZP, pix) = (18.1639, 0.75)
+		model = imfit._ParseConfigText(profilefitConfig)
+		params = model.GetParameterLists()
+		expected = copy.deepcopy(params)
+		expected[0][2] = 10**(0.4 * (ZP - params[0][2]))
+		expected[1][1] = 10**(0.4 * (ZP - params[1][1]))
+		expected[0][3] = params[0][3]/pix
+		expected[1][2] = params[1][2]/pix
+		converted = imfit.ConvertModel(model, ZP, pix).GetParameterLists()
+		for i in range(2):
+			self.assertTrue(N.allclose(converted[i], expected[i], rtol=1e-14))
+
+	def test_round_trip(self):
+		model = imfit._ParseConfigText(brokenExpConfig + profilefitConfig.split("\n", 2)[2])
+		unitTypes = imfit.ParameterUnitTypes(model)
+		self.assertEqual(unitTypes[0:6], [None, "sb", "length", "length", "length",
+										"inverse_length"])
+		paramArray = N.array([model.values, model.values])
+		ZP = N.array([20.0, 25.0])
+		pix = N.array([0.5, 0.1])
+		counts = imfit.ConvertParameterArray(paramArray, unitTypes, ZP, pix)
+		self.assertAlmostEqual(counts[1,1], 10**(0.4*(25.0 - 18.0)), 10)
+		self.assertAlmostEqual(counts[1,2], 100.0, 10)
+		self.assertAlmostEqual(counts[1,5], 0.05, 12)
+		self.assertEqual(counts[1,0], 1.5)
+		back = imfit.ConvertParameterArray(counts, unitTypes, ZP, pix, toCounts=False)
+		self.assertTrue(N.allclose(back, paramArray, rtol=1e-12))
+		# single model
+		back = imfit.ConvertParameterArray(counts[0], unitTypes, 20.0, 0.5, toCounts=False)
+		self.assertTrue(N.allclose(back, model.values, rtol=1e-12))
+
+	def test_limits(self):
+		model = imfit._ParseConfigText(brokenExpConfig)
+		newModel = imfit.ConvertModel(model, 20.0, 0.5)
+		# mu_0 limits (16,20) become intensities in the reverse order
+		self.assertAlmostEqual(newModel.lowerLimits[1], 1.0, 12)
+		self.assertAlmostEqual(newModel.upperLimits[1], 10**1.6, 10)
+		self.assertEqual((newModel.lowerLimits[2], newModel.upperLimits[2]), (10.0, 40.0))
+		self.assertEqual((newModel.lowerLimits[5], newModel.upperLimits[5]), (0.1, 1.0))
+		self.assertEqual(newModel.lowerLimits[3], None)
+		self.assertEqual(newModel.fixed, model.fixed)
+		backModel = imfit.ConvertModel(newModel, 20.0, 0.5, toCounts=False)
+		self.assertTrue(N.allclose(backModel.values, model.values, rtol=1e-12))
+		for j in [1, 2, 4, 5]:
+			self.assertAlmostEqual(backModel.lowerLimits[j], model.lowerLimits[j], 10)
+			self.assertAlmostEqual(backModel.upperLimits[j], model.upperLimits[j], 10)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,69 @@
+# Tests for plotutils.py (run with "python -m unittest discover tests")
+
+import os, sys, unittest
+import numpy as N
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import matplotlib
+matplotlib.use("Agg")
+import astro_funcs as af
+import imfit
+import plotutils
+
+
+funcList = [af.Sersic, af.Exponential]
+paramList = [[0.0, 2.5, 18.0, 5.0], [0.0, 20.0, 30.0]]
+
+
+class TestGetFuncSum(unittest.TestCase):
+
+	def setUp(self):
+		self.getargspec = imfit.inspect.getargspec
+		self.nCalls = [0]
+		def CountingGetargspec( func ):
+			self.nCalls[0] += 1
+			return self.getargspec(func)
+		imfit.inspect.getargspec = CountingGetargspec
+		plotutils._funcSumModel = None
+
+	def tearDown(self):
+		imfit.inspect.getargspec = self.getargspec
+
+	def testMatchesPairwiseSum(self):
+		r = N.linspace(0.0, 100.0, 201)
+		mu = plotutils.GetFuncSum(r, funcList, paramList)
+		# original evaluation: components in magnitudes, combined pairwise with addmag
+		mu_old = plotutils.addmag(af.Sersic(r, paramList[0]), af.Exponential(r, paramList[1]))
+		self.assertTrue(N.allclose(mu, mu_old, rtol=0, atol=1e-10))
+		I = plotutils.GetFuncSum(r, funcList, paramList, mag=False)
+		I_old = af.Sersic(r, paramList[0], mag=False) + af.Exponential(r, paramList[1], mag=False)
+		self.assertTrue(N.allclose(I, I_old, rtol=1e-12))
+
+	def testModelReused(self):
+		r = N.linspace(0.0, 100.0, 201)
+		plotutils.GetFuncSum(r, funcList, paramList)
+		nCalls = self.nCalls[0]
+		self.assertEqual(nCalls, 2)
+		newParams = [[0.0, 3.0, 18.5, 6.0], [0.0, 20.5, 25.0]]
+		mu = plotutils.GetFuncSum(r[0:50], funcList, newParams)
+		self.assertEqual(self.nCalls[0], nCalls)
+		mu_old = plotutils.addmag(af.Sersic(r[0:50], newParams[0]),
+								af.Exponential(r[0:50], newParams[1]))
+		self.assertTrue(N.allclose(mu, mu_old, rtol=0, atol=1e-10))
+		# explicitly supplied model
+		model = imfit.CompiledModel(funcList, newParams)
+		nCalls = self.nCalls[0]
+		self.assertTrue(N.allclose(plotutils.GetFuncSum(r[0:50], funcList, None,
+								compiledModel=model), mu, rtol=0, atol=1e-12))
+		self.assertEqual(self.nCalls[0], nCalls)
+
+	def testEvaluateWithComponents(self):
+		r = N.linspace(0.0, 100.0, 201)
+		model = imfit.CompiledModel(funcList, paramList)
+		(total, components) = model.EvaluateWithComponents(r)
+		self.assertTrue(N.array_equal(total, model.Evaluate(r)))
+		self.assertTrue(N.allclose(components[1], af.Exponential(r, paramList[1]), rtol=1e-12))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,97 @@
+# Tests for profilefit.py (run with "python -m unittest discover tests")
+
+import os, sys, unittest
+import numpy as N
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import astro_funcs as af
+import imfit
+import profilefit
+
+
+def MakeModel( fixed=False ):
+	model = imfit.ConfigModel()
+	x0 = model.AddParameter("X0", 0.0, fixed=True)
+	model.functionNames.append("Sersic-1D")
+	model.functions.append(af.Sersic)
+	model.centerIndices.append([x0])
+	indices = []
+	for (name, value, lower, upper) in [("n", 2.5, 0.5, 8), ("mu_e", 18.0, 10, 25),
+										("r_e", 5.0, 0.1, 50)]:
+		if fixed:
+			indices.append(model.AddParameter(name, value, fixed=True))
+		else:
+			indices.append(model.AddParameter(name, value, lower, upper))
+	model.paramIndices.append(indices)
+	return model
+
+
+class TestFitProfile(unittest.TestCase):
+
+	def setUp(self):
+		self.r = N.linspace(0.5, 30.0, 60)
+		self.y = af.Sersic(self.r, [0.0, 3.0, 18.5, 6.0])
+
+	def testFit(self):
+		result = profilefit.FitProfile(self.r, self.y, MakeModel())
+		self.assertTrue(result.success)
+		self.assertTrue(N.allclose(result.values, [0.0, 3.0, 18.5, 6.0], rtol=1e-5))
+
+	def testAllParametersFixed(self):
+		model = MakeModel(fixed=True)
+		result = profilefit.FitProfile(self.r, self.y, model)
+		self.assertEqual(result.status, profilefit.STATUS_ALL_FIXED)
+		self.assertTrue(N.array_equal(result.values, model.values))
+		residuals = model.Evaluate(self.r) - self.y
+		self.assertAlmostEqual(result.chi2, N.sum(residuals**2))
+
+	def testSersicJacobian(self):
+		params = [0.3, 2.7, 1.5, 4.0]
+		derivs = profilefit.jacobianMap[af.Sersic](self.r, params, False)
+		for j in range(len(params)):
+			step = 1.0e-6 * max(abs(params[j]), 1.0)
+			upParams = list(params)
+			downParams = list(params)
+			upParams[j] += step
+			downParams[j] -= step
+			numerical = (af.Sersic(self.r, upParams, False) - af.Sersic(self.r, downParams, False))/(2*step)
+			self.assertTrue(N.allclose(derivs[j], numerical, rtol=1e-5, atol=1e-8))
+
+
+class TestFitProfileBatch(unittest.TestCase):
+
+	def setUp(self):
+		self.r = N.linspace(0.5, 30.0, 60)
+		self.trueParams = [ [0.0, 2.0 + 0.2*i, 18.0 + 0.1*i, 5.0 + 0.3*i] for i in range(6) ]
+		self.profileList = [ (self.r, af.Sersic(self.r, p)) for p in self.trueParams ]
+		self.model = MakeModel()
+
+	def testMatchesSequentialFits(self):
+		sequential = [ profilefit.FitProfile(r, y, self.model) for (r, y) in self.profileList ]
+		fitArray = profilefit.FitProfileBatch(self.profileList, self.model, warmStart=False,
+												nProcs=1)
+		self.assertEqual(list(fitArray["name"]), [ str(i) for i in range(6) ])
+		for i, result in enumerate(sequential):
+			self.assertEqual(fitArray["status"][i], result.status)
+			self.assertEqual(fitArray["nfev"][i], result.nfev)
+			self.assertEqual(fitArray["nDOF"][i], result.nDOF)
+			self.assertTrue(N.array_equal(fitArray["values"][i], result.values))
+			self.assertTrue(N.array_equal(fitArray["errors"][i], result.errors))
+			self.assertEqual(fitArray["chi2"][i], result.chi2)
+
+	def testParallelAndWarmStart(self):
+		sequential = profilefit.FitProfileBatch(self.profileList, self.model, warmStart=False,
+												nProcs=1)
+		for (warmStart, nProcs) in [(False, 2), (True, 1), (True, 3)]:
+			fitArray = profilefit.FitProfileBatch(self.profileList, self.model,
+												warmStart=warmStart, nProcs=nProcs)
+			self.assertTrue(fitArray["success"].all())
+			self.assertTrue(N.allclose(fitArray["values"], sequential["values"], rtol=1e-5))
+			self.assertTrue(N.allclose(fitArray["values"], self.trueParams, rtol=1e-5))
+			if warmStart is False:
+				self.assertTrue(N.array_equal(fitArray["values"], sequential["values"]))
+				self.assertTrue(N.array_equal(fitArray["nfev"], sequential["nfev"]))
+
+
+if __name__ == "__main__":
+	unittest.main()
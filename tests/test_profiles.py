@@ -0,0 +1,132 @@
+# Tests for profiles.py (run with "python -m unittest discover tests")
+
+import os, sys, unittest
+import numpy as N
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import profiles
+import spline
+
+
+class TestParseProfileLines(unittest.TestCase):
+
+	def test_regular(self):
+		lines = ["# r  I\n", "1.0  10.0  0.1\n", "\n", "2.0  5.0  0.2\n", "3.0  2.5  0.3"]
+		(x, y) = profiles._ParseProfileLines(lines)
+		self.assertTrue(N.array_equal(x, [1.0, 2.0, 3.0]))
+		self.assertTrue(N.array_equal(y, [10.0, 5.0, 2.5]))
+
+	def test_ragged(self):
+		# same total number of values as a regular 3-column table, but the last
+		# two lines have different numbers of columns
+		lines = ["1.0  10.0  0.1\n", "2.0  5.0  0.2  7.0\n", "3.0  2.5\n"]
+		(x, y) = profiles._ParseProfileLines(lines)
+		self.assertTrue(N.array_equal(x, [1.0, 2.0, 3.0]))
+		self.assertTrue(N.array_equal(y, [10.0, 5.0, 2.5]))
+
+	def test_too_few_columns(self):
+		self.assertRaises(IndexError, profiles._ParseProfileLines, ["1.0\n", "2.0\n"])
+
+
+class TestPivotFold(unittest.TestCase):
+
+	def test_midpoint(self):
+		# folding about the midpoint uses the data values directly, as SimpleFold does
+		for y in [N.array([1.0, 4.0, 2.0, 5.0, 3.0]), N.array([1.0, 4.0, 2.0, 5.0, 3.0, 7.0])]:
+			(r, yFold, asymmetry) = profiles.PivotFold(y, 0.5*(len(y) - 1))
+			(rSimple, yFoldSimple) = profiles.SimpleFold(y)
+			self.assertTrue(N.allclose(r, rSimple))
+			self.assertTrue(N.allclose(yFold, yFoldSimple, rtol=1e-12))
+
+	def test_short_profiles(self):
+		(r, yFold, asymmetry) = profiles.PivotFold([5.0], 0)
+		self.assertTrue(N.array_equal(r, [0.0]))
+		self.assertTrue(N.array_equal(yFold, [5.0]))
+		self.assertTrue(N.array_equal(asymmetry, [0.0]))
+		(r, yFold, asymmetry) = profiles.PivotFold([1.0, 3.0], 0.5, linear=True)
+		self.assertTrue(N.array_equal(r, [0.5]))
+		self.assertTrue(N.array_equal(yFold, [2.0]))
+		(r, foldedArray) = profiles.BatchFold(N.array([[5.0], [6.0]]))
+		self.assertTrue(N.array_equal(r, [0.0]))
+		self.assertTrue(N.array_equal(foldedArray, [[5.0], [6.0]]))
+
+	def test_bad_pivot(self):
+		self.assertRaises(ValueError, profiles.PivotFold, [1.0, 2.0, 3.0], 2.5)
+		self.assertRaises(ValueError, profiles.PivotFold, [1.0, 2.0, 3.0], -0.1)
+		self.assertRaises(ValueError, profiles.PivotFold, [], 0)
+		self.assertRaises(ValueError, profiles.BatchFold, N.ones((2, 3)), [1.0, 3.0])
+
+
+class TestBatchFold(unittest.TestCase):
+
+	def setUp(self):
+		x = N.arange(21.0)
+		self.stack = N.array([ 100.0*N.exp(-N.abs(x - c)/4.0) + 1.0 for c in [9.3, 10.0, 10.5, 11.8] ])
+
+	def LoopFold( self, y, pivot, r, linear ):
+		# row-by-row, point-by-point evaluation, as done before BatchFold existed
+		indices = N.arange(float(len(y)))
+		if linear is True:
+			interp = spline.LinInt(indices, y)
+		else:
+			interp = spline.Spline(indices, y)
+		rMax = min(pivot, len(y) - 1 - pivot)
+		folded = []
+		for rr in r:
+			if rr > rMax + 1.0e-9:
+				folded.append(N.nan)
+			else:
+				folded.append(0.5*(interp.call(pivot - rr) + interp.call(pivot + rr)))
+		return N.array(folded)
+
+	def test_midpoint(self):
+		(r, foldedArray) = profiles.BatchFold(self.stack)
+		for i in range(len(self.stack)):
+			(rSimple, yFoldSimple) = profiles.SimpleFold(list(self.stack[i]))
+			self.assertTrue(N.allclose(r, rSimple))
+			self.assertTrue(N.allclose(foldedArray[i], yFoldSimple, rtol=1e-12, atol=0))
+
+	def test_fractional_pivots(self):
+		pivots = [9.3, 10.0, 10.5, 11.8]
+		for linear in [False, True]:
+			(r, foldedArray) = profiles.BatchFold(self.stack, pivots, linear=linear)
+			self.assertEqual(foldedArray.shape, (len(self.stack), len(r)))
+			for i in range(len(self.stack)):
+				expected = self.LoopFold(self.stack[i], pivots[i], r, linear)
+				good = ~N.isnan(expected)
+				self.assertTrue(N.array_equal(N.isnan(foldedArray[i]), ~good))
+				self.assertTrue(N.allclose(foldedArray[i][good], expected[good], rtol=1e-10, atol=0))
+				(rPivot, yPivot, asymmetry) = profiles.PivotFold(self.stack[i], pivots[i], linear=linear)
+				if rPivot[0] != r[0]:
+					# half-integer pivot: PivotFold samples r = 0.5, 1.5, ... for this row
+					continue
+				self.assertTrue(N.allclose(foldedArray[i][0:len(rPivot)], yPivot, rtol=1e-10, atol=0))
+
+
+class TestMergeTwoProfiles(unittest.TestCase):
+
+	def test_merge(self):
+		r1 = N.array([0.5, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+		r2 = N.array([2.5, 3.0, 3.5, 4.0, 5.5, 7.0, 9.0])
+		y1 = 10.0 - r1
+		y2 = 20.0 - r2
+		radii = [2.5, 2.9, 3.0, 4.5, 6.0]
+		merged = profiles.MergeTwoProfilesMulti(r1, y1, r2, y2, radii)
+		for j, r in enumerate(radii):
+			(newR, newY) = profiles.MergeTwoProfiles(r1, y1, r2, y2, r)
+			# old code (linear scan): keep a point in r2 equal to the first unused r1 point
+			end1 = [ i for i in range(1, len(r1)) if r1[i] >= r ][0]
+			start2 = [ i for i in range(1, len(r2)) if r2[i] >= r ][0]
+			if r2[start2] < r1[end1]:
+				start2 += 1
+			self.assertTrue(N.array_equal(newR, N.concatenate((r1[0:end1], r2[start2:]))))
+			self.assertTrue(N.array_equal(newY, N.concatenate((y1[0:end1], y2[start2:]))))
+			self.assertTrue(N.array_equal(merged[j][0], newR))
+			self.assertTrue(N.array_equal(merged[j][1], newY))
+		# r = 2.9: r1[end1] = 3.0 = r2[1] is kept
+		self.assertTrue(N.array_equal(merged[1][0], [0.5, 1.0, 2.0, 3.0, 3.5, 4.0, 5.5, 7.0, 9.0]))
+		self.assertEqual(profiles.MergeTwoProfilesMulti(r1, y1, r2, y2, [0.2])[0], None)
+
+
+if __name__ == "__main__":
+	unittest.main()
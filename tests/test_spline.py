@@ -0,0 +1,113 @@
+# Tests for spline.py (run with "python -m unittest discover tests")
+
+import os, sys, unittest
+import numpy as N
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import spline
+
+
+def OldSecondDerivs( x_vals, y_vals, low_slope=None, high_slope=None ):
+	"""Second derivatives from the original element-by-element Spline.calc_ypp."""
+	n = len(x_vals)
+	y2_vals = N.zeros(n, float)
+	u = N.zeros(n - 1, float)
+	if low_slope is not None:
+		u[0] = (3.0/(x_vals[1] - x_vals[0])) * ((y_vals[1] - y_vals[0])/(x_vals[1] - x_vals[0]) - low_slope)
+		y2_vals[0] = -0.5
+	for i in range(1, n - 1):
+		sig = (x_vals[i] - x_vals[i-1]) / (x_vals[i+1] - x_vals[i-1])
+		p = sig*y2_vals[i-1] + 2.0
+		y2_vals[i] = (sig - 1.0)/p
+		u[i] = (y_vals[i+1] - y_vals[i])/(x_vals[i+1] - x_vals[i]) - (y_vals[i] - y_vals[i-1])/(x_vals[i] - x_vals[i-1])
+		u[i] = (6.0*u[i]/(x_vals[i+1] - x_vals[i-1]) - sig*u[i-1]) / p
+	if high_slope is not None:
+		qn = 0.5
+		un = (3.0/(x_vals[n-1] - x_vals[n-2])) * (high_slope - (y_vals[n-1] - y_vals[n-2])/(x_vals[n-1] - x_vals[n-2]))
+	else:
+		qn = un = 0.0
+	y2_vals[n-1] = (un - qn*u[n-2])/(qn*y2_vals[n-1] + 1.0)
+	for k in range(n - 2, -1, -1):
+		y2_vals[k] = y2_vals[k]*y2_vals[k+1] + u[k]
+	return y2_vals
+
+
+def OldEval( x_vals, y_vals, y2_vals, x ):
+	"""Original scalar Spline.call."""
+	if x <= x_vals[0]:
+		return y_vals[0]
+	if x >= x_vals[-1]:
+		return y_vals[-1]
+	pos = N.searchsorted(x_vals, x)
+	h = x_vals[pos] - x_vals[pos-1]
+	a = (x_vals[pos] - x) / h
+	b = (x - x_vals[pos-1]) / h
+	return (a*y_vals[pos-1] + b*y_vals[pos] +
+			((a*a*a - a)*y2_vals[pos-1] + (b*b*b - b)*y2_vals[pos]) * h*h/6.0)
+
+
+def EndSlopes( x, y, y2 ):
+	"""First derivatives at both ends of the spline defined by (x, y, y2)."""
+	h0 = x[1] - x[0]
+	h1 = x[-1] - x[-2]
+	low = (y[1] - y[0])/h0 - h0*(2*y2[0] + y2[1])/6.0
+	high = (y[-1] - y[-2])/h1 + h1*(y2[-2] + 2*y2[-1])/6.0
+	return (low, high)
+
+
+class TestSpline(unittest.TestCase):
+
+	def setUp(self):
+		rng = N.random.RandomState(1)
+		self.x = N.cumsum(rng.uniform(0.1, 1.0, 40))
+		self.y = N.sin(self.x) + 0.1*rng.normal(size=40)
+		self.xNew = N.concatenate(([self.x[0] - 1.0], N.linspace(self.x[0], self.x[-1], 301),
+									[self.x[-1] + 1.0]))
+
+	def testNaturalAndLowSlope(self):
+		for low_slope in [None, 0.0, 1.5]:
+			y2_old = OldSecondDerivs(self.x, self.y, low_slope)
+			y2 = spline.SplineSecondDerivs(self.x, self.y, low_slope)
+			self.assertTrue(N.allclose(y2, y2_old, rtol=0, atol=1e-10))
+			sp = spline.Spline(self.x, self.y, low_slope=low_slope)
+			yOld = N.array([ OldEval(self.x, self.y, y2_old, xx) for xx in self.xNew ])
+			self.assertTrue(N.allclose(sp(self.xNew), yOld, rtol=0, atol=1e-10))
+			for xx in self.xNew[0:50]:
+				self.assertAlmostEqual(sp(xx), OldEval(self.x, self.y, y2_old, xx), 10)
+
+	def testHighSlope(self):
+		# the original code did not impose high_slope correctly; the banded solve does
+		for (low_slope, high_slope) in [(None, 0.0), (0.5, -2.0)]:
+			y2 = spline.SplineSecondDerivs(self.x, self.y, low_slope, high_slope)
+			(low, high) = EndSlopes(self.x, self.y, y2)
+			self.assertAlmostEqual(high, high_slope, 10)
+			if low_slope is not None:
+				self.assertAlmostEqual(low, low_slope, 10)
+			y2_old = OldSecondDerivs(self.x, self.y, low_slope, high_slope)
+			self.assertTrue(abs(EndSlopes(self.x, self.y, y2_old)[1] - high_slope) > 1e-3)
+
+
+	def testMultiSpline(self):
+		yy = N.column_stack((self.y, 2*self.y + 1.0, N.cos(self.x)))
+		y2 = spline.SplineSecondDerivs(self.x, yy)
+		sp = spline.MultiSpline(self.x, yy)
+		values = sp(self.xNew)
+		self.assertEqual(values.shape, (len(self.xNew), 3))
+		for j in range(3):
+			y2_old = OldSecondDerivs(self.x, yy[:,j])
+			self.assertTrue(N.allclose(y2[:,j], y2_old, rtol=0, atol=1e-10))
+			yOld = N.array([ OldEval(self.x, yy[:,j], y2_old, xx) for xx in self.xNew ])
+			self.assertTrue(N.allclose(values[:,j], yOld, rtol=0, atol=1e-10))
+		self.assertTrue(N.allclose(sp(self.xNew[7]), values[7], rtol=0, atol=1e-14))
+
+	def testMultiLinInt(self):
+		yy = N.column_stack((self.y, N.cos(self.x)))
+		values = spline.multilinear_interpolate(self.x, yy, self.xNew)
+		for j in range(2):
+			li = spline.LinInt(self.x, yy[:,j])
+			yOld = N.array([ li.call(xx) for xx in self.xNew ])
+			self.assertTrue(N.allclose(values[:,j], yOld, rtol=0, atol=1e-12))
+			self.assertTrue(N.allclose(li(self.xNew), yOld, rtol=0, atol=1e-12))
+
+if __name__ == "__main__":
+	unittest.main()